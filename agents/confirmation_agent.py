@@ -1,15 +1,18 @@
-from typing import Dict
+from typing import Dict, Optional
 from graph.state import GraphState
-from services.storage import StorageService
+from services.async_storage import AsyncStorageService, get_async_storage
 from services.mcp_client import mcp_task_async
+from services.storage import SlotTakenError
 
+SLOT_TAKEN_TEXT = "Sorry, {date} {time} was just booked by someone else. Please propose another time."
 
-async def run_confirmation(state: GraphState) -> GraphState:
+
+async def run_confirmation(state: GraphState, storage: Optional[AsyncStorageService] = None) -> GraphState:
     op = state.operation
-    storage = StorageService()
+    storage = storage or get_async_storage()
 
     if op == "cancel":
-        ok = storage.delete_latest_for_user(state.appointment.user_id or "default")
+        ok = await storage.adelete_latest_for_user(state.appointment.user_id or "default")
         text = "Your latest appointment has been cancelled." if ok else "No appointment found to cancel."
         from graph.state import ConversationTurn
         state.turns.append(ConversationTurn(role="assistant", content=text))
@@ -17,17 +20,21 @@ async def run_confirmation(state: GraphState) -> GraphState:
         return state
 
     if op == "reschedule":
-        # Update latest for user with new date/time/mode
-        updated = storage.update_latest_for_user(
-            state.appointment.user_id or "default",
-            lambda it: {
-                **it,
-                "Date": state.appointment.date,
-                "Day": state.appointment.day,
-                "Time": state.appointment.time,
-                "Mode": state.appointment.mode,
-            },
-        )
+        # Check-and-move in one atomic step; the user's own current slot doesn't count as taken
+        try:
+            updated = await storage.amove_slot(
+                state.appointment.user_id or "default",
+                state.appointment.date,
+                state.appointment.time,
+                day=state.appointment.day,
+                mode=state.appointment.mode,
+            )
+        except SlotTakenError:
+            from graph.state import ConversationTurn
+            text = SLOT_TAKEN_TEXT.format(date=state.appointment.date, time=state.appointment.time)
+            state.turns.append(ConversationTurn(role="assistant", content=text))
+            state.done = False
+            return state
         if not updated:
             from graph.state import ConversationTurn
             state.turns.append(ConversationTurn(role="assistant", content="No existing appointment to reschedule."))
@@ -43,14 +50,21 @@ async def run_confirmation(state: GraphState) -> GraphState:
             return state
 
         if op == "book":
-            storage.save_appointment(
+            # Check-and-book in one atomic step; another session may have taken the slot since run_mode
+            saved = await storage.areserve_slot(
                 date=state.appointment.date,
-                day=state.appointment.day,
                 time=state.appointment.time,
+                user_id=state.appointment.user_id or "default",
+                day=state.appointment.day,
                 mode=state.appointment.mode,
                 notes=state.appointment.notes or "",
-                user_id=state.appointment.user_id or "default",
             )
+            if saved is None:
+                from graph.state import ConversationTurn
+                text = SLOT_TAKEN_TEXT.format(date=state.appointment.date, time=state.appointment.time)
+                state.turns.append(ConversationTurn(role="assistant", content=text))
+                state.done = False
+                return state
 
         resp = await mcp_task_async(
             agent_name="confirmation",
@@ -62,6 +76,7 @@ async def run_confirmation(state: GraphState) -> GraphState:
                 "mode": state.appointment.mode,
             },
             fallback=lambda: {"text": f"Booked {state.appointment.mode} appointment on {state.appointment.day}, {state.appointment.date} at {state.appointment.time}."},
+            deadline=state.deadline,
         )
         text = resp.get("text") or (
             f"Your {state.appointment.mode} appointment is booked for {state.appointment.date}, {state.appointment.day} at {state.appointment.time}."
@@ -1,17 +1,17 @@
 from typing import Dict, Optional
-import dateparser
 from graph.state import GraphState, ConversationTurn
 from services.mcp_client import mcp_task_async
+from services.datetime_grammar import parse_datetime
 
 
 def parse_datetime_locally(text: str) -> Dict[str, Optional[str]]:
-    dt = dateparser.parse(text, settings={"PREFER_DATES_FROM": "future"})
-    if not dt:
+    parsed = parse_datetime(text)
+    if parsed.date is None or parsed.time is None:
         return {"date": None, "day": None, "time": None}
     return {
-        "date": dt.strftime("%Y-%m-%d"),
-        "day": dt.strftime("%A"),
-        "time": dt.strftime("%H:%M"),
+        "date": parsed.date.strftime("%Y-%m-%d"),
+        "day": parsed.date.strftime("%A"),
+        "time": parsed.time.strftime("%H:%M"),
     }
 
 
@@ -20,11 +20,12 @@ async def run_datetime(state: GraphState) -> GraphState:
         return state
 
     user_utterance = next((t.content for t in reversed(state.turns) if t.role == "user"), "")
-    result = await mcp_task_async(
+    result = state.prefetched_result("datetime", user_utterance) or await mcp_task_async(
         agent_name="datetime",
         task="extract_datetime",
         payload={"text": user_utterance},
         fallback=lambda: {"date": None, "day": None, "time": None},
+        deadline=state.deadline,
     )
     date = result.get("date")
     day = result.get("day")
@@ -0,0 +1,78 @@
+import os
+from typing import Any, Dict
+from graph.state import GraphState
+from services.mcp_client import mcp_batch_async, mcp_task_async
+from agents.intent_agent import INTENTS
+
+
+def combined_extraction_enabled() -> bool:
+    """MCP_COMBINED_EXTRACTION=0 goes back to one intent/datetime/mode task each."""
+    return os.getenv("MCP_COMBINED_EXTRACTION", "1") in {"1", "true", "True"}
+
+
+def _split_booking(combined: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Per-agent views of an extract_booking answer; fields it lacks are left to the agents.
+
+    An `unsure` answer is dropped whole, so each agent runs its own task and
+    judges its own field.
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    if combined.get("unsure"):
+        return out
+    if combined.get("intent"):
+        out["intent"] = {"intent": combined["intent"]}
+    if combined.get("date") and combined.get("time"):
+        out["datetime"] = {"date": combined["date"], "day": combined.get("day"), "time": combined["time"]}
+    if combined.get("mode"):
+        out["mode"] = {"mode": combined["mode"]}
+    return out
+
+
+async def prefetch_booking(state: GraphState, user_utterance: str) -> GraphState:
+    """Ask for intent, datetime and mode in one `extract_booking` call."""
+    combined = await mcp_task_async(
+        agent_name="extraction",
+        task="extract_booking",
+        payload={"text": user_utterance, "labels": INTENTS},
+        fallback=lambda: {},
+        deadline=state.deadline,
+    )
+    state.prefetched_text = user_utterance
+    state.prefetched = _split_booking(combined)
+    return state
+
+
+async def run_extraction(state: GraphState) -> GraphState:
+    """Extract intent, datetime and mode up front for the latest utterance.
+
+    Results land in `state.prefetched`; the regular agents pick them up instead of
+    calling MCP themselves, and whatever the routing never reaches is discarded.
+    Uses the single `extract_booking` task, or with MCP_COMBINED_EXTRACTION=0 the
+    three separate tasks run concurrently (one `/tasks/batch` request when remote).
+    """
+    user_utterance = next((t.content for t in reversed(state.turns) if t.role == "user"), "")
+    if combined_extraction_enabled():
+        return await prefetch_booking(state, user_utterance)
+    intent, dt, mode = await mcp_batch_async([
+        {
+            "agent": "intent",
+            "task": "classify_intent",
+            "payload": {"text": user_utterance, "labels": INTENTS},
+            "fallback": lambda: {"intent": "other"},
+        },
+        {
+            "agent": "datetime",
+            "task": "extract_datetime",
+            "payload": {"text": user_utterance},
+            "fallback": lambda: {"date": None, "day": None, "time": None},
+        },
+        {
+            "agent": "mode",
+            "task": "infer_mode",
+            "payload": {"text": user_utterance},
+            "fallback": lambda: {"mode": "virtual"},
+        },
+    ], deadline=state.deadline)
+    state.prefetched_text = user_utterance
+    state.prefetched = {"intent": intent, "datetime": dt, "mode": mode}
+    return state
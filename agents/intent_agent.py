@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 from graph.state import GraphState
 from services.mcp_client import mcp_task_async
 
@@ -7,13 +7,24 @@ INTENTS = ["book", "cancel", "reschedule", "query", "other"]
 
 async def run_intent(state: GraphState) -> GraphState:
     user_utterance = next((t.content for t in reversed(state.turns) if t.role == "user"), "")
-    result: Dict = await mcp_task_async(
+    result: Optional[Dict] = state.prefetched_result("intent", user_utterance)
+    if result is None:
+        # Deferred: extraction_agent imports INTENTS from this module
+        from agents.extraction_agent import combined_extraction_enabled, prefetch_booking
+
+        if combined_extraction_enabled():
+            # One extract_booking call also prefetches datetime and mode for the next nodes
+            await prefetch_booking(state, user_utterance)
+            result = state.prefetched_result("intent", user_utterance)
+    result = result or await mcp_task_async(
         agent_name="intent",
         task="classify_intent",
         payload={"text": user_utterance, "labels": INTENTS},
         fallback=lambda: {"intent": "other"},
+        deadline=state.deadline,
     )
-    intent = result.get("intent", "other")
+    # An unsure answer could book, move or cancel the wrong thing; ask instead
+    intent = "other" if result.get("unsure") else result.get("intent", "other")
     state.intent = intent
     if intent in {"book", "reschedule", "cancel"}:
         state.operation = intent
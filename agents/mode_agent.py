@@ -1,7 +1,7 @@
 from typing import Optional
 from graph.state import GraphState
 from services.mcp_client import mcp_task_async
-from services.storage import StorageService
+from services.async_storage import AsyncStorageService, get_async_storage
 
 
 def guess_mode_locally(text: str) -> Optional[str]:
@@ -13,24 +13,29 @@ def guess_mode_locally(text: str) -> Optional[str]:
     return None
 
 
-async def run_mode(state: GraphState) -> GraphState:
+async def run_mode(state: GraphState, storage: Optional[AsyncStorageService] = None) -> GraphState:
     if state.operation not in {"book", "reschedule"}:
         return state
 
     user_utterance = next((t.content for t in reversed(state.turns) if t.role == "user"), "")
 
-    result = await mcp_task_async(
+    result = state.prefetched_result("mode", user_utterance) or await mcp_task_async(
         agent_name="mode",
         task="infer_mode",
         payload={"text": user_utterance},
         fallback=lambda: {"mode": "virtual"},
+        deadline=state.deadline,
     )
     mode = result.get("mode") or "virtual"
     state.appointment.mode = mode
 
-    storage = StorageService()
+    if state.operation == "reschedule":
+        # move_slot checks the target atomically at confirmation, ignoring the appointment being moved
+        return state
+
+    storage = storage or get_async_storage()
     # Check any-time-slot conflict (any user) for realism; still track per-user list
-    if state.appointment.date and state.appointment.time and storage.has_time_slot_taken(state.appointment.date, state.appointment.time):
+    if state.appointment.date and state.appointment.time and await storage.ahas_time_slot_taken(state.appointment.date, state.appointment.time):
         state.fallback_reason = (
             f"A booking already exists at {state.appointment.date} {state.appointment.time}. "
             "Please provide a different time."
@@ -39,7 +44,7 @@ async def run_mode(state: GraphState) -> GraphState:
         return state
 
     if state.appointment.date and state.appointment.time:
-        state.conflicts = storage.find_conflicts(
+        state.conflicts = await storage.afind_conflicts(
             date=state.appointment.date,
             time=state.appointment.time,
             user_id=state.appointment.user_id or "default",
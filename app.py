@@ -7,7 +7,10 @@ import asyncio
 
 from graph.graph import build_graph
 from graph.state import GraphState
-from services.storage import StorageService
+from services.storage import get_storage
+from services.mcp_tasks_local import start_background_warmup
+from services.mcp_client import aclose_http_client
+from services.routing import turn_deadline
 
 # Load environment variables from .env if present
 load_dotenv(override=False)
@@ -29,6 +32,7 @@ with st.sidebar:
 if "state" not in st.session_state:
     st.session_state.state = GraphState()
     st.session_state.state.appointment.user_id = str(uuid.uuid4())
+    start_background_warmup()
     st.session_state.graph = build_graph()
 
 state: GraphState = st.session_state.state
@@ -70,7 +74,15 @@ if st.button("Send", type="primary") and text.strip():
             "waiting_for_input": getattr(state, "waiting_for_input", False),
             "done": getattr(state, "done", False),
         }
-        out = asyncio.run(graph.ainvoke(GraphState(**norm)))
+        async def _invoke():
+            try:
+                # Every MCP task in this turn shares TURN_LATENCY_BUDGET_S
+                return await graph.ainvoke(GraphState(**norm, deadline=turn_deadline()))
+            finally:
+                # Each click runs on a fresh event loop; release its pooled MCP client
+                await aclose_http_client()
+
+        out = asyncio.run(_invoke())
         st.session_state.state = out if isinstance(out, GraphState) else GraphState(**norm)
     except Exception as e:
         st.error(f"Error during graph execution: {e}")
@@ -89,7 +101,7 @@ if state.turns:
         st.markdown(f"**{role}:** {content_v}")
 
 st.markdown("### Your Appointments")
-store = StorageService()
+store = get_storage()
 items = store.list_appointments(user_id=state.appointment.user_id)
 if items:
     st.table(items)
@@ -1,11 +1,19 @@
 import sys
+import time
 import uuid
 import click
 import asyncio
-from typing import Optional
+import subprocess
+from typing import Dict, List, Optional, Tuple
 from graph.graph import build_graph
 from graph.state import GraphState, ConversationTurn
 from services.logger import setup_logger
+from services.mcp_tasks_local import start_background_warmup
+from services.storage import close_storage, get_storage
+from services.mcp_client import aclose_http_client
+from services.circuit_breaker import breaker_states
+from services.mcp_cache import get_task_cache
+from services.routing import get_routing_policy, turn_deadline
 
 logger = setup_logger("cli")
 
@@ -18,6 +26,8 @@ def cli() -> None:
 async def run_graph_message(graph, state: GraphState, text: str) -> GraphState:
     state.turns.append(ConversationTurn(role="user", content=text))
     try:
+        # Every MCP task in this turn shares TURN_LATENCY_BUDGET_S
+        state.deadline = turn_deadline()
         output = await graph.ainvoke(state)
     except Exception as e:
         click.secho(f"Error during graph execution: {e}", fg="red")
@@ -37,6 +47,8 @@ async def run_graph_message(graph, state: GraphState, text: str) -> GraphState:
 @click.option("--example", is_flag=True, help="Run example conversation")
 def chat(user_id: Optional[str], message: Optional[str], example: bool) -> None:
     """Start an interactive chat or send one message for booking."""
+    # Load dateparser's language data while the graph compiles
+    start_background_warmup()
     graph = build_graph()
     state = GraphState()
     state.appointment.user_id = user_id or str(uuid.uuid4())
@@ -85,13 +97,98 @@ def chat(user_id: Optional[str], message: Optional[str], example: bool) -> None:
         if not state.done:
             await run_graph_message(graph, state, "Move it to 18:00 on the same day.")
 
-    if example:
-        asyncio.run(examples())
-        return
-    if message:
-        asyncio.run(single())
-        return
-    asyncio.run(interactive())
+    async def run(session) -> None:
+        try:
+            await session()
+        finally:
+            # The pooled MCP client belongs to this loop; close it before asyncio.run exits
+            await aclose_http_client()
+
+    try:
+        if example:
+            asyncio.run(run(examples))
+        elif message:
+            asyncio.run(run(single))
+        else:
+            asyncio.run(run(interactive))
+    finally:
+        stats = get_routing_policy().stats()
+        if stats:
+            logger.info(f"Routing decisions: {stats}")
+        breakers = breaker_states()
+        if breakers:
+            logger.info(f"Circuit breakers: {breakers}")
+        cache = get_task_cache().stats()
+        if cache["hits"] or cache["misses"]:
+            logger.info(f"Task cache: {cache}")
+        close_storage()
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse `python -X importtime` output into (module, self_us, cumulative_us)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|")
+            rows.append((name.strip(), int(self_us), int(cum_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+@cli.command()
+@click.option("--retention-days", default=None, type=int,
+              help="Archive appointments dated more than this many days ago (default: ARCHIVE_RETENTION_DAYS or 30)")
+def archive(retention_days: Optional[int]) -> None:
+    """Move past appointments into compressed cold storage (data/archive)."""
+    from services.archive import archive_appointments
+
+    try:
+        moved = archive_appointments(get_storage(), retention_days=retention_days)
+    finally:
+        close_storage()
+    click.secho(f"Archived {moved} appointment(s).", fg="green")
+
+
+@cli.command("startup-profile")
+@click.option("--module", "modules", multiple=True, default=["graph.graph"], show_default=True,
+              help="Module(s) to import in a fresh interpreter")
+@click.option("--top", default=15, show_default=True, help="Number of slowest imports to show")
+@click.option("--heavy", is_flag=True, help="Also force the lazily loaded heavy dependencies")
+def startup_profile(modules: List[str], top: int, heavy: bool) -> None:
+    """Report cold-start import cost per module in a fresh interpreter."""
+    imports = list(modules)
+    if heavy:
+        imports += ["pandas", "dateparser", "anthropic", "httpx"]
+    code = "; ".join(f"import {m}" for m in imports)
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        click.secho(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed", fg="red")
+        sys.exit(proc.returncode)
+
+    rows = _parse_importtime(proc.stderr)
+    # Top-level packages: attribute cumulative time to the first import of each root package
+    by_root: Dict[str, int] = {}
+    for name, _self_us, cum_us in rows:
+        root = name.split(".")[0]
+        by_root[root] = max(by_root.get(root, 0), cum_us)
+
+    click.secho(f"Interpreter + imports: {wall * 1000:.0f} ms wall for: {', '.join(imports)}", fg="yellow")
+    click.echo(f"{'cumulative ms':>14}  {'self ms':>8}  module")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        click.echo(f"{cum_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+    click.echo()
+    click.echo(f"{'cumulative ms':>14}  package")
+    for root, cum_us in sorted(by_root.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        click.echo(f"{cum_us / 1000:>14.1f}  {root}")
+    for lazy in ("pandas", "dateparser", "anthropic", "httpx"):
+        if lazy not in imports:
+            state = "loaded" if lazy in by_root else "not loaded (lazy)"
+            click.echo(f"{lazy}: {state}")
 
 
 if __name__ == "__main__":
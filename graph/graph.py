@@ -1,4 +1,5 @@
-from typing import Any
+from typing import Any, Optional
+import os
 import sys
 try:
     from langgraph.graph import StateGraph, END  # type: ignore
@@ -9,7 +10,11 @@ from agents.intent_agent import run_intent
 from agents.datetime_agent import run_datetime
 from agents.mode_agent import run_mode
 from agents.confirmation_agent import run_confirmation
+from agents.extraction_agent import run_extraction
+from services.storage import get_storage
+from services.async_storage import get_async_storage
 
+NODE_EXTRACT = "extract"
 NODE_INTENT = "intent"
 NODE_DATETIME = "datetime"
 NODE_MODE = "mode"
@@ -17,7 +22,28 @@ NODE_CONFIRM = "confirm"
 NODE_FALLBACK = "fallback"
 
 
-def build_graph() -> Any:
+def build_graph(storage: Optional[Any] = None, parallel: Optional[bool] = None) -> Any:
+    """Compile the appointment graph.
+
+    `storage` is injected into the nodes that touch persistence; it defaults to
+    the process-wide instance from `services.storage.get_storage`. Nodes await
+    it through its `AsyncStorageService` facade so storage I/O stays off the
+    event loop.
+
+    With `parallel` (default: GRAPH_PARALLEL_EXTRACTION=1) each turn starts with
+    an extraction node that runs the intent, datetime and mode tasks
+    concurrently; the usual nodes and routing then consume those results.
+    """
+    storage = get_async_storage(storage or get_storage())
+    if parallel is None:
+        parallel = os.getenv("GRAPH_PARALLEL_EXTRACTION", "0") in {"1", "true", "True"}
+
+    async def mode_node(state: GraphState) -> GraphState:
+        return await run_mode(state, storage)
+
+    async def confirm_node(state: GraphState) -> GraphState:
+        return await run_confirmation(state, storage)
+
     # Increase recursion limit for deep flows
     try:
         sys.setrecursionlimit(max(sys.getrecursionlimit(), 100))
@@ -27,10 +53,15 @@ def build_graph() -> Any:
 
     graph.add_node(NODE_INTENT, run_intent)
     graph.add_node(NODE_DATETIME, run_datetime)
-    graph.add_node(NODE_MODE, run_mode)
-    graph.add_node(NODE_CONFIRM, run_confirmation)
+    graph.add_node(NODE_MODE, mode_node)
+    graph.add_node(NODE_CONFIRM, confirm_node)
 
-    graph.set_entry_point(NODE_INTENT)
+    if parallel:
+        graph.add_node(NODE_EXTRACT, run_extraction)
+        graph.set_entry_point(NODE_EXTRACT)
+        graph.add_edge(NODE_EXTRACT, NODE_INTENT)
+    else:
+        graph.set_entry_point(NODE_INTENT)
 
     # Conditional routing that avoids loops and short-circuits based on operation/state
 
@@ -131,7 +162,8 @@ def build_graph() -> Any:
 
     def route_from_fallback_key(state: GraphState) -> str:
         if state.intent in {None, "other"}:
-            return "intent"
+            # The clarifying question was asked; re-running intent on the same utterance would loop
+            return "end"
         if state.operation in {"book", "reschedule"} and (not state.appointment.date or not state.appointment.time):
             return "datetime"
         if state.operation in {"book", "reschedule"} and not state.appointment.mode:
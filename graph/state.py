@@ -24,3 +24,14 @@ class GraphState(BaseModel):
     datetime_attempts: int = 0  # prevent infinite retries in a single turn
     waiting_for_input: bool = False  # pause graph until next user input
     done: bool = False
+    # Parallel extraction: intent/datetime/mode results computed up front for one utterance
+    prefetched_text: Optional[str] = None
+    prefetched: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    # time.monotonic() by which this turn should be answered; every MCP call gets it (None = no limit)
+    deadline: Optional[float] = None
+
+    def prefetched_result(self, agent: str, text: str) -> Optional[Dict[str, Any]]:
+        """Result the extraction node prefetched for `agent`, if it was computed for `text`."""
+        if self.prefetched_text != text:
+            return None
+        return self.prefetched.get(agent)
@@ -0,0 +1,71 @@
+"""Micro-benchmark: grammar datetime parser vs. the previous dateparser-based path
+
+Parses a set of typical booking utterances with
+ 1. `services.datetime_grammar.parse_datetime` (fast path, dateparser only as a last resort)
+ 2. dateparser directly, the way `task_datetime` used to (date pass + time pass)
+
+Run from project root (in your activated venv):
+  python scripts\\bench_datetime.py [--repeat 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+import datetime as dt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.datetime_grammar import parse_datetime  # noqa: E402
+from services.mcp_tasks_local import get_dateparser, warm_up_dateparser  # noqa: E402
+
+UTTERANCES = [
+    "Book a virtual appointment tomorrow at 3pm",
+    "Change my appointment from 5pm to 6pm",
+    "next monday at 17:30 please",
+    "book for 2031-03-04 at 9am",
+    "can I come in 2 hours",
+    "reschedule to friday at 10:15 am",
+    "march 4th at noon, phone call",
+    "Cancel my appointment",
+]
+
+
+def dateparser_path(text: str) -> None:
+    dp = get_dateparser()
+    dp.parse(text, settings={"PREFER_DATES_FROM": "future", "RETURN_AS_TIMEZONE_AWARE": False})
+    dp.parse(text)
+
+
+def grammar_path(text: str) -> None:
+    parse_datetime(text)
+
+
+def bench(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    warm_up_dateparser()
+    now = dt.datetime.now()
+    print(f"{'utterance':45} {'dateparser':>12} {'grammar':>10} {'speedup':>8}  source")
+    total_old = total_new = 0.0
+    for text in UTTERANCES:
+        old = bench(dateparser_path, text, args.repeat)
+        new = bench(grammar_path, text, args.repeat)
+        total_old += old
+        total_new += new
+        source = parse_datetime(text, now=now).source
+        print(f"{text[:45]:45} {old:10.1f}us {new:8.1f}us {old / new:7.0f}x  {source}")
+    print(f"{'mean':45} {total_old / len(UTTERANCES):10.1f}us {total_new / len(UTTERANCES):8.1f}us {total_old / total_new:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
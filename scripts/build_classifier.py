@@ -0,0 +1,42 @@
+"""Retrain the local intent/mode classifier and save its weights
+
+Run after editing data/classifier_train.jsonl, so processes load the weights
+instead of training at startup. Writes data/classifier_train.npz (or the .npz
+next to the file given with --data).
+
+Run from project root (in your activated venv):
+  python scripts\\build_classifier.py [--data path\\to\\examples.jsonl]
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.local_classifier import (  # noqa: E402
+    TRAINING_PATH,
+    load_examples,
+    save_weights,
+    train_models,
+    training_fingerprint,
+    weights_path,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", type=Path, default=TRAINING_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    examples = load_examples(args.data)
+    models = train_models(examples)
+    save_weights(models, weights_path(args.data), training_fingerprint(args.data))
+    print(f"Trained on {len(examples)} examples in {time.perf_counter() - start:.2f}s -> {weights_path(args.data)}")
+
+
+if __name__ == "__main__":
+    main()
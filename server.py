@@ -1,16 +1,56 @@
 from __future__ import annotations
-from typing import Any, Dict
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from services.excel_export import write_xlsx_stream
 from services.mcp_tasks_local import run_local, task_datetime
-from services.storage import StorageService
+from services.storage import StorageService, close_storage, get_storage
 from services.llm_providers import get_provider
+from services.circuit_breaker import breaker_states, get_breaker
+from services.mcp_cache import get_task_cache
+from services.singleflight import SingleFlight, coalesce
 from services.logger import setup_logger
+import os
 import json
+import asyncio
+import tempfile
 
 logger = setup_logger("mcp-server")
 
-app = FastAPI(title="MCP Server")
+
+async def _archive_periodically(interval_s: float) -> None:
+    from services.archive import archive_appointments
+
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await asyncio.to_thread(archive_appointments, get_storage())
+        except Exception as e:
+            logger.warning(f"Scheduled archival failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared storage once at startup and close it on shutdown
+    get_storage()
+    archiver = None
+    interval_s = float(os.getenv("ARCHIVE_INTERVAL_S", "0"))
+    if interval_s > 0:
+        archiver = asyncio.create_task(_archive_periodically(interval_s))
+    yield
+    if archiver is not None:
+        archiver.cancel()
+    close_storage()
+
+
+app = FastAPI(title="MCP Server", lifespan=lifespan)
+
+
+def storage_dependency() -> StorageService:
+    return get_storage()
 
 
 class TaskRequest(BaseModel):
@@ -19,61 +59,83 @@ class TaskRequest(BaseModel):
     payload: Dict[str, Any]
 
 
+class BatchRequest(BaseModel):
+    items: List[TaskRequest]
+
+
+def run_task(req: TaskRequest) -> Dict[str, Any]:
+    """Resolve one task: local deterministic registry first, then the LLM provider."""
+    data = run_local(req.agent, req.task, req.payload)
+    if data:
+        logger.info(f"/task local <- {json.dumps(data)}")
+        return data
+
+    # Second: LLM provider path for robustness
+    provider_name = os.getenv("LLM_PROVIDER", "local")
+    provider = get_provider(provider_name)
+    # While the provider's circuit is open this fails fast instead of waiting on a dead API
+    llm = get_breaker(f"llm:{provider_name}")
+    if req.agent == "intent" and req.task == "classify_intent":
+        labels = req.payload.get("labels", [])
+        text = req.payload.get("text", "")
+        prompt = (
+            "Classify the intent of the user as one of: "
+            + ", ".join(labels)
+            + ". Just answer with the label.\nUser: "
+            + text
+        )
+        out = llm.call(provider.generate, prompt) or ""
+        guess = next((l for l in labels if l.lower() in out.lower()), None)
+        data = {"intent": guess or (labels[0] if labels else "other")}
+        logger.info(f"/task provider <- {json.dumps(data)}")
+        return data
+    if req.agent == "datetime" and req.task == "extract_datetime":
+        text = req.payload.get("text", "")
+        # Prefer deterministic local parser for reliability
+        data = task_datetime({"text": text})
+        logger.info(f"/task provider(datetime_local) <- {json.dumps(data)}")
+        return data
+    if req.agent == "mode" and req.task == "infer_mode":
+        text = req.payload.get("text", "")
+        out = (llm.call(
+            provider.generate,
+            "Infer appointment mode as 'virtual' or 'telephonic'. Answer with one word.\nText: "
+            + text,
+        ) or "").lower()
+        mode = "virtual" if "tele" not in out and "phone" not in out else "telephonic"
+        data = {"mode": mode}
+        logger.info(f"/task provider <- {json.dumps(data)}")
+        return data
+    if req.agent == "confirmation" and req.task == "generate_confirmation":
+        date = req.payload.get("date")
+        day = req.payload.get("day")
+        time = req.payload.get("time")
+        mode = req.payload.get("mode")
+        data = {"text": f"Your {mode} appointment is booked for {day}, {date} at {time}."}
+        logger.info(f"/task provider <- {json.dumps(data)}")
+        return data
+
+    # Unknown task fallback
+    logger.warning("/task unknown task, returning empty result")
+    return {}
+
+
+# Identical tasks already running share that run (and its LLM call) instead of starting another
+_task_flights = SingleFlight()
+
+
+async def run_task_coalesced(req: TaskRequest) -> Dict[str, Any]:
+    """`run_task` on the threadpool, coalesced with identical requests that are in flight."""
+    key = json.dumps(req.model_dump(), sort_keys=True, default=str)
+    data = await coalesce(_task_flights, key, lambda: run_in_threadpool(run_task, req))
+    return dict(data)
+
+
 @app.post("/task")
-def task_endpoint(req: TaskRequest) -> Dict[str, Any]:
+async def task_endpoint(req: TaskRequest) -> Dict[str, Any]:
     logger.info(f"/task -> {json.dumps(req.model_dump())}")
     try:
-        # First: local deterministic registry
-        data = run_local(req.agent, req.task, req.payload)
-        if data:
-            logger.info(f"/task local <- {json.dumps(data)}")
-            return data
-
-        # Second: LLM provider path for robustness
-        provider_name = os.getenv("LLM_PROVIDER", "local")
-        provider = get_provider(provider_name)
-        if req.agent == "intent" and req.task == "classify_intent":
-            labels = req.payload.get("labels", [])
-            text = req.payload.get("text", "")
-            prompt = (
-                "Classify the intent of the user as one of: "
-                + ", ".join(labels)
-                + ". Just answer with the label.\nUser: "
-                + text
-            )
-            out = provider.generate(prompt) or ""
-            guess = next((l for l in labels if l.lower() in out.lower()), None)
-            data = {"intent": guess or (labels[0] if labels else "other")}
-            logger.info(f"/task provider <- {json.dumps(data)}")
-            return data
-        if req.agent == "datetime" and req.task == "extract_datetime":
-            text = req.payload.get("text", "")
-            # Prefer deterministic local parser for reliability
-            data = task_datetime({"text": text})
-            logger.info(f"/task provider(datetime_local) <- {json.dumps(data)}")
-            return data
-        if req.agent == "mode" and req.task == "infer_mode":
-            text = req.payload.get("text", "")
-            out = (provider.generate(
-                "Infer appointment mode as 'virtual' or 'telephonic'. Answer with one word.\nText: "
-                + text
-            ) or "").lower()
-            mode = "virtual" if "tele" not in out and "phone" not in out else "telephonic"
-            data = {"mode": mode}
-            logger.info(f"/task provider <- {json.dumps(data)}")
-            return data
-        if req.agent == "confirmation" and req.task == "generate_confirmation":
-            date = req.payload.get("date")
-            day = req.payload.get("day")
-            time = req.payload.get("time")
-            mode = req.payload.get("mode")
-            data = {"text": f"Your {mode} appointment is booked for {day}, {date} at {time}."}
-            logger.info(f"/task provider <- {json.dumps(data)}")
-            return data
-
-        # Unknown task fallback
-        logger.warning("/task unknown task, returning empty result")
-        return {}
+        return await run_task_coalesced(req)
     except HTTPException:
         raise
     except Exception as e:
@@ -81,12 +143,64 @@ def task_endpoint(req: TaskRequest) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/tasks/batch")
+async def tasks_batch_endpoint(req: BatchRequest) -> Dict[str, Any]:
+    """Run several tasks concurrently; results keep request order and fail per item."""
+    max_items = int(os.getenv("MCP_BATCH_MAX", "32"))
+    if len(req.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {max_items} items")
+    logger.info(f"/tasks/batch -> {len(req.items)} items")
+    outcomes = await asyncio.gather(*(run_task_coalesced(item) for item in req.items), return_exceptions=True)
+    results: List[Dict[str, Any]] = []
+    for item, out in zip(req.items, outcomes):
+        if isinstance(out, Exception):
+            logger.error(f"/tasks/batch {item.agent}.{item.task} error: {out}")
+            results.append({"ok": False, "error": str(out)})
+        else:
+            results.append({"ok": True, "data": out})
+    return {"results": results}
+
+
+@app.get("/health")
+def health() -> Dict[str, Any]:
+    """Liveness plus this process's circuit breakers, /task coalescing and task cache counters."""
+    return {
+        "status": "ok",
+        "breakers": breaker_states(),
+        "singleflight": _task_flights.stats(),
+        "cache": get_task_cache().stats(),
+    }
+
+
 @app.get("/appointments")
-def list_appointments() -> Dict[str, Any]:
-    s = StorageService()
+def list_appointments(s: StorageService = Depends(storage_dependency)) -> Dict[str, Any]:
     return {"items": s.list_appointments()}
 
 
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+@app.get("/appointments.xlsx")
+def export_appointments_xlsx(s: StorageService = Depends(storage_dependency)) -> StreamingResponse:
+    # Spill to disk past 8 MiB; the response is then streamed in chunks
+    buf = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    write_xlsx_stream(s.list_appointments(), buf)
+    buf.seek(0)
+
+    def chunks():
+        try:
+            while chunk := buf.read(64 * 1024):
+                yield chunk
+        finally:
+            buf.close()
+
+    return StreamingResponse(
+        chunks(),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="appointments.xlsx"'},
+    )
+
+
 class AppointmentIn(BaseModel):
     date: str
     day: str | None = None
@@ -97,16 +211,15 @@ class AppointmentIn(BaseModel):
 
 
 @app.post("/appointments")
-def create_appointment(appt: AppointmentIn) -> Dict[str, Any]:
-    s = StorageService()
-    if s.has_time_slot_taken(appt.date, appt.time):
-        raise HTTPException(status_code=409, detail="Time slot taken")
-    saved = s.save_appointment(
+def create_appointment(appt: AppointmentIn, s: StorageService = Depends(storage_dependency)) -> Dict[str, Any]:
+    saved = s.reserve_slot(
         date=appt.date,
-        day=appt.day,
         time=appt.time,
+        user_id=appt.user_id,
+        day=appt.day,
         mode=appt.mode,
         notes=appt.notes or "",
-        user_id=appt.user_id,
     )
+    if saved is None:
+        raise HTTPException(status_code=409, detail="Time slot taken")
     return {"item": saved}
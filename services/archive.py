@@ -0,0 +1,147 @@
+import os
+import gzip
+import json
+import zlib
+from datetime import date as _date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from .logger import setup_logger
+
+logger = setup_logger("archive")
+
+
+def _month(appt_date: Optional[str]) -> str:
+    from .partitioned_storage import partition_key
+
+    return partition_key(appt_date)
+
+
+def _intact_length(data: bytes) -> int:
+    """Byte length of the complete gzip members at the start of `data`."""
+    end = 0
+    while end < len(data):
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        pos = end
+        try:
+            while not d.eof and pos < len(data):
+                d.decompress(data[pos : pos + 65536])
+                pos += 65536
+        except zlib.error:
+            break
+        if not d.eof:
+            break
+        end = min(pos, len(data)) - len(d.unused_data)
+    return end
+
+
+class ArchiveStore:
+    """Cold storage for past appointments: gzip'd JSON-lines segments, one per month.
+
+    Segments are append-only. Each archival run appends a new gzip member,
+    which gzip readers treat as one continuous stream. `manifest.json` records
+    which segments hold each user's rows, so a per-user read only decompresses
+    those segments, and only when archived rows are actually requested. It
+    also records each segment's length after the last complete append, so an
+    append only has to inspect bytes written past that point.
+    """
+
+    def __init__(self, root: Path) -> None:
+        from .partitioned_storage import _Manifest
+
+        self.root = Path(root)
+        self.manifest = _Manifest(self.root / "manifest.json")
+
+    def _segment(self, month: str) -> Path:
+        return self.root / f"appointments-{month}.jsonl.gz"
+
+    def append(self, items: List[Dict]) -> None:
+        if not items:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        by_month: Dict[str, List[Dict]] = {}
+        for it in items:
+            by_month.setdefault(_month(it.get("Date")), []).append(it)
+        # One archival run at a time per store, so appends to a segment never interleave
+        with self.manifest.locked():
+            for month, rows in by_month.items():
+                # Index first: a listed segment without the rows is harmless, unlisted rows would be invisible
+                for user_id in {r.get("UserID") for r in rows}:
+                    self.manifest.register(month, user_id)
+                payload = b"".join(json.dumps(r, separators=(",", ":")).encode("utf-8") + b"\n" for r in rows)
+                with self._segment(month).open("a+b") as f:
+                    size = f.seek(0, os.SEEK_END)
+                    # Segments from before lengths were recorded are checked in full once
+                    known = self.manifest.load().get("segments", {}).get(month, 0)
+                    if size > known:
+                        f.seek(known)
+                        extra = f.read()
+                        intact = known + _intact_length(extra)
+                        if intact < size:
+                            # A crash mid-append left a partial member; its rows are still live and get re-archived
+                            logger.warning(f"Dropping {size - intact} damaged bytes at the end of archive segment {month}")
+                            f.truncate(intact)
+                    f.write(gzip.compress(payload))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._record_length(month, f.tell())
+
+    def _record_length(self, month: str, length: int) -> None:
+        def mutate(d: Dict[str, Any]) -> bool:
+            d.setdefault("segments", {})[month] = length
+            return True
+
+        self.manifest.update(mutate)
+
+    def iter_items(self, user_id: Optional[str] = None) -> Iterator[Dict]:
+        if not self.manifest.exists():
+            return
+        months = self.manifest.user_partitions(user_id) if user_id else self.manifest.partitions()
+        for month in months:
+            try:
+                with gzip.open(self._segment(month), "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        it = json.loads(line)
+                        if user_id is None or it.get("UserID") == user_id:
+                            yield it
+            except FileNotFoundError:
+                continue
+            except (EOFError, OSError, ValueError) as e:
+                # A crash mid-append leaves a truncated last member; keep what was readable
+                logger.warning(f"Archive segment {month} is damaged: {e}")
+
+
+def with_archived(storage_items: List[Dict], archive_root: Path, user_id: Optional[str]) -> List[Dict]:
+    """Prepend archived rows to live ones, skipping duplicates left by an interrupted archival.
+
+    Live rows win over archived copies, and among archived copies of one Id
+    the one archived last wins.
+    """
+    live = {it.get("Id") for it in storage_items}
+    archived: Dict[Any, Dict] = {}
+    for it in ArchiveStore(archive_root).iter_items(user_id):
+        if it.get("Id") not in live:
+            archived.pop(it.get("Id"), None)
+            archived[it.get("Id")] = it
+    return list(archived.values()) + storage_items
+
+
+def archive_appointments(storage: Any, retention_days: Optional[int] = None, today: Optional[_date] = None) -> int:
+    """Move appointments dated before today - retention_days into the archive.
+
+    Rows are written to the archive before they are removed from the live
+    store, so an interruption can duplicate a row (deduplicated on read) but
+    never lose one. Rows rescheduled to a later date between the two steps
+    stay live. Returns the number of appointments archived.
+    """
+    days = int(os.getenv("ARCHIVE_RETENTION_DAYS", "30")) if retention_days is None else retention_days
+    cutoff = ((today or _date.today()) - timedelta(days=days)).isoformat()
+    # Rows without an Id can't be removed by Id, so they stay live rather than being archived twice
+    old = [it for it in storage.list_appointments() if it.get("Id") and it.get("Date") and str(it["Date"]) < cutoff]
+    if not old:
+        return 0
+    ArchiveStore(storage.archive_dir).append(old)
+    removed = storage.remove_appointments([it["Id"] for it in old], dated_before=cutoff)
+    logger.info(f"archived {removed} appointments dated before {cutoff} to {storage.archive_dir}")
+    return removed
@@ -0,0 +1,131 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from threading import RLock
+from typing import Any, Callable, Dict, List, Optional
+from .sqlite_storage import SQLiteStorageService
+from .storage import get_storage
+
+
+class AsyncStorageService:
+    """Awaitable mirror of the storage API for graph nodes running on the event loop.
+
+    Every call is handed to a bounded thread pool so file I/O, fsync and SQLite
+    work never run on the loop itself. For SQLite, reads go to a pool whose
+    threads each hold their own read-only connection, while writes go to a
+    single-thread executor, so writers never contend for the lock and readers
+    never wait behind them.
+    """
+
+    def __init__(self, storage: Any, max_workers: Optional[int] = None) -> None:
+        self.storage = storage
+        workers = max_workers or int(os.getenv("STORAGE_EXECUTOR_WORKERS", "4"))
+        self._read_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage-read")
+        if isinstance(storage, SQLiteStorageService):
+            self._write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-write")
+        else:
+            # JSON mutations serialize on the module lock anyway; share the bounded pool
+            self._write_pool = self._read_pool
+
+    async def _run(self, pool: ThreadPoolExecutor, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    async def alist_appointments(self, user_id: Optional[str] = None, include_archived: bool = False) -> List[Dict]:
+        return await self._run(self._read_pool, self.storage.list_appointments, user_id, include_archived)
+
+    async def afind_conflicts(self, date: str, time: str, user_id: str) -> List[Dict]:
+        return await self._run(self._read_pool, self.storage.find_conflicts, date, time, user_id)
+
+    async def ahas_time_slot_taken(self, date: str, time: str) -> bool:
+        return await self._run(self._read_pool, self.storage.has_time_slot_taken, date, time)
+
+    async def aadd_appointment(self, appt: Dict) -> bool:
+        return await self._run(self._write_pool, self.storage.add_appointment, appt)
+
+    async def aupdate_latest_for_user(self, user_id: str, updater: Callable[[Dict], Dict]) -> Optional[Dict]:
+        return await self._run(self._write_pool, self.storage.update_latest_for_user, user_id, updater)
+
+    async def adelete_latest_for_user(self, user_id: str) -> bool:
+        return await self._run(self._write_pool, self.storage.delete_latest_for_user, user_id)
+
+    async def asave_appointment(
+        self,
+        date: str,
+        day: Optional[str],
+        time: str,
+        mode: str,
+        notes: str,
+        user_id: str,
+    ) -> Dict:
+        return await self._run(
+            self._write_pool,
+            self.storage.save_appointment,
+            date=date,
+            day=day,
+            time=time,
+            mode=mode,
+            notes=notes,
+            user_id=user_id,
+        )
+
+    async def areserve_slot(
+        self,
+        date: str,
+        time: str,
+        user_id: str,
+        day: Optional[str] = None,
+        mode: str = "virtual",
+        notes: str = "",
+    ) -> Optional[Dict]:
+        return await self._run(
+            self._write_pool,
+            self.storage.reserve_slot,
+            date,
+            time,
+            user_id,
+            day=day,
+            mode=mode,
+            notes=notes,
+        )
+
+    async def amove_slot(
+        self,
+        user_id: str,
+        date: str,
+        time: str,
+        day: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> Optional[Dict]:
+        return await self._run(self._write_pool, self.storage.move_slot, user_id, date, time, day=day, mode=mode)
+
+    def shutdown(self) -> None:
+        """Stop the executors; the wrapped storage is closed by its owner."""
+        self._read_pool.shutdown(wait=True)
+        if self._write_pool is not self._read_pool:
+            self._write_pool.shutdown(wait=True)
+
+
+# One async facade per shared storage instance
+_wrappers: Dict[int, AsyncStorageService] = {}
+_wrappers_lock = RLock()
+
+
+def get_async_storage(storage: Optional[Any] = None) -> AsyncStorageService:
+    """Return the shared AsyncStorageService for `storage` (default: `get_storage()`)."""
+    storage = storage or get_storage()
+    with _wrappers_lock:
+        wrapper = _wrappers.get(id(storage))
+        if wrapper is None or wrapper.storage is not storage:
+            wrapper = AsyncStorageService(storage)
+            _wrappers[id(storage)] = wrapper
+        return wrapper
+
+
+def close_async_storage() -> None:
+    with _wrappers_lock:
+        wrappers = list(_wrappers.values())
+        _wrappers.clear()
+    for wrapper in wrappers:
+        wrapper.shutdown()
@@ -0,0 +1,207 @@
+import os
+import time
+import asyncio
+from collections import deque
+from threading import Lock
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+from .logger import setup_logger
+
+logger = setup_logger("breaker")
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+def breakers_enabled() -> bool:
+    return os.getenv("CIRCUIT_BREAKER", "1") in {"1", "true", "True"}
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker around one dependency.
+
+    Outcomes of the last BREAKER_WINDOW_S seconds are kept; once at least
+    BREAKER_MIN_CALLS of them exist and the failure share reaches
+    BREAKER_FAILURE_RATE, the breaker opens and calls fail fast with
+    CircuitOpenError. After the open period a single probe call is let
+    through (half-open): success closes the breaker, failure reopens it for
+    twice as long as before, up to BREAKER_MAX_OPEN_S.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_s: Optional[float] = None,
+        min_calls: Optional[int] = None,
+        failure_rate: Optional[float] = None,
+        open_s: Optional[float] = None,
+        max_open_s: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.window_s = float(os.getenv("BREAKER_WINDOW_S", "60")) if window_s is None else window_s
+        self.min_calls = int(os.getenv("BREAKER_MIN_CALLS", "5")) if min_calls is None else min_calls
+        self.failure_rate = float(os.getenv("BREAKER_FAILURE_RATE", "0.5")) if failure_rate is None else failure_rate
+        self.open_s = float(os.getenv("BREAKER_OPEN_S", "5")) if open_s is None else open_s
+        self.max_open_s = float(os.getenv("BREAKER_MAX_OPEN_S", "300")) if max_open_s is None else max_open_s
+        self._clock = clock
+        self._lock = Lock()
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trips = 0  # consecutive openings without a successful probe; drives the backoff
+        self._probing = False
+        self.rejected = 0
+
+    def _cooldown(self) -> float:
+        return min(self.max_open_s, self.open_s * (2 ** max(0, self._trips - 1)))
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] <= now - self.window_s:
+            self._outcomes.popleft()
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._trips += 1
+        self._outcomes.clear()
+        logger.warning(f"circuit {self.name} opened for {self._cooldown():.1f}s")
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self._cooldown():
+                return HALF_OPEN
+            return self._state
+
+    def available(self) -> bool:
+        """Whether a call made now would be let through (does not claim the half-open probe)."""
+        if not breakers_enabled():
+            return True
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                return not self._probing
+            return self._clock() - self._opened_at >= self._cooldown()
+
+    def allow(self) -> bool:
+        """Admit one call; in half-open only the first caller gets through as the probe."""
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self._cooldown():
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                logger.info(f"circuit {self.name} closed")
+                self._state = CLOSED
+                self._trips = 0
+                self._probing = False
+            self._outcomes.append((now, True))
+            self._prune(now)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                self._probing = False
+                self._open(now)
+                return
+            if self._state == OPEN:
+                return
+            self._outcomes.append((now, False))
+            self._prune(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def release(self) -> None:
+        """Give back a half-open probe that ended without an outcome (e.g. it was cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if not breakers_enabled():
+            return fn(*args, **kwargs)
+        if not self.allow():
+            raise CircuitOpenError(f"circuit {self.name} is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        if not breakers_enabled():
+            return await fn(*args, **kwargs)
+        if not self.allow():
+            raise CircuitOpenError(f"circuit {self.name} is open")
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # A hedged loser or an expired deadline says nothing about the dependency
+            self.release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            self._prune(self._clock())
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            out: Dict[str, Any] = {
+                "state": state,
+                "calls": len(self._outcomes),
+                "failures": failures,
+                "rejected": self.rejected,
+            }
+            if self._state != CLOSED:
+                out["retry_in_s"] = round(max(0.0, self._opened_at + self._cooldown() - self._clock()), 3)
+            return out
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for dependency `name` (e.g. "remote:<endpoint>", "llm:anthropic")."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def reset_breakers() -> None:
+    """Forget every breaker (tests, or after changing BREAKER_* settings)."""
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import re
+import datetime as _dt
+from typing import NamedTuple, Optional
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2, "weds": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+UNIT_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "ten": 10}
+
+_TIME = r"\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?"
+_WEEKDAY = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_ORD = r"(?:st|nd|rd|th)?"
+
+# One alternation, scanned once left to right; earlier branches win at the same position
+_GRAMMAR = re.compile(
+    rf"""
+    \b(?:from|between)\s+(?P<range_from>{_TIME})\s*(?:to|until|till|and|-)\s*(?P<range_to>{_TIME})
+    | \b(?P<iso>\d{{4}}-\d{{1,2}}-\d{{1,2}})\b
+    | \b(?P<md_month>{_MONTH})\.?\s+(?P<md_day>\d{{1,2}}){_ORD}\b(?:,?\s+(?P<md_year>\d{{4}}))?
+    | \b(?P<dm_day>\d{{1,2}}){_ORD}\s+(?:of\s+)?(?P<dm_month>{_MONTH})\b(?:,?\s+(?P<dm_year>\d{{4}}))?
+    | \bin\s+(?P<rel_n>\d+|an?|one|two|three|four|five|six|ten)\s+(?P<rel_unit>min(?:ute)?s?|h(?:ou)?rs?|hours?|days?|weeks?)\b
+    | \b(?P<day_after>day\s+after\s+tomorrow)\b
+    | \b(?P<today>today|tonight)\b
+    | \b(?P<tomorrow>tomorrow|tmrw|tmr)\b
+    | \b(?:(?P<wd_rel>next|this|coming)\s+)?(?P<weekday>{_WEEKDAY})\b
+    | (?:\b(?:at|@)\s+)?\b(?P<noon>noon|midday|midnight)\b
+    | (?:\b(?:at|@)\s+)?(?P<clock>\b\d{{1,2}}:\d{{2}}(?!\d)(?:\s*[ap]\.?m\.?)?|\b\d{{1,2}}\s*[ap]\.?m\.?(?![a-z]))
+    | \b(?:at|@)\s+(?P<at_hour>\d{{1,2}})\b(?![:\d])(?!\s*[ap]\.?m)
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+_CLOCK = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*(?:([ap])\.?m\.?)?", re.IGNORECASE)
+
+# Words that suggest there is still a date/time the grammar didn't understand
+_LEFTOVER = re.compile(rf"\d|\b(?:{_MONTH}|week|weekend|month|year|morning|afternoon|evening|night|ago|later)\b", re.IGNORECASE)
+
+
+class ParsedDateTime(NamedTuple):
+    date: Optional[_dt.date]
+    time: Optional[_dt.time]
+    source: str  # grammar | dateparser | none
+
+
+def _clock(text: str) -> Optional[_dt.time]:
+    m = _CLOCK.fullmatch(text.strip())
+    if not m:
+        return None
+    hour, minute, meridiem = int(m.group(1)), int(m.group(2) or 0), (m.group(3) or "").lower()
+    if meridiem == "a" and hour == 12:
+        hour = 0
+    elif meridiem == "p" and hour != 12:
+        hour += 12
+    if 0 <= hour < 24 and 0 <= minute < 60:
+        return _dt.time(hour, minute)
+    return None
+
+
+def _month_day(month: str, day: str, year: Optional[str], today: _dt.date) -> Optional[_dt.date]:
+    m = MONTHS[month[:3].lower()]
+    try:
+        if year:
+            return _dt.date(int(year), m, int(day))
+        candidate = _dt.date(today.year, m, int(day))
+        # No year given: the next occurrence, like dateparser's PREFER_DATES_FROM=future
+        return candidate if candidate >= today else candidate.replace(year=today.year + 1)
+    except ValueError:
+        return None
+
+
+def _weekday(name: str, rel: Optional[str], today: _dt.date) -> _dt.date:
+    ahead = (WEEKDAYS[name.lower()] - today.weekday()) % 7
+    if ahead == 0 and (rel or "").lower() != "this":
+        ahead = 7
+    return today + _dt.timedelta(days=ahead)
+
+
+def _relative(n: str, unit: str, now: _dt.datetime) -> _dt.datetime:
+    count = int(n) if n.isdigit() else UNIT_WORDS[n.lower()]
+    unit = unit.lower()
+    if unit.startswith("m"):
+        delta = _dt.timedelta(minutes=count)
+    elif unit.startswith("h"):
+        delta = _dt.timedelta(hours=count)
+    elif unit.startswith("d"):
+        delta = _dt.timedelta(days=count)
+    else:
+        delta = _dt.timedelta(weeks=count)
+    return now + delta
+
+
+def parse_datetime(text: str, now: Optional[_dt.datetime] = None, fallback: bool = True) -> ParsedDateTime:
+    """Extract a date and a time from an utterance in a single regex pass.
+
+    Covers today/tomorrow, weekday names ("next monday"), ISO and month-name
+    dates, clock times ("5pm", "17:30", "noon"), ranges ("from 5 to 6pm" keeps
+    the destination) and offsets ("in 2 hours"). The last date and the last
+    time mentioned win, so "move it from monday to wednesday" means Wednesday.
+    If a field is still missing and the unmatched remainder looks like it holds
+    one, dateparser is called once on that remainder (English only).
+    """
+    now = now or _dt.datetime.now()
+    today = now.date()
+    date: Optional[_dt.date] = None
+    time: Optional[_dt.time] = None
+    residual = []
+    pos = 0
+    for m in _GRAMMAR.finditer(text):
+        residual.append(text[pos:m.start()])
+        pos = m.end()
+        g = m.groupdict()
+        if g["range_to"]:
+            time = _clock(g["range_to"]) or time
+        elif g["iso"]:
+            try:
+                date = _dt.date.fromisoformat("-".join(p.zfill(2) for p in g["iso"].split("-")))
+            except ValueError:
+                residual.append(m.group(0))
+        elif g["md_month"]:
+            date = _month_day(g["md_month"], g["md_day"], g["md_year"], today) or date
+        elif g["dm_month"]:
+            date = _month_day(g["dm_month"], g["dm_day"], g["dm_year"], today) or date
+        elif g["rel_n"]:
+            moment = _relative(g["rel_n"], g["rel_unit"], now)
+            date = moment.date()
+            if not g["rel_unit"].lower().startswith(("d", "w")):
+                time = moment.time().replace(second=0, microsecond=0)
+        elif g["day_after"]:
+            date = today + _dt.timedelta(days=2)
+        elif g["today"]:
+            date = today
+        elif g["tomorrow"]:
+            date = today + _dt.timedelta(days=1)
+        elif g["weekday"]:
+            date = _weekday(g["weekday"], g["wd_rel"], today)
+        elif g["noon"]:
+            time = _dt.time(0, 0) if g["noon"].lower() == "midnight" else _dt.time(12, 0)
+        elif g["clock"]:
+            time = _clock(g["clock"]) or time
+        elif g["at_hour"]:
+            time = _clock(g["at_hour"]) or time
+    residual.append(text[pos:])
+
+    if date is not None and time is not None:
+        return ParsedDateTime(date, time, "grammar")
+    rest = " ".join(part.strip() for part in residual if part.strip())
+    if fallback and _LEFTOVER.search(rest):
+        from .mcp_tasks_local import get_dateparser
+
+        parsed = get_dateparser().parse(
+            rest,
+            languages=["en"],
+            settings={"PREFER_DATES_FROM": "future", "RETURN_AS_TIMEZONE_AWARE": False, "RELATIVE_BASE": now},
+        )
+        if parsed is not None:
+            # dateparser fills a missing time with the current one; only trust it if digits were given
+            use_time = time is None and re.search(r"\d", rest) is not None
+            return ParsedDateTime(
+                date or parsed.date(),
+                parsed.time().replace(second=0, microsecond=0) if use_time else time,
+                "dateparser",
+            )
+    if date is None and time is None:
+        return ParsedDateTime(None, None, "none")
+    return ParsedDateTime(date, time, "grammar")
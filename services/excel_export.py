@@ -0,0 +1,98 @@
+import os
+import time
+import atexit
+from pathlib import Path
+from threading import Condition, Thread
+from typing import IO, Callable, Dict, List, Optional
+from .logger import setup_logger
+
+logger = setup_logger("excel")
+
+COLUMNS = ["Id", "Date", "Day", "Time", "Mode", "Notes", "UserID"]
+
+ItemsSupplier = Callable[[], List[Dict]]
+
+
+def export_workbook(items: List[Dict], path: Path) -> None:
+    """Write the XLSX mirror of the appointment list."""
+    import pandas as pd  # heavy import, deferred to the background worker
+
+    df = pd.DataFrame(items)
+    df.to_excel(str(path), index=False)
+
+
+def write_xlsx_stream(items: List[Dict], fileobj: IO[bytes]) -> None:
+    """Write the appointments into `fileobj` using openpyxl's write-only mode.
+
+    Rows are streamed into the workbook one at a time, so memory stays flat
+    regardless of how many appointments there are.
+    """
+    from openpyxl import Workbook
+
+    extra = sorted({k for it in items for k in it if k not in COLUMNS})
+    columns = COLUMNS + extra
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("appointments")
+    ws.append(columns)
+    for it in items:
+        ws.append([it.get(c) for c in columns])
+    wb.save(fileobj)
+
+
+class ExcelExporter:
+    """Background worker that mirrors storage to XLSX off the write path.
+
+    `schedule` only records which file is dirty and how to fetch its current
+    contents; the worker waits `delay` seconds so a burst of writes collapses
+    into a single export of the latest state.
+    """
+
+    def __init__(self, delay: Optional[float] = None, writer: Callable[[List[Dict], Path], None] = export_workbook) -> None:
+        self.delay = float(os.getenv("EXCEL_EXPORT_DELAY", "1.0")) if delay is None else delay
+        self.writer = writer
+        self._pending: Dict[Path, ItemsSupplier] = {}
+        self._busy = False
+        self._cond = Condition()
+        self._thread: Optional[Thread] = None
+
+    def schedule(self, path: Path, supplier: ItemsSupplier) -> None:
+        with self._cond:
+            self._pending[path] = supplier
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name="excel-exporter", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Let the burst settle before taking the latest snapshot
+                deadline = time.monotonic() + self.delay
+                while (remaining := deadline - time.monotonic()) > 0:
+                    self._cond.wait(timeout=remaining)
+                pending, self._pending = self._pending, {}
+                self._busy = True
+            self._export(pending)
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _export(self, pending: Dict[Path, ItemsSupplier]) -> None:
+        for path, supplier in pending.items():
+            try:
+                self.writer(supplier(), path)
+            except Exception as e:
+                logger.warning(f"Failed to write Excel: {e}")
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Export anything still pending and wait for the worker to go idle."""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+            self._cond.wait_for(lambda: not self._busy, timeout=timeout)
+        self._export(pending)
+
+
+exporter = ExcelExporter()
+atexit.register(exporter.flush, 10.0)
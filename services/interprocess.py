@@ -0,0 +1,112 @@
+import os
+import mmap
+import struct
+from pathlib import Path
+from threading import RLock
+from typing import IO, Optional
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt  # type: ignore
+
+
+class FileLock:
+    """Reentrant advisory lock on a side file, shared between processes.
+
+    Uses `flock` on POSIX and `msvcrt.locking` on Windows. Reentrant within a
+    process so nested storage calls (e.g. a mutation that triggers a snapshot
+    write) don't deadlock on their own lock.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._thread_lock = RLock()
+        self._depth = 0
+        self._fh: Optional[IO[bytes]] = None
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fh = open(self.path, "a+b")
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                else:
+                    fh.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+                self._fh = fh
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fh is not None:
+            fh, self._fh = self._fh, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                fh.close()
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.release()
+
+
+class GenerationCounter:
+    """Monotonic counter in an 8-byte side file, memory-mapped by every process.
+
+    Writers bump it (under the FileLock) after each commit; readers compare it
+    against the generation their cached view was built from. A read is a plain
+    memory access, so checking for foreign writes costs no system call.
+    """
+
+    _FMT = "<Q"
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._mm: Optional[mmap.mmap] = None
+
+    def _map(self) -> mmap.mmap:
+        if self._mm is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < 8:
+                    os.ftruncate(fd, 8)
+                self._mm = mmap.mmap(fd, 8)
+            finally:
+                os.close(fd)
+        return self._mm
+
+    def read(self) -> int:
+        return struct.unpack_from(self._FMT, self._map(), 0)[0]
+
+    def bump(self) -> int:
+        """Increment and return the new generation. Callers must hold the FileLock."""
+        mm = self._map()
+        value = struct.unpack_from(self._FMT, mm, 0)[0] + 1
+        struct.pack_into(self._FMT, mm, 0, value)
+        return value
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
@@ -1,34 +1,101 @@
 import os
-from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+import weakref
+from threading import Lock, Thread
+from typing import Dict, Any, Optional, Tuple
 
-try:
-    import anthropic  # type: ignore
-except Exception:
-    anthropic = None
+_anthropic: Any = None
+
+
+def _load_anthropic() -> Any:
+    """Import the anthropic SDK on first use; returns None if it is not installed."""
+    global _anthropic
+    if _anthropic is None:
+        try:
+            import anthropic  # type: ignore
+        except Exception:
+            return None
+        _anthropic = anthropic
+    return _anthropic
 
 
 class LLMProvider:
     def generate(self, prompt: str, **kwargs: Any) -> str:
         raise NotImplementedError
 
+    async def agenerate(self, prompt: str, **kwargs: Any) -> str:
+        """Awaitable `generate`; sync-only providers run in a worker thread so the loop stays free."""
+        return await asyncio.to_thread(self.generate, prompt, **kwargs)
+
+    def close(self) -> None:
+        """Release any clients the provider holds."""
+
 
 class AnthropicProvider(LLMProvider):
     def __init__(self, model: Optional[str] = None) -> None:
+        anthropic = _load_anthropic()
         if anthropic is None:
             raise RuntimeError("anthropic package not available")
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise RuntimeError("ANTHROPIC_API_KEY not set")
         self.model = model or os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-latest")
+        self.api_key = api_key
         self.client = anthropic.Anthropic(api_key=api_key)
+        # AsyncAnthropic's connection pool is bound to the loop it first runs on
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    def _request(self, prompt: str, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens or int(os.getenv("ANTHROPIC_MAX_TOKENS", "512")),
+            "temperature": float(os.getenv("ANTHROPIC_TEMPERATURE", "0.2")),
+            "messages": [{"role": "user", "content": prompt}],
+        }
+
+    def _async_client(self) -> Any:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = _load_anthropic().AsyncAnthropic(api_key=self.api_key)
+            self._async_clients[loop] = client
+        return client
 
     def generate(self, prompt: str, **kwargs: Any) -> str:
-        message = self.client.messages.create(
-            model=self.model,
-            max_tokens=int(os.getenv("ANTHROPIC_MAX_TOKENS", "512")),
-            temperature=float(os.getenv("ANTHROPIC_TEMPERATURE", "0.2")),
-            messages=[{"role": "user", "content": prompt}],
-        )
+        return self._text(self.client.messages.create(**self._request(prompt, kwargs.get("max_tokens"))))
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> str:
+        message = await self._async_client().messages.create(**self._request(prompt, kwargs.get("max_tokens")))
+        return self._text(message)
+
+    def close(self) -> None:
+        clients = list(self._async_clients.items())
+        self._async_clients.clear()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, client in clients:
+            # AsyncAnthropic.close() is a coroutine that must run on the client's own loop
+            if loop.is_closed():
+                continue
+            try:
+                if loop is running:
+                    loop.create_task(client.close())
+                elif loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.close(), loop)
+                else:
+                    # An idle loop can't be driven from a thread that is already inside another one
+                    worker = Thread(target=loop.run_until_complete, args=(client.close(),))
+                    worker.start()
+                    worker.join()
+            except Exception:
+                pass
+        self.client.close()
+
+    @staticmethod
+    def _text(message: Any) -> str:
         # Extract plain text from Anthropic content blocks
         parts = []
         for block in message.content or []:
@@ -42,9 +109,47 @@ class LocalEchoProvider(LLMProvider):
     def generate(self, prompt: str, **kwargs: Any) -> str:
         return f"[local] {prompt[:200]}"
 
+    async def agenerate(self, prompt: str, **kwargs: Any) -> str:
+        return self.generate(prompt, **kwargs)
 
-def get_provider(name: str) -> LLMProvider:
-    name = name.lower()
+
+# Providers are built once per (name, model, credentials) and reused, so their SDK
+# clients keep connections (and TLS sessions) alive across tasks and turns.
+_providers: Dict[Tuple[str, ...], LLMProvider] = {}
+_providers_lock = Lock()
+
+
+def _provider_key(name: str, model: Optional[str]) -> Tuple[str, ...]:
     if name == "anthropic":
-        return AnthropicProvider()
-    return LocalEchoProvider()
+        # Fingerprint the key rather than holding it, so a rotated key gets a fresh client
+        api_key = os.getenv("ANTHROPIC_API_KEY") or ""
+        fingerprint = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        return (name, model or os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-latest"), fingerprint)
+    return ("local",)
+
+
+def get_provider(name: str, model: Optional[str] = None) -> LLMProvider:
+    """Return the shared provider for `name`, building it on first use."""
+    name = name.lower()
+    key = _provider_key(name, model)
+    provider = _providers.get(key)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(key)
+            if provider is None:
+                # Construction errors (missing SDK/key) propagate and are not cached
+                provider = AnthropicProvider(model) if name == "anthropic" else LocalEchoProvider()
+                _providers[key] = provider
+    return provider
+
+
+def reset_providers() -> None:
+    """Drop cached providers (tests, or after changing provider credentials)."""
+    with _providers_lock:
+        providers = list(_providers.values())
+        _providers.clear()
+    for provider in providers:
+        try:
+            provider.close()
+        except Exception:
+            pass
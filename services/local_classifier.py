@@ -0,0 +1,299 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+import tempfile
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+import numpy as np
+from .logger import setup_logger
+
+logger = setup_logger("classifier")
+
+TRAINING_PATH = Path(__file__).resolve().parents[1] / "data" / "classifier_train.jsonl"
+# Bump when featurization or training changes, so saved weights are retrained
+WEIGHTS_FORMAT = 1
+
+N_FEATURES = 1 << 13
+# Mode label for utterances that don't say how to meet; callers fall back to their default
+UNSPECIFIED = "unspecified"
+NGRAM_RANGE = (2, 4)
+
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "book": ["book", "schedule", "reserve", "set up", "make an appointment", "new appointment"],
+    "cancel": ["cancel", "drop", "call off", "delete my appointment", "remove my booking"],
+    "reschedule": ["reschedule", "move", "change", "shift", "postpone", "push my appointment", "rebook"],
+    "query": ["available", "availability", "when", "slots", "openings", "free slot"],
+}
+
+MODE_KEYWORDS: Dict[str, List[str]] = {
+    "virtual": ["virtual", "virtually", "video", "online", "zoom", "teams", "remote"],
+    "telephonic": ["telephonic", "telephone", "phone", "tele", "call me", "on a call", "phone call"],
+}
+
+_SPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+class Prediction(NamedTuple):
+    label: str
+    confidence: float
+    source: str  # keyword | model
+
+
+def _normalize(text: str) -> str:
+    return _SPACE_RE.sub(" ", (text or "").lower()).strip()
+
+
+class KeywordTrie:
+    """All keywords of all labels compiled into one regex, longest phrases first.
+
+    Python's regex engine walks the shared prefixes of the alternation, so a
+    single `finditer` pass reports every label with an exact keyword hit.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]]) -> None:
+        self._label_of: Dict[str, str] = {}
+        for label, words in keywords.items():
+            for w in words:
+                self._label_of[w.lower()] = label
+        alternation = "|".join(re.escape(w) for w in sorted(self._label_of, key=len, reverse=True))
+        self._re = re.compile(rf"\b(?:{alternation})\b")
+
+    def labels(self, text: str) -> Set[str]:
+        return {self._label_of[m.group(0)] for m in self._re.finditer(_normalize(text))}
+
+
+def featurize(texts: Sequence[str]) -> np.ndarray:
+    """Hashed character n-grams (plus whole words), L2-normalized, one row per text."""
+    rows: List[int] = []
+    cols: List[int] = []
+    for i, text in enumerate(texts):
+        norm = _normalize(text)
+        padded = f" {norm} "
+        grams = [padded[j:j + n] for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1) for j in range(len(padded) - n + 1)]
+        grams.extend("w:" + w for w in _WORD_RE.findall(norm))
+        rows.extend([i] * len(grams))
+        cols.extend(zlib.crc32(g.encode("utf-8")) & (N_FEATURES - 1) for g in grams)
+    X = np.zeros((len(texts), N_FEATURES), dtype=np.float32)
+    np.add.at(X, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.maximum(norms, 1e-9)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class LinearModel:
+    """Multinomial logistic regression over hashed features, trained with full-batch gradient descent.
+
+    Probabilities are calibrated with a softmax temperature chosen on a
+    held-out fold (every fifth example) before refitting on all the data.
+    """
+
+    def __init__(self, classes: Sequence[str], l2: float = 1e-3, epochs: int = 150, lr: float = 4.0) -> None:
+        self.classes = list(classes)
+        self.l2 = l2
+        self.epochs = epochs
+        self.lr = lr
+        self.temperature = 1.0
+        self.W = np.zeros((N_FEATURES, len(self.classes)), dtype=np.float32)
+        self.b = np.zeros(len(self.classes), dtype=np.float32)
+
+    def _fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        # Only hash buckets seen in training can get a weight; optimize over those columns
+        used = np.flatnonzero(X.any(axis=0))
+        Xu = np.ascontiguousarray(X[:, used])
+        W = np.zeros((len(used), len(self.classes)), dtype=np.float32)
+        b = np.zeros(len(self.classes), dtype=np.float32)
+        onehot = np.eye(len(self.classes), dtype=np.float32)[y]
+        for _ in range(self.epochs):
+            grad = (_softmax(Xu @ W + b) - onehot) / len(Xu)
+            W -= self.lr * (Xu.T @ grad + self.l2 * W)
+            b -= self.lr * grad.sum(axis=0)
+        self.W = np.zeros((X.shape[1], len(self.classes)), dtype=np.float32)
+        self.W[used] = W
+        self.b = b
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> "LinearModel":
+        held = np.arange(len(X)) % 5 == 0
+        if held.any() and (~held).any():
+            self._fit(X[~held], y[~held])
+            logits = X[held] @ self.W + self.b
+            best, best_nll = 1.0, np.inf
+            for t in np.linspace(0.25, 3.0, 23):
+                p = _softmax(logits / t)[np.arange(held.sum()), y[held]]
+                nll = -np.log(np.maximum(p, 1e-9)).mean()
+                if nll < best_nll:
+                    best, best_nll = float(t), nll
+            self.temperature = best
+        self._fit(X, y)
+        return self
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return _softmax((X @ self.W + self.b) / self.temperature)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        """Weights as named arrays; only hash buckets with a weight are stored."""
+        rows = np.flatnonzero(self.W.any(axis=1))
+        return {
+            prefix + "classes": np.asarray(self.classes),
+            prefix + "temperature": np.asarray(self.temperature),
+            prefix + "b": self.b,
+            prefix + "rows": rows,
+            prefix + "W": self.W[rows],
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Any, prefix: str) -> "LinearModel":
+        model = cls([str(c) for c in arrays[prefix + "classes"]])
+        model.temperature = float(arrays[prefix + "temperature"])
+        model.b = np.asarray(arrays[prefix + "b"], dtype=np.float32)
+        model.W[arrays[prefix + "rows"]] = arrays[prefix + "W"]
+        return model
+
+
+def train_models(examples: Iterable[Dict]) -> Dict[str, LinearModel]:
+    """One LinearModel per task ("intent", "mode"), fitted on the labelled examples."""
+    examples = list(examples)
+    models: Dict[str, LinearModel] = {}
+    for task in ("intent", "mode"):
+        default = UNSPECIFIED if task == "mode" else None
+        labelled = [(ex["text"], ex.get(task) or default) for ex in examples if ex.get(task) or default]
+        classes = sorted({label for _, label in labelled})
+        index = {c: i for i, c in enumerate(classes)}
+        X = featurize([t for t, _ in labelled])
+        y = np.asarray([index[label] for _, label in labelled], dtype=np.intp)
+        models[task] = LinearModel(classes).fit(X, y)
+    return models
+
+
+class LocalClassifier:
+    """Intent and mode classifier: exact keyword hits first, the linear model otherwise.
+
+    A keyword hit for exactly one label is returned with KEYWORD_CONFIDENCE;
+    no hit or several conflicting hits defer to the model's calibrated
+    probability. Predictions are batched: one feature matrix, one matmul.
+    """
+
+    KEYWORD_CONFIDENCE = 0.99
+
+    def __init__(
+        self,
+        examples: Iterable[Dict] = (),
+        intent_keywords: Optional[Dict[str, List[str]]] = None,
+        mode_keywords: Optional[Dict[str, List[str]]] = None,
+        models: Optional[Dict[str, LinearModel]] = None,
+    ) -> None:
+        """Train on `examples`, or use already trained `models` (see `load_weights`)."""
+        self._tries = {
+            "intent": KeywordTrie(intent_keywords or INTENT_KEYWORDS),
+            "mode": KeywordTrie(mode_keywords or MODE_KEYWORDS),
+        }
+        self._models = models if models is not None else train_models(examples)
+
+    def predict(self, task: str, texts: Sequence[str]) -> List[Prediction]:
+        trie, model = self._tries[task], self._models[task]
+        out: List[Optional[Prediction]] = [None] * len(texts)
+        pending: List[int] = []
+        for i, text in enumerate(texts):
+            hits = trie.labels(text)
+            if len(hits) == 1:
+                out[i] = Prediction(hits.pop(), self.KEYWORD_CONFIDENCE, "keyword")
+            else:
+                pending.append(i)
+        if pending:
+            proba = model.predict_proba(featurize([texts[i] for i in pending]))
+            best = proba.argmax(axis=1)
+            for row, i in enumerate(pending):
+                out[i] = Prediction(model.classes[best[row]], float(proba[row, best[row]]), "model")
+        return out  # type: ignore[return-value]
+
+
+def load_examples(path: Path = TRAINING_PATH) -> List[Dict]:
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def weights_path(path: Path = TRAINING_PATH) -> Path:
+    """Where the weights trained from `path` are kept: an .npz next to it."""
+    return path.with_suffix(".npz")
+
+
+def training_fingerprint(path: Path = TRAINING_PATH) -> str:
+    """Hash of the training file and the weights format; saved weights are only used when it matches."""
+    digest = hashlib.sha256(f"{WEIGHTS_FORMAT}:{N_FEATURES}:{NGRAM_RANGE}\n".encode("utf-8"))
+    digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def save_weights(models: Dict[str, LinearModel], path: Path, fingerprint: str) -> None:
+    arrays: Dict[str, np.ndarray] = {"fingerprint": np.asarray(fingerprint)}
+    for task, model in models.items():
+        arrays.update(model.to_arrays(f"{task}."))
+    # Write then rename, so a concurrent reader never sees a partial file
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=str(path.parent), suffix=".tmp") as tmp:
+        try:
+            np.savez_compressed(tmp, **arrays)
+        except BaseException:
+            tmp.close()
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+    os.chmod(tmp.name, 0o644)  # it is a shipped data file, not a private temp file
+    os.replace(tmp.name, path)
+
+
+def load_weights(path: Path, fingerprint: str) -> Optional[Dict[str, LinearModel]]:
+    """Models saved at `path`, or None when missing, unreadable or trained from other data."""
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            if str(arrays["fingerprint"]) != fingerprint:
+                return None
+            return {task: LinearModel.from_arrays(arrays, f"{task}.") for task in ("intent", "mode")}
+    except Exception as e:
+        logger.warning(f"ignoring unreadable classifier weights {path}: {e}")
+        return None
+
+
+_classifier: Optional[LocalClassifier] = None
+_classifier_lock = Lock()
+
+
+def get_classifier() -> LocalClassifier:
+    """Process-wide classifier for the bundled JSONL (LOCAL_CLASSIFIER_DATA overrides).
+
+    Weights saved next to the JSONL are loaded when they were trained from the
+    same file; otherwise the model is trained and the weights saved for the
+    next process (`scripts/build_classifier.py` rebuilds the bundled ones).
+    """
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                path = Path(os.getenv("LOCAL_CLASSIFIER_DATA") or TRAINING_PATH)
+                fingerprint = training_fingerprint(path)
+                models = load_weights(weights_path(path), fingerprint)
+                if models is not None:
+                    logger.info(f"loaded local classifier weights from {weights_path(path)}")
+                else:
+                    examples = load_examples(path)
+                    models = train_models(examples)
+                    logger.info(f"trained local classifier on {len(examples)} examples from {path}")
+                    try:
+                        save_weights(models, weights_path(path), fingerprint)
+                    except OSError as e:
+                        logger.warning(f"could not save classifier weights next to {path}: {e}")
+                _classifier = LocalClassifier(models=models)
+    return _classifier
+
+
+def classify(task: str, texts: Sequence[str]) -> List[Prediction]:
+    """Batch-classify `texts` for task "intent" or "mode"."""
+    return get_classifier().predict(task, texts)
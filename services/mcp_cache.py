@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import datetime as _dt
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+from .logger import setup_logger
+
+logger = setup_logger("mcp-cache")
+
+# Tasks whose answer depends only on the payload (and, for datetime, today's date)
+CACHEABLE_TASKS = {
+    "intent.classify_intent",
+    "datetime.extract_datetime",
+    "mode.infer_mode",
+    "extraction.extract_booking",
+}
+
+# Tasks that resolve relative phrases ("tomorrow", "next friday") against the current date
+DATE_RELATIVE_TASKS = {
+    "datetime.extract_datetime",
+    "extraction.extract_booking",
+}
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        # Case, spacing and trailing punctuation don't change what the tasks extract
+        return _SPACE_RE.sub(" ", value.casefold()).strip().rstrip(".!?").rstrip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(
+    agent: str,
+    task: str,
+    payload: Dict[str, Any],
+    source: Tuple[str, ...],
+    today: Optional[_dt.date] = None,
+) -> str:
+    """Stable key for (agent, task, normalized payload, provider/model/endpoint[, reference date])."""
+    parts: Dict[str, Any] = {
+        "task": f"{agent}.{task}",
+        "payload": _normalize(payload),
+        "source": list(source),
+    }
+    if parts["task"] in DATE_RELATIVE_TASKS:
+        parts["today"] = (today or _dt.date.today()).isoformat()
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TaskCache:
+    """LRU + TTL cache of MCP task results, with an optional SQLite tier on disk.
+
+    The memory tier is checked first; on a miss the disk tier (if configured)
+    is consulted and a hit is promoted back into memory. Values are stored as
+    JSON so callers can never mutate a cached result in place.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_s: Optional[float] = None, db_path: Optional[Path] = None) -> None:
+        self.max_entries = int(os.getenv("MCP_CACHE_SIZE", "1024")) if max_entries is None else max_entries
+        self.ttl_s = float(os.getenv("MCP_CACHE_TTL_S", "3600")) if ttl_s is None else ttl_s
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS task_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires FROM task_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        if self.ttl_s <= 0 or self.max_entries <= 0:
+            return
+        expires = time.time() + self.ttl_s
+        raw = json.dumps(value)
+        with self._lock:
+            self._remember(key, expires, raw)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO task_cache (key, value, expires) VALUES (?, ?, ?)", (key, raw, expires))
+                except sqlite3.Error as e:
+                    logger.warning(f"MCP cache disk write failed: {e}")
+
+    def _remember(self, key: str, expires: float, raw: str) -> None:
+        self._mem[key] = (expires, raw)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def prune(self) -> None:
+        """Drop expired rows from the disk tier."""
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM task_cache WHERE expires <= ?", (time.time(),))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM task_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "size": len(self._mem),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache: Optional[TaskCache] = None
+_cache_lock = Lock()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("MCP_CACHE", "1") in {"1", "true", "True"}
+
+
+def get_task_cache() -> TaskCache:
+    """Process-wide cache; MCP_CACHE_DB=<path> adds the SQLite tier."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                db_path = os.getenv("MCP_CACHE_DB")
+                _cache = TaskCache(db_path=Path(db_path) if db_path else None)
+    return _cache
+
+
+def reset_task_cache() -> None:
+    """Close and drop the shared cache (tests, or after changing MCP_CACHE_* settings)."""
+    global _cache
+    with _cache_lock:
+        cache, _cache = _cache, None
+    if cache is not None:
+        cache.close()
@@ -1,45 +1,187 @@
 from __future__ import annotations
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
 import os
 import json
-import httpx
 import asyncio
-from .llm_providers import get_provider
+import weakref
+import datetime as _dt
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
+from .llm_providers import LocalEchoProvider, _provider_key, get_provider
+from .mcp_cache import CACHEABLE_TASKS, cache_enabled, cache_key, get_task_cache
 from .logger import setup_logger
-from .mcp_tasks_local import run_local
+from .mcp_tasks_local import repair_booking, run_local
+from .singleflight import SingleFlight, coalesce
+from .routing import ROUTE_ESCALATE, ROUTE_ESCALATE_TIMEOUT, deadline_scope, get_routing_policy
 
 logger = setup_logger("mcp")
 
+# Escalations currently in flight, so identical concurrent calls share one remote/LLM request
+_flights = SingleFlight()
 
-async def mcp_task_async(
-    agent_name: str,
-    task: str,
-    payload: Dict[str, Any],
-    fallback: Optional[Callable[[], Dict[str, Any]]] = None,
-) -> Dict[str, Any]:
+# One pooled client per event loop: an httpx.AsyncClient can't be shared across loops,
+# and CLI/Streamlit runs each turn under its own asyncio.run().
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def _http2_enabled() -> bool:
+    if os.getenv("MCP_HTTP2", "0") not in {"1", "true", "True"}:
+        return False
+    try:
+        import h2  # noqa: F401  # type: ignore
+    except ImportError:
+        logger.warning("MCP_HTTP2 set but the 'h2' package is missing; using HTTP/1.1")
+        return False
+    return True
+
+
+def get_http_client() -> Any:
+    """Return the keep-alive, connection-pooled client for the running event loop.
+
+    Limits come from MCP_MAX_CONNECTIONS, MCP_MAX_KEEPALIVE and
+    MCP_KEEPALIVE_EXPIRY; MCP_HTTP2=1 enables HTTP/2 when `h2` is installed.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx  # deferred: only needed when a remote MCP server is preferred
+
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("MCP_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("MCP_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("MCP_KEEPALIVE_EXPIRY", "30")),
+        )
+        client = httpx.AsyncClient(limits=limits, http2=_http2_enabled())
+        _http_clients[loop] = client
+    return client
+
+
+async def aclose_http_client() -> None:
+    """Close the pooled client of the running loop (call before the loop shuts down)."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _remote_endpoint() -> Optional[str]:
+    """MCP_ENDPOINT, but only when remote calls are explicitly preferred."""
     endpoint = os.getenv("MCP_ENDPOINT")
+    prefer_remote = os.getenv("MCP_PREFER_REMOTE", "0") in {"1", "true", "True"}
+    return endpoint if endpoint and prefer_remote else None
+
+
+def _provider_name() -> str:
+    return os.getenv("LLM_PROVIDER") or ("anthropic" if os.getenv("ANTHROPIC_API_KEY") else "local")
+
+
+def _task_cache_key(agent_name: str, task: str, payload: Dict[str, Any]) -> Optional[str]:
+    """Cache key for remote/provider answers; the local registry is cheap enough to rerun."""
+    if not cache_enabled() or f"{agent_name}.{task}" not in CACHEABLE_TASKS:
+        return None
+    endpoint = _remote_endpoint()
+    source = _provider_key(_provider_name().lower(), None) + ((endpoint,) if endpoint else ())
+    return cache_key(agent_name, task, payload, source)
+
+
+def _flight_key(agent_name: str, task: str, payload: Dict[str, Any], endpoint: Optional[str], provider_name: str) -> str:
+    """Exact-match key for coalescing; unlike the cache key the payload is not normalized."""
+    return json.dumps([agent_name, task, payload, endpoint, provider_name], sort_keys=True, default=str)
+
+
+def _run_local(agent_name: str, task: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return run_local(agent_name, task, payload) or {}
+    except Exception as e:
+        logger.warning(f"MCP local registry error: {e}")
+        return {}
+
+
+def _can_escalate(endpoint: Optional[str], provider_name: str) -> bool:
+    """Whether anything better than the local tasks is configured and reachable.
+
+    The echo provider doesn't count, nor does a dependency whose circuit is open.
+    """
+    if endpoint and _remote_breaker(endpoint).available():
+        return True
+    if not _llm_breaker(provider_name).available():
+        return False
+    try:
+        return not isinstance(get_provider(provider_name), LocalEchoProvider)
+    except Exception:
+        return False
+
+
+def _hedge_delay() -> Optional[float]:
+    """MCP_HEDGE_DELAY_S: how long a tier may run before the next one starts alongside it (<0 disables)."""
+    delay = float(os.getenv("MCP_HEDGE_DELAY_S", "1.0"))
+    return delay if delay >= 0 else None
+
+
+def _remote_breaker(endpoint: str) -> CircuitBreaker:
+    return get_breaker(f"remote:{endpoint}")
+
+
+def _llm_breaker(provider_name: str) -> CircuitBreaker:
+    return get_breaker(f"llm:{provider_name}")
+
+
+async def _post_json(url: str, body: Dict[str, Any], timeout_s: float) -> Any:
+    resp = await get_http_client().post(url, json=body, timeout=timeout_s)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def _ask_remote(agent_name: str, task: str, payload: Dict[str, Any], endpoint: str) -> Optional[Dict[str, Any]]:
     req = {"agent": agent_name, "task": task, "payload": payload}
-    logger.info(f"MCP call -> {json.dumps(req)}")
+    try:
+        timeout_s = float(os.getenv("MCP_TIMEOUT", "5"))
+        data = await _remote_breaker(endpoint).acall(_post_json, endpoint.rstrip("/") + "/task", req, timeout_s)
+        logger.info(f"MCP remote <- {json.dumps(data)}")
+        if isinstance(data, dict):
+            if not get_routing_policy().accepts(agent_name, task, data):
+                logger.info(f"MCP remote answer for {agent_name}.{task} is below the confidence threshold")
+                return None
+            return data
+    except CircuitOpenError:
+        logger.debug(f"MCP remote skipped: circuit open for {endpoint}")
+    except Exception as e:
+        logger.warning(f"MCP remote call failed: {e}")
+    return None
 
-    # Optional preference: only call remote if explicitly preferred
-    prefer_remote = os.getenv("MCP_PREFER_REMOTE", "0") in {"1", "true", "True"}
-    if endpoint and prefer_remote:
-        try:
-            timeout_s = float(os.getenv("MCP_TIMEOUT", "5"))
-            async with httpx.AsyncClient(timeout=timeout_s) as client:
-                resp = await client.post(endpoint.rstrip("/") + "/task", json=req)
-                resp.raise_for_status()
-                data = resp.json()
-                logger.info(f"MCP remote <- {json.dumps(data)}")
-                if isinstance(data, dict):
+
+async def _first_answer(
+    tiers: List[Callable[[], Awaitable[Optional[Dict[str, Any]]]]],
+    hedge_delay: Optional[float],
+) -> Optional[Dict[str, Any]]:
+    """Run `tiers` in order, starting the next one early if the current one is slow.
+
+    A tier that fails (returns None or an empty answer) hands over to the next
+    one immediately; one still running after `hedge_delay` gets the next tier
+    started alongside it. The first non-empty answer wins and every tier still
+    running is cancelled, including when the caller itself is cancelled.
+    """
+    queue = list(tiers)
+    running: Set["asyncio.Task[Optional[Dict[str, Any]]]"] = set()
+    try:
+        while queue or running:
+            if queue and (not running or hedge_delay is not None):
+                running.add(asyncio.ensure_future(queue.pop(0)()))
+            wait_s = hedge_delay if queue else None
+            done, running = await asyncio.wait(running, timeout=wait_s, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                data = fut.result()
+                if data:
                     return data
-        except Exception as e:
-            logger.warning(f"MCP remote call failed: {e}")
+        return None
+    finally:
+        for fut in running:
+            fut.cancel()
+
 
-    # Provider-first path (Anthropic/OpenAI) when available
-    provider_name = os.getenv("LLM_PROVIDER") or ("anthropic" if os.getenv("ANTHROPIC_API_KEY") else "local")
-    provider = get_provider(provider_name)
+async def _ask_provider(agent_name: str, task: str, payload: Dict[str, Any], provider_name: str) -> Optional[Dict[str, Any]]:
+    # Provider path (Anthropic/OpenAI) when available
+    llm = _llm_breaker(provider_name)
     try:
+        provider = get_provider(provider_name)
         if agent_name == "intent" and task == "classify_intent":
             labels = payload.get("labels", [])
             text = payload.get("text", "")
@@ -49,7 +191,7 @@ async def mcp_task_async(
                 + ". Just answer with the label.\nUser: "
                 + text
             )
-            out = provider.generate(prompt)
+            out = await llm.acall(provider.agenerate, prompt)
             guess = next((l for l in labels if l.lower() in (out or "").lower()), None)
             data = {"intent": guess or (labels[0] if labels else "other")}
             logger.info(f"MCP provider <- {json.dumps(data)}")
@@ -61,7 +203,7 @@ async def mcp_task_async(
                 "Respond as JSON with keys date, day, time. If unsure, null.\nText: "
                 + text
             )
-            out = provider.generate(prompt)
+            out = await llm.acall(provider.agenerate, prompt)
             try:
                 data = json.loads(out)
             except Exception:
@@ -87,13 +229,35 @@ async def mcp_task_async(
                 "Infer appointment mode as 'virtual' or 'telephonic'. Answer with one word.\nText: "
                 + text
             )
-            out = (provider.generate(prompt) or "").lower()
+            out = (await llm.acall(provider.agenerate, prompt) or "").lower()
             mode = "virtual"
             if "tele" in out or "phone" in out:
                 mode = "telephonic"
             data = {"mode": mode}
             logger.info(f"MCP provider <- {json.dumps(data)}")
             return data
+        if agent_name == "extraction" and task == "extract_booking":
+            # One prompt for intent, datetime and mode instead of three
+            labels = payload.get("labels", [])
+            text = payload.get("text", "")
+            prompt = (
+                "Today is " + _dt.date.today().strftime("%A, %Y-%m-%d") + ". "
+                "Extract the user's appointment request as JSON with keys: "
+                "intent (one of: " + ", ".join(labels) + "), "
+                "date (future date, YYYY-MM-DD), day (weekday), time (24h HH:MM), "
+                "mode ('virtual' or 'telephonic'). Use null for anything not stated. "
+                "Respond with the JSON object only.\nText: "
+                + text
+            )
+            out = await llm.acall(provider.agenerate, prompt, max_tokens=int(os.getenv("EXTRACT_MAX_TOKENS", "128")))
+            try:
+                candidate = json.loads(out)
+            except Exception:
+                candidate = {}
+            # Local tasks validate every field and repair only the ones that are missing or malformed
+            data = repair_booking(candidate if isinstance(candidate, dict) else {}, payload)
+            logger.info(f"MCP provider <- {json.dumps(data)}")
+            return data
         if agent_name == "confirmation" and task == "generate_confirmation":
             date = payload.get("date")
             day = payload.get("day")
@@ -102,17 +266,105 @@ async def mcp_task_async(
             data = {"text": f"Your {mode} appointment is booked for {day}, {date} at {time}."}
             logger.info(f"MCP provider <- {json.dumps(data)}")
             return data
+    except CircuitOpenError:
+        logger.debug(f"MCP provider skipped: circuit open for {provider_name}")
     except Exception as e:
         logger.warning(f"Local provider generation failed: {e}")
 
-    # Local registry as fallback
+    return None
+
+
+async def _escalate(
+    agent_name: str,
+    task: str,
+    payload: Dict[str, Any],
+    endpoint: Optional[str],
+    provider_name: str,
+) -> Optional[Dict[str, Any]]:
+    """Answer from the remote MCP server, hedged by the LLM provider; None if neither could."""
+    tiers: List[Callable[[], Awaitable[Optional[Dict[str, Any]]]]] = []
+    if endpoint:
+        tiers.append(lambda: _ask_remote(agent_name, task, payload, endpoint))
+    tiers.append(lambda: _ask_provider(agent_name, task, payload, provider_name))
+    return await _first_answer(tiers, _hedge_delay())
+
+
+async def mcp_task_async(
+    agent_name: str,
+    task: str,
+    payload: Dict[str, Any],
+    fallback: Optional[Callable[[], Dict[str, Any]]] = None,
+    remote: bool = True,
+    deadline: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Answer one task: confident local result, cache, remote/LLM (hedged), local, fallback.
+
+    `deadline` is the turn's `time.monotonic()` deadline (`GraphState.deadline`);
+    by default the one set by `turn_budget()` applies. Escalation never runs
+    past it: whatever is still in flight is cancelled and the local answer used.
+    """
+    with deadline_scope(deadline):
+        return await _mcp_task_async(agent_name, task, payload, fallback, remote)
+
+
+def _local_answer(policy: Any, agent_name: str, task: str, local: Dict[str, Any]) -> Dict[str, Any]:
+    """`local`, flagged `unsure` when the policy would not have accepted it as final."""
+    return local if policy.accepts(agent_name, task, local) else dict(local, unsure=True)
+
+
+async def _mcp_task_async(
+    agent_name: str,
+    task: str,
+    payload: Dict[str, Any],
+    fallback: Optional[Callable[[], Dict[str, Any]]],
+    remote: bool,
+    record: bool = True,
+) -> Dict[str, Any]:
+    req = {"agent": agent_name, "task": task, "payload": payload}
+    logger.info(f"MCP call -> {json.dumps(req)}")
+
+    # Optional preference: only call remote if explicitly preferred
+    endpoint = _remote_endpoint() if remote else None
+    provider_name = _provider_name()
+
+    # Local task first; the routing policy decides whether its answer is good enough
+    policy = get_routing_policy()
+    local = _run_local(agent_name, task, payload)
+    route = policy.decide(agent_name, task, local, _can_escalate(endpoint, provider_name), record=record)
+    if route != ROUTE_ESCALATE and local:
+        logger.info(f"MCP local ({route}) <- {json.dumps(local)}")
+        return _local_answer(policy, agent_name, task, local)
+
+    key = _task_cache_key(agent_name, task, payload)
+    if key is not None:
+        cached = get_task_cache().get(key)
+        if cached is not None:
+            logger.info(f"MCP cache <- {json.dumps(cached)}")
+            return cached
+
+    async def _fetch() -> Optional[Dict[str, Any]]:
+        data = await _escalate(agent_name, task, payload, endpoint, provider_name)
+        if data is not None and key is not None:
+            get_task_cache().set(key, data)
+        return data
+
     try:
-        data = run_local(agent_name, task, payload)
-        if data:
-            logger.info(f"MCP local <- {json.dumps(data)}")
-            return data
-    except Exception as e:
-        logger.warning(f"MCP local registry error: {e}")
+        # Identical calls already in flight share that remote/LLM invocation
+        data = await asyncio.wait_for(
+            coalesce(_flights, _flight_key(agent_name, task, payload, endpoint, provider_name), _fetch),
+            timeout=policy.escalation_timeout(),
+        )
+    except asyncio.TimeoutError:
+        policy.record(f"{agent_name}.{task}", ROUTE_ESCALATE_TIMEOUT)
+        logger.warning(f"MCP escalation for {agent_name}.{task} exceeded the turn budget")
+        data = None
+    if data is not None:
+        return dict(data)  # coalesced callers must not share one mutable result
+
+    # Local registry as fallback
+    if local:
+        logger.info(f"MCP local <- {json.dumps(local)}")
+        return _local_answer(policy, agent_name, task, local)
 
     if fallback:
         data = fallback()  # type: ignore
@@ -121,10 +373,93 @@ async def mcp_task_async(
     return {}
 
 
+async def mcp_batch_async(items: List[Dict[str, Any]], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Run several tasks at once; results are returned in the order of `items`.
+
+    Each item is `{"agent", "task", "payload"}` plus an optional `"fallback"`
+    callable. Confident local answers and cached answers are served first; with
+    a preferred remote endpoint the rest go to `POST /tasks/batch` in a single
+    round trip, and any item the server could not answer is resolved like
+    `mcp_task_async` would without the remote. `deadline` as for `mcp_task_async`.
+    """
+    with deadline_scope(deadline):
+        return await _mcp_batch_async(items)
+
+
+async def _mcp_batch_async(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    endpoint = _remote_endpoint()
+    pending: List[int] = []
+    policy = get_routing_policy()
+    if endpoint:
+        keys = [_task_cache_key(it["agent"], it["task"], it.get("payload") or {}) for it in items]
+        for i, it in enumerate(items):
+            local = _run_local(it["agent"], it["task"], it.get("payload") or {})
+            if policy.decide(it["agent"], it["task"], local, _can_escalate(endpoint, _provider_name())) != ROUTE_ESCALATE and local:
+                results[i] = _local_answer(policy, it["agent"], it["task"], local)
+            elif keys[i] is not None:
+                results[i] = get_task_cache().get(keys[i])
+        pending = [i for i, res in enumerate(results) if res is None]
+    if endpoint and pending:
+        body = {"items": [{"agent": items[i]["agent"], "task": items[i]["task"], "payload": items[i].get("payload") or {}} for i in pending]}
+        logger.info(f"MCP batch -> {len(pending)} items")
+        try:
+            timeout_s = float(os.getenv("MCP_TIMEOUT", "5"))
+            remaining = policy.escalation_timeout()
+            if remaining is not None:
+                timeout_s = min(timeout_s, remaining)
+            batch = await _remote_breaker(endpoint).acall(_post_json, endpoint.rstrip("/") + "/tasks/batch", body, timeout_s)
+            for i, out in zip(pending, batch.get("results", [])):
+                data = out.get("data") if isinstance(out, dict) and out.get("ok") else None
+                if isinstance(data, dict) and data and policy.accepts(items[i]["agent"], items[i]["task"], data):
+                    results[i] = data
+                    if keys[i] is not None:
+                        get_task_cache().set(keys[i], data)
+        except CircuitOpenError:
+            logger.debug(f"MCP remote batch skipped: circuit open for {endpoint}")
+        except Exception as e:
+            logger.warning(f"MCP remote batch failed: {e}")
+
+    missing = [i for i, res in enumerate(results) if res is None]
+    if missing:
+        # Remote was already tried for these (or isn't preferred); resolve them concurrently.
+        # With a remote endpoint their routing decision was already counted above.
+        resolved = await asyncio.gather(*(
+            _mcp_task_async(
+                items[i]["agent"],
+                items[i]["task"],
+                items[i].get("payload") or {},
+                items[i].get("fallback"),
+                remote=False,
+                record=not endpoint,
+            )
+            for i in missing
+        ))
+        for i, data in zip(missing, resolved):
+            results[i] = data
+    return [res or {} for res in results]
+
+
+def mcp_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def _run() -> List[Dict[str, Any]]:
+        try:
+            return await mcp_batch_async(items)
+        finally:
+            await aclose_http_client()
+
+    return asyncio.run(_run())
+
+
 def mcp_task(
     agent_name: str,
     task: str,
     payload: Dict[str, Any],
     fallback: Optional[Callable[[], Dict[str, Any]]] = None,
 ) -> Dict[str, Any]:
-    return asyncio.run(mcp_task_async(agent_name, task, payload, fallback))
+    async def _run() -> Dict[str, Any]:
+        try:
+            return await mcp_task_async(agent_name, task, payload, fallback)
+        finally:
+            await aclose_http_client()
+
+    return asyncio.run(_run())
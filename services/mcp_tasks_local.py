@@ -1,117 +1,177 @@
 from __future__ import annotations
 from typing import Any, Dict, Callable, Optional
+import os
 import re
 import json
 import datetime as _dt
-import dateparser
+import threading
+from .datetime_grammar import parse_datetime
 
 LocalTask = Callable[[Dict[str, Any]], Dict[str, Any]]
 
+_dateparser = None
+_dateparser_lock = threading.Lock()
 
-def task_intent(payload: Dict[str, Any]) -> Dict[str, Any]:
-    labels = payload.get("labels", [])
-    text = (payload.get("text") or "").lower()
-    mapping = {
-        "book": ["book", "schedule", "reserve", "set up"],
-        "cancel": ["cancel", "drop"],
-        "reschedule": ["reschedule", "move", "change", "shift"],
-        "query": ["available", "availability", "when", "slots", "time?"],
-    }
-    for label, keys in mapping.items():
-        if any(k in text for k in keys) and label in labels:
-            return {"intent": label}
-    if "other" in labels:
-        return {"intent": "other"}
-    return {"intent": labels[0] if labels else "other"}
 
+def get_dateparser():
+    """Import dateparser on first use; it is one of the slowest imports on the CLI path."""
+    global _dateparser
+    if _dateparser is None:
+        with _dateparser_lock:
+            if _dateparser is None:
+                import dateparser
 
-def _parse_time_from_range(text: str) -> Optional[_dt.time]:
-    # Prefer the destination time if pattern "from X to Y" exists
-    m = re.search(r"from\s+([0-9]{1,2}(?::[0-9]{2})?\s*(?:am|pm)?)\s+to\s+([0-9]{1,2}(?::[0-9]{2})?\s*(?:am|pm)?)",
-                  text, flags=re.IGNORECASE)
-    if not m:
-        return None
-    dest = m.group(2)
-    # normalize like '5am' -> '5 am'
-    dest = re.sub(r"(\d)(am|pm)\b", r"\1 \2", dest, flags=re.IGNORECASE)
-    t = dateparser.parse(dest)
-    return t.time() if t else None
-
-
-def _extract_explicit_time(text: str) -> Optional[_dt.time]:
-    # Normalize '5am' -> '5 am', '5:30pm' -> '5:30 pm'
-    norm = re.sub(r"(\d)(am|pm)\b", r"\1 \2", text, flags=re.IGNORECASE)
-    # Accept formats like '5 am', '05:00', '5:30 pm'
-    m = re.search(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\b", norm, flags=re.IGNORECASE)
-    if not m:
+                _dateparser = dateparser
+    return _dateparser
+
+
+def warm_up_dateparser() -> None:
+    """Import dateparser and load its English data so the first real parse is fast."""
+    get_dateparser().parse("tomorrow at 5pm", languages=["en"])
+
+
+def warm_up_classifier() -> None:
+    """Train the local intent/mode classifier ahead of the first utterance."""
+    from .local_classifier import get_classifier
+
+    get_classifier()
+
+
+def start_background_warmup() -> Optional[threading.Thread]:
+    """Warm up the local classifier and dateparser on a daemon thread (e.g. while the graph compiles).
+
+    Each step has its own switch: CLASSIFIER_WARMUP=0 and DATEPARSER_WARMUP=0.
+    """
+    steps = [
+        warm_up
+        for env, warm_up in (("CLASSIFIER_WARMUP", warm_up_classifier), ("DATEPARSER_WARMUP", warm_up_dateparser))
+        if os.getenv(env, "1") in {"1", "true", "True"}
+    ]
+    if not steps:
         return None
-    hour = int(m.group(1))
-    minute = int(m.group(2) or 0)
-    ampm = m.group(3).lower() if m.group(3) else None
-    if ampm == "am":
-        if hour == 12:
-            hour = 0
-    elif ampm == "pm":
-        if hour != 12:
-            hour += 12
-    if 0 <= hour < 24 and 0 <= minute < 60:
-        return _dt.time(hour=hour, minute=minute)
-    return None
 
+    def _run() -> None:
+        for warm_up in steps:
+            try:
+                warm_up()
+            except Exception:
+                pass
 
-def task_datetime(payload: Dict[str, Any]) -> Dict[str, Any]:
-    raw = (payload.get("text") or "").strip()
-    # Clean noisy characters but keep digits, letters, spaces, colon
-    lt = re.sub(r"[^a-z0-9:\s]", " ", raw.lower())
-    lt = re.sub(r"\s+", " ", lt).strip()
+    t = threading.Thread(target=_run, name="local-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def task_intent(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from .local_classifier import classify  # numpy-backed; loaded on first use
+
+    labels = payload.get("labels", [])
+    pred = classify("intent", [payload.get("text") or ""])[0]
+    # A vague guess must not book, move or cancel anything; "other" makes the graph ask instead.
+    # The confidence is kept, so the routing policy still escalates when it can.
+    floor = float(os.getenv("LOCAL_INTENT_MIN_CONFIDENCE", "0.5"))
+    if pred.confidence < floor and "other" in labels:
+        return {"intent": "other", "confidence": round(pred.confidence, 4)}
+    if pred.label in labels:
+        return {"intent": pred.label, "confidence": round(pred.confidence, 4)}
+    if "other" in labels:
+        return {"intent": "other", "confidence": 0.0}
+    return {"intent": labels[0] if labels else "other", "confidence": 0.0}
 
-    dest_time = _parse_time_from_range(lt)
 
+def task_datetime(payload: Dict[str, Any]) -> Dict[str, Any]:
+    raw = (payload.get("text") or "").strip()
     now = _dt.datetime.now()
-    base_date: Optional[_dt.date] = None
-    if "today" in lt:
-        base_date = now.date()
-    elif "tomorrow" in lt:
-        base_date = (now + _dt.timedelta(days=1)).date()
-
-    # Try explicit time first (more reliable with noisy text)
-    explicit_time = dest_time or _extract_explicit_time(lt)
-
-    # Determine date
-    chosen_date: Optional[_dt.date] = base_date
-    if chosen_date is None:
-        # Try detect a date with preference to future
-        dt_try = dateparser.parse(lt, settings={"PREFER_DATES_FROM": "future", "RETURN_AS_TIMEZONE_AWARE": False})
-        if dt_try:
-            chosen_date = dt_try.date()
-        else:
-            chosen_date = now.date()
-
-    if explicit_time is None:
-        # Try parse any time token separately
-        t_try = dateparser.parse(lt)
-        if t_try:
-            explicit_time = t_try.time()
-
-    if explicit_time is None:
-        # Last resort: keep user's hour if present like '5 am' in noisy text; otherwise default 09:00
-        explicit_time = _dt.time(hour=9, minute=0)
-
-    dt = _dt.datetime.combine(chosen_date, explicit_time)
+    # Grammar fast path; dateparser only sees text the grammar couldn't read
+    parsed = parse_datetime(raw, now=now)
+    # Defaults: today, and 09:00 when no time was given
+    dt = _dt.datetime.combine(parsed.date or now.date(), parsed.time or _dt.time(hour=9, minute=0))
+    if parsed.source == "grammar" and parsed.date and parsed.time:
+        confidence = 0.95
+    elif parsed.source == "dateparser":
+        confidence = 0.6
+    elif parsed.date or parsed.time:
+        confidence = 0.5  # one of the two was defaulted
+    else:
+        confidence = 0.0
     return {
         "date": dt.strftime("%Y-%m-%d"),
         "day": dt.strftime("%A"),
         "time": dt.strftime("%H:%M"),
+        "confidence": confidence,
     }
 
 
 def task_mode(payload: Dict[str, Any]) -> Dict[str, Any]:
-    text = (payload.get("text") or "").lower()
-    if any(k in text for k in ["virtual", "video", "online"]):
-        return {"mode": "virtual"}
-    if any(k in text for k in ["tele", "phone", "call", "telephonic"]):
-        return {"mode": "telephonic"}
-    return {"mode": "virtual"}
+    from .local_classifier import UNSPECIFIED, classify
+
+    pred = classify("mode", [payload.get("text") or ""])[0]
+    # Nothing said about the mode: default to virtual, as confident as the model is that none was given
+    mode = "virtual" if pred.label == UNSPECIFIED else pred.label
+    return {"mode": mode, "confidence": round(pred.confidence, 4)}
+
+
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_HHMM_RE = re.compile(r"^\d{2}:\d{2}$")
+
+
+def _valid(value: Any, pattern: "re.Pattern[str]", parse: Callable[[str], Any]) -> bool:
+    if not isinstance(value, str) or not pattern.match(value):
+        return False
+    try:
+        parse(value)
+    except ValueError:
+        return False
+    return True
+
+
+def repair_booking(candidate: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a combined {intent, date, day, time, mode} answer field by field.
+
+    Fields that are missing or malformed are filled in by the deterministic local
+    tasks; `day` is always derived from `date` so the two can't disagree.
+    """
+    labels = payload.get("labels") or []
+    intent = candidate.get("intent")
+    if not isinstance(intent, str) or intent.lower() not in labels:
+        intent = task_intent(payload)["intent"]
+
+    date, time = candidate.get("date"), candidate.get("time")
+    date_ok = _valid(date, _ISO_DATE_RE, _dt.date.fromisoformat)
+    time_ok = _valid(time, _HHMM_RE, _dt.time.fromisoformat)
+    if not (date_ok and time_ok):
+        local = task_datetime(payload)
+        date = date if date_ok else local["date"]
+        time = time if time_ok else local["time"]
+
+    mode = candidate.get("mode")
+    mode = mode.lower() if isinstance(mode, str) else None
+    if mode not in {"virtual", "telephonic"}:
+        mode = task_mode(payload)["mode"]
+
+    return {
+        "intent": intent.lower(),
+        "date": date,
+        "day": _dt.date.fromisoformat(date).strftime("%A"),
+        "time": time,
+        "mode": mode,
+    }
+
+
+def task_extract_booking(payload: Dict[str, Any]) -> Dict[str, Any]:
+    intent, when, mode = task_intent(payload), task_datetime(payload), task_mode(payload)
+    confidence = intent["confidence"]
+    if intent["intent"] in {"book", "reschedule"}:
+        # Date, time and mode only matter (and only need to be right) for these
+        confidence = min(confidence, when["confidence"], mode["confidence"])
+    return {
+        "intent": intent["intent"],
+        "date": when["date"],
+        "day": when["day"],
+        "time": when["time"],
+        "mode": mode["mode"],
+        "confidence": confidence,
+    }
 
 
 def task_confirmation(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -126,6 +186,7 @@ REGISTRY: Dict[str, LocalTask] = {
     "intent.classify_intent": task_intent,
     "datetime.extract_datetime": task_datetime,
     "mode.infer_mode": task_mode,
+    "extraction.extract_booking": task_extract_booking,
     "confirmation.generate_confirmation": task_confirmation,
 }
 
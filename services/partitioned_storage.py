@@ -0,0 +1,368 @@
+import re
+import json
+import uuid
+from pathlib import Path
+from threading import RLock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .excel_export import exporter
+from .interprocess import FileLock
+from .logger import setup_logger
+from .storage import DATA_DIR, JSON_PATH, XLSX_PATH, JSONStorageService, SlotTakenError, _atomic_write_json, _file_stamp, _now_iso
+
+logger = setup_logger("partitioned-storage")
+
+PARTITIONS_DIR = DATA_DIR / "partitions"
+UNDATED = "undated"
+
+_MONTH_RE = re.compile(r"^(\d{4})-(\d{2})")
+
+
+def partition_key(date: Optional[str]) -> str:
+    """Month partition for an appointment Date ("2030-01-02" -> "2030-01")."""
+    m = _MONTH_RE.match(date or "")
+    return f"{m.group(1)}-{m.group(2)}" if m else UNDATED
+
+
+class _Manifest:
+    """Small JSON index of the partitions and of which partitions each user has rows in.
+
+    Cached by file stamp and rewritten atomically under its own file lock; it only
+    changes when a month or a user/month pair appears for the first time.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._flock = FileLock(path.with_suffix(".lock"))
+        self._lock = RLock()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._data: Dict[str, Any] = {"version": 1, "partitions": [], "users": {}}
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def locked(self) -> FileLock:
+        """The manifest's cross-process lock, for work that must happen at most once per store."""
+        return self._flock
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            stamp = _file_stamp(self.path)
+            if stamp != self._stamp:
+                try:
+                    with self.path.open("r", encoding="utf-8") as f:
+                        self._data = json.load(f)
+                except FileNotFoundError:
+                    self._data = {"version": 1, "partitions": [], "users": {}}
+                self._stamp = stamp
+            return self._data
+
+    def update(self, mutate: Callable[[Dict[str, Any]], bool]) -> None:
+        """Apply `mutate` to a fresh copy and persist it if it reports a change."""
+        with self._lock, self._flock:
+            self._stamp = None
+            data = json.loads(json.dumps(self.load()))
+            if not mutate(data) and self.path.exists():
+                return
+            data["partitions"] = sorted(set(data["partitions"]))
+            ok, err = _atomic_write_json(self.path, data)
+            if not ok:
+                raise RuntimeError(f"Failed to write partition manifest: {err}")
+            self._data, self._stamp = data, _file_stamp(self.path)
+
+    def partitions(self) -> List[str]:
+        return list(self.load()["partitions"])
+
+    def user_partitions(self, user_id: str) -> List[str]:
+        return list(self.load()["users"].get(user_id, []))
+
+    def register(self, key: str, user_id: Optional[str]) -> None:
+        data = self.load()
+        if key in data["partitions"] and (user_id is None or key in data["users"].get(user_id, [])):
+            return
+
+        def mutate(d: Dict[str, Any]) -> bool:
+            changed = False
+            if key not in d["partitions"]:
+                d["partitions"].append(key)
+                changed = True
+            if user_id is not None:
+                parts = d["users"].setdefault(user_id, [])
+                if key not in parts:
+                    parts.append(key)
+                    parts.sort()
+                    changed = True
+            return changed
+
+        self.update(mutate)
+
+    def unregister_user(self, key: str, user_id: str) -> None:
+        def mutate(d: Dict[str, Any]) -> bool:
+            parts = d["users"].get(user_id, [])
+            if key not in parts:
+                return False
+            parts.remove(key)
+            if not parts:
+                del d["users"][user_id]
+            return True
+
+        self.update(mutate)
+
+
+class PartitionedStorageService:
+    """JSON storage split into one file per month (`data/partitions/YYYY-MM.json`).
+
+    Slot lookups and bookings only open the partition for the requested Date,
+    and per-user queries only the partitions listed for that user in
+    `manifest.json`, so cost is bounded by one month rather than all history.
+    Each partition is a regular JSONStorageService (indexed view, journal mode,
+    cross-process locking); the XLSX mirror is produced once for all partitions.
+    Enable with STORAGE_LAYOUT=partitioned.
+    """
+
+    def __init__(self, root: Optional[Path] = None, mode: Optional[str] = None, legacy_path: Optional[Path] = None) -> None:
+        self.root = Path(root) if root else PARTITIONS_DIR
+        self.mode = mode
+        self.xlsx_path = XLSX_PATH if root is None else self.root / "appointments.xlsx"
+        self.archive_dir = self.root.parent / "archive"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest = _Manifest(self.root / "manifest.json")
+        self._parts: Dict[str, JSONStorageService] = {}
+        self._lock = RLock()
+        legacy = legacy_path or (JSON_PATH if root is None else None)
+        if not self.manifest.exists():
+            self._import_legacy(legacy)
+
+    def _import_legacy(self, legacy: Optional[Path]) -> None:
+        """One-time split of an existing single-file store into partitions."""
+        with self.manifest.locked():
+            if self.manifest.exists():
+                # Another process finished the split while we waited for the lock
+                return
+            items: List[Dict] = []
+            if legacy is not None and legacy.exists():
+                # Read through JSONStorageService so a journal-mode store's pending entries are included
+                items = JSONStorageService(json_path=legacy, mode="snapshot", excel=False).list_appointments()
+            by_part: Dict[str, List[Dict]] = {}
+            for it in items:
+                by_part.setdefault(partition_key(it.get("Date")), []).append(it)
+            users: Dict[str, List[str]] = {}
+            for key, rows in by_part.items():
+                part = self._partition(key, create=True)
+                # Rows a crashed earlier split already copied are not added twice
+                have = {it.get("Id") for it in part.list_appointments() if it.get("Id")}
+                part.add_appointments([it for it in rows if it.get("Id") not in have])
+                for it in rows:
+                    parts = users.setdefault(it.get("UserID"), [])
+                    if key not in parts:
+                        parts.append(key)
+
+            def mutate(d: Dict[str, Any]) -> bool:
+                d["partitions"] = list(by_part)
+                d["users"] = {u: sorted(p) for u, p in users.items() if u is not None}
+                return True
+
+            self.manifest.update(mutate)
+        if items:
+            logger.info(f"split {len(items)} appointments from {legacy} into {len(by_part)} partitions")
+
+    def _partition(self, key: str, create: bool = False) -> Optional[JSONStorageService]:
+        with self._lock:
+            part = self._parts.get(key)
+            if part is None:
+                if not create and key not in self.manifest.partitions():
+                    return None
+                part = JSONStorageService(json_path=self.root / f"{key}.json", mode=self.mode, excel=False)
+                self._parts[key] = part
+            return part
+
+    def _export_excel(self) -> None:
+        exporter.schedule(self.xlsx_path, self.list_appointments)
+
+    def _latest(self, user_id: str) -> Tuple[Optional[str], Optional[Dict]]:
+        best: Tuple[Optional[str], Optional[Dict]] = (None, None)
+        for key in self.manifest.user_partitions(user_id):
+            part = self._partition(key)
+            if part is None:
+                continue
+            # Cross-month moves append to the target file, so file order is not creation order.
+            # Legacy rows have no CreatedAt; "" keeps them older than anything stamped, and
+            # among equals the later row wins.
+            for it in part.list_appointments(user_id=user_id):
+                if best[1] is None or (it.get("CreatedAt") or "") >= (best[1].get("CreatedAt") or ""):
+                    best = (key, it)
+        return best
+
+    def _claim(self, key: str, user_id: str, reserve: Callable[[JSONStorageService], Any]) -> Any:
+        """Run `reserve` on partition `key`, registering the user there only for as long as it succeeds."""
+        known = key in self.manifest.user_partitions(user_id)
+        # Manifest first: a stale entry is harmless, a missing one would hide the row
+        self.manifest.register(key, user_id)
+        part = self._partition(key, create=True)
+        result = None
+        try:
+            result = reserve(part)
+        finally:
+            if not result and not known and part.latest_for_user(user_id) is None:
+                self.manifest.unregister_user(key, user_id)
+        return result
+
+    # CRUD operations
+    def list_appointments(self, user_id: Optional[str] = None, include_archived: bool = False) -> List[Dict]:
+        keys = self.manifest.user_partitions(user_id) if user_id else self.manifest.partitions()
+        out: List[Dict] = []
+        for key in keys:
+            part = self._partition(key)
+            if part is not None:
+                out.extend(part.list_appointments(user_id=user_id))
+        if include_archived:
+            from .archive import with_archived
+
+            out = with_archived(out, self.archive_dir, user_id)
+        return out
+
+    def remove_appointments(self, ids: List[str], dated_before: Optional[str] = None) -> int:
+        removed = 0
+        for key in self.manifest.partitions():
+            part = self._partition(key)
+            if part is not None:
+                removed += part.remove_appointments(ids, dated_before=dated_before)
+        if removed:
+            self._export_excel()
+        return removed
+
+    def add_appointment(self, appt: Dict) -> bool:
+        key = partition_key(appt.get("Date"))
+        # Manifest first: a stale entry is harmless, a missing one would hide the row
+        self.manifest.register(key, appt.get("UserID"))
+        ok = self._partition(key, create=True).add_appointment(appt)
+        if ok:
+            self._export_excel()
+        return ok
+
+    def update_latest_for_user(self, user_id: str, updater: Callable[[Dict], Dict]) -> Optional[Dict]:
+        key, latest = self._latest(user_id)
+        if latest is None:
+            return None
+        updated = updater(dict(latest))
+        new_key = partition_key(updated.get("Date"))
+        if new_key == key:
+            result = self._partition(key).update_appointment(latest["Id"], lambda _: updated)
+        else:
+            # Moving across months: write the new copy before removing the old one
+            self.manifest.register(new_key, updated.get("UserID"))
+            if not self._partition(new_key, create=True).add_appointment(updated):
+                return None
+            self._partition(key).delete_appointment(latest["Id"])
+            result = updated
+        if result is not None:
+            self._export_excel()
+        return result
+
+    def move_slot(
+        self,
+        user_id: str,
+        date: str,
+        time: str,
+        day: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Atomically move the user's latest appointment to (date, time); None if they have none.
+
+        Within a month this is the partition's own atomic move. Across months the
+        moved copy is claimed in the target partition (failing with SlotTakenError
+        if the slot is held) before the old row is removed.
+        """
+        key, latest = self._latest(user_id)
+        if latest is None:
+            return None
+        new_key = partition_key(date)
+        if new_key == key:
+            result = self._partition(key).move_appointment(latest["Id"], date, time, day=day, mode=mode)
+        else:
+            rec = {**latest, "Date": date, "Time": time}
+            if day is not None:
+                rec["Day"] = day
+            if mode is not None:
+                rec["Mode"] = mode
+            if self.has_time_slot_taken(date, time) or not self._claim(new_key, user_id, lambda p: p._reserve(rec)):
+                raise SlotTakenError(f"slot {date} {time} is taken")
+            part = self._partition(key)
+            part.delete_appointment(latest["Id"])
+            if part.latest_for_user(user_id) is None:
+                self.manifest.unregister_user(key, user_id)
+            result = rec
+        if result is not None:
+            self._export_excel()
+        return result
+
+    def delete_latest_for_user(self, user_id: str) -> bool:
+        key, latest = self._latest(user_id)
+        if latest is None:
+            return False
+        part = self._partition(key)
+        ok = part.delete_appointment(latest["Id"])
+        if ok:
+            if part.latest_for_user(user_id) is None:
+                self.manifest.unregister_user(key, user_id)
+            self._export_excel()
+        return ok
+
+    # Conflict detection
+    def find_conflicts(self, date: str, time: str, user_id: str) -> List[Dict]:
+        part = self._partition(partition_key(date))
+        return part.find_conflicts(date, time, user_id) if part else []
+
+    def has_time_slot_taken(self, date: str, time: str) -> bool:
+        part = self._partition(partition_key(date))
+        return part.has_time_slot_taken(date, time) if part else False
+
+    def reserve_slot(
+        self,
+        date: str,
+        time: str,
+        user_id: str,
+        day: Optional[str] = None,
+        mode: str = "virtual",
+        notes: str = "",
+    ) -> Optional[Dict]:
+        # A taken slot is the common failure; it must not create a partition or a manifest entry
+        if self.has_time_slot_taken(date, time):
+            return None
+        saved = self._claim(
+            partition_key(date),
+            user_id,
+            lambda p: p.reserve_slot(date, time, user_id, day=day, mode=mode, notes=notes),
+        )
+        if saved is not None:
+            self._export_excel()
+        return saved
+
+    def save_appointment(
+        self,
+        date: str,
+        day: Optional[str],
+        time: str,
+        mode: str,
+        notes: str,
+        user_id: str,
+    ) -> Dict:
+        appt = {
+            "Id": str(uuid.uuid4()),
+            "Date": date,
+            "Day": day,
+            "Time": time,
+            "Mode": mode,
+            "Notes": notes,
+            "UserID": user_id,
+            "CreatedAt": _now_iso(),
+        }
+        ok = self.add_appointment(appt)
+        if not ok:
+            raise RuntimeError("Failed to persist appointment")
+        return appt
+
+    def close(self) -> None:
+        with self._lock:
+            parts = list(self._parts.values())
+        for part in parts:
+            part.close()
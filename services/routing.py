@@ -0,0 +1,167 @@
+import os
+import time
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional
+
+# Local answers at or above these confidences are final; below, the task escalates
+DEFAULT_THRESHOLDS: Dict[str, float] = {
+    "intent.classify_intent": 0.8,
+    "mode.infer_mode": 0.8,
+    "datetime.extract_datetime": 0.9,
+    "extraction.extract_booking": 0.8,
+}
+
+ROUTE_LOCAL = "local"  # local answer was confident enough
+ROUTE_LOCAL_ONLY = "local_only"  # nothing to escalate to (no remote endpoint or real LLM)
+ROUTE_LOCAL_UNSURE = "local_unsure"  # nothing to escalate to and the local answer is below threshold
+ROUTE_LOCAL_BUDGET = "local_budget"  # turn latency budget too low to escalate
+ROUTE_ESCALATE = "escalate"  # sent on to the remote server / LLM
+ROUTE_ESCALATE_TIMEOUT = "escalate_timeout"  # escalation overran the budget; local answer used
+
+_turn_deadline: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar("turn_deadline", default=None)
+
+
+def turn_deadline(budget_s: Optional[float] = None) -> Optional[float]:
+    """`time.monotonic()` deadline for a turn starting now; None when unlimited.
+
+    Defaults to TURN_LATENCY_BUDGET_S; 0 or unset means unlimited.
+    """
+    if budget_s is None:
+        budget_s = float(os.getenv("TURN_LATENCY_BUDGET_S", "0"))
+    return time.monotonic() + budget_s if budget_s > 0 else None
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[Optional[float]]:
+    """Make `deadline` the one MCP tasks awaited inside the block must meet.
+
+    None keeps whatever deadline is already in effect.
+    """
+    if deadline is None:
+        yield _turn_deadline.get()
+        return
+    token = _turn_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _turn_deadline.reset(token)
+
+
+@contextmanager
+def turn_budget(budget_s: Optional[float] = None) -> Iterator[Optional[float]]:
+    """Give every MCP task awaited inside the block a shared latency budget; yields the deadline."""
+    token = _turn_deadline.set(turn_deadline(budget_s))
+    try:
+        yield _turn_deadline.get()
+    finally:
+        _turn_deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current turn's budget, or None when unlimited."""
+    deadline = _turn_deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def _parse_thresholds(spec: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = float(value)
+    return out
+
+
+class RoutingPolicy:
+    """Decides per task whether a local answer is final or should escalate.
+
+    Tasks whose local result carries a `confidence` are answered locally when
+    it clears the task's threshold, when nothing better is configured, or when
+    the turn budget can't fit an escalation (ESCALATION_MIN_BUDGET_S). Tasks
+    without a local confidence keep the remote/LLM-first order. Every decision
+    is counted per task and route.
+
+    A local answer used below its threshold is returned flagged `unsure`, and
+    agents ask the user instead of acting on it.
+    """
+
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None, min_escalation_s: Optional[float] = None) -> None:
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        if os.getenv("ROUTE_CONFIDENCE_THRESHOLD"):
+            default = float(os.getenv("ROUTE_CONFIDENCE_THRESHOLD", "0.8"))
+            self.thresholds = {name: default for name in self.thresholds}
+        self.thresholds.update(_parse_thresholds(os.getenv("ROUTE_THRESHOLDS", "")))
+        self.thresholds.update(thresholds or {})
+        self.min_escalation_s = float(os.getenv("ESCALATION_MIN_BUDGET_S", "0.25")) if min_escalation_s is None else min_escalation_s
+        self._counts: Counter = Counter()
+        self._lock = Lock()
+
+    def record(self, name: str, route: str) -> None:
+        with self._lock:
+            self._counts[(name, route)] += 1
+
+    def decide(self, agent: str, task: str, local: Optional[Dict[str, Any]], can_escalate: bool, record: bool = True) -> str:
+        """Route for one task; `record=False` re-decides without counting the decision twice."""
+        name = f"{agent}.{task}"
+        confidence = local.get("confidence") if local else None
+        if not can_escalate:
+            unsure = confidence is not None and confidence < self.thresholds.get(name, 1.0)
+            route = ROUTE_LOCAL_UNSURE if unsure else ROUTE_LOCAL_ONLY
+        elif confidence is None:
+            route = ROUTE_ESCALATE
+        elif confidence >= self.thresholds.get(name, 1.0):
+            route = ROUTE_LOCAL
+        else:
+            remaining = remaining_budget()
+            route = ROUTE_LOCAL_BUDGET if remaining is not None and remaining < self.min_escalation_s else ROUTE_ESCALATE
+        if record:
+            self.record(name, route)
+        return route
+
+    def accepts(self, agent: str, task: str, answer: Optional[Dict[str, Any]]) -> bool:
+        """Whether an escalated answer is good enough to use.
+
+        A remote server answers from its own local tasks first, so its reply can
+        carry the same low confidence that made us escalate; such answers are
+        turned down in favour of the next tier.
+        """
+        confidence = answer.get("confidence") if answer else None
+        return confidence is None or confidence >= self.thresholds.get(f"{agent}.{task}", 1.0)
+
+    def escalation_timeout(self) -> Optional[float]:
+        """How long an escalation may take before the local answer is used instead."""
+        return remaining_budget()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            out: Dict[str, Dict[str, int]] = {}
+            for (name, route), n in self._counts.items():
+                out.setdefault(name, {})[route] = n
+            return out
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+_policy: Optional[RoutingPolicy] = None
+_policy_lock = Lock()
+
+
+def get_routing_policy() -> RoutingPolicy:
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = RoutingPolicy()
+    return _policy
+
+
+def set_routing_policy(policy: Optional[RoutingPolicy]) -> None:
+    """Install a custom policy (None rebuilds the default from the environment on next use)."""
+    global _policy
+    with _policy_lock:
+        _policy = policy
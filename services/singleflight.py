@@ -0,0 +1,80 @@
+import os
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+
+def singleflight_enabled() -> bool:
+    return os.getenv("MCP_SINGLEFLIGHT", "1") in {"1", "true", "True"}
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight invocation.
+
+    The first caller for a key starts `fn()` as a task; callers arriving while
+    it runs await the same task and get the same result or exception. A caller
+    that is cancelled (e.g. its deadline expired) only stops waiting; the call
+    itself is cancelled once nobody is waiting for it any more. Nothing is
+    remembered after the call finishes — that is what the task cache is for.
+    """
+
+    def __init__(self) -> None:
+        # Tasks belong to one event loop, and CLI/Streamlit use a fresh loop per turn
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Call]]" = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        call = calls.get(key)
+        if call is None:
+            call = calls[key] = _Call(loop.create_task(fn()))
+            call.task.add_done_callback(lambda _t, c=call: self._forget(calls, key, c))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                self._forget(calls, key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    @staticmethod
+    def _forget(calls: Dict[str, _Call], key: str, call: _Call) -> None:
+        if calls.get(key) is call:
+            del calls[key]
+
+    def in_flight(self) -> int:
+        try:
+            return len(self._calls.get(asyncio.get_running_loop(), {}))
+        except RuntimeError:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.shared
+        return {
+            "calls": total,
+            "coalesced": self.shared,
+            "coalesced_rate": (self.shared / total) if total else 0.0,
+        }
+
+
+async def coalesce(group: SingleFlight, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """`group.do(key, fn)` when MCP_SINGLEFLIGHT is on, otherwise just `await fn()`."""
+    if not singleflight_enabled():
+        return await fn()
+    return await group.do(key, fn)
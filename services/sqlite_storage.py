@@ -1,122 +1,377 @@
 import os
 import uuid
 import sqlite3
+import weakref
+from datetime import datetime, timezone
 from pathlib import Path
-from threading import RLock
-from typing import Dict, List, Optional, Tuple
+from threading import Lock, RLock, local
+from typing import Callable, Dict, List, Optional, Tuple
+from .logger import setup_logger
+
+logger = setup_logger("sqlite-storage")
 
 DATA_DIR = Path(os.getcwd()) / "data"
 
 
+def default_db_path() -> str:
+    return os.getenv("SQLITE_DB_PATH") or str(DATA_DIR / "appointments.db")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _configure_connection(conn: sqlite3.Connection) -> None:
+    """Per-connection tuning: WAL, relaxed fsync, mmap and a larger page cache."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is durable across application crashes in WAL mode; only an OS crash can lose the last commit
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}")
+    # Negative cache_size is in KiB
+    conn.execute(f"PRAGMA cache_size={-int(os.getenv('SQLITE_CACHE_KIB', '65536'))}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}")
+
+
+def _open_reader(db_path: Path) -> sqlite3.Connection:
+    """Open a read-only connection; WAL lets any number of these run alongside the writer."""
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}")
+    conn.execute(f"PRAGMA cache_size={-int(os.getenv('SQLITE_CACHE_KIB', '65536'))}")
+    conn.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}")
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class _Reader:
+    """One thread's read-only connection, closed once that thread's locals are released."""
+
+    __slots__ = ("conn", "close", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self.close = weakref.finalize(self, conn.close)
+
+
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS appointments (
+            Id TEXT PRIMARY KEY,
+            Date TEXT,
+            Day TEXT,
+            Time TEXT,
+            Mode TEXT,
+            Notes TEXT,
+            UserID TEXT
+        )
+        """
+    )
+
+
+def _migrate_v2(conn: sqlite3.Connection) -> None:
+    # Slot lookups (has_time_slot_taken, find_conflicts) are answered from the index alone
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_slot ON appointments(Date, Time, UserID)")
+    # Every SQLite index carries the rowid, so this is effectively (UserID, rowid)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_user ON appointments(UserID)")
+
+
+def _migrate_v3(conn: sqlite3.Connection) -> None:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(appointments)")}
+    if "CreatedAt" not in cols:
+        # Existing rows keep NULL, which sorts before any timestamp, so rowid still orders them
+        conn.execute("ALTER TABLE appointments ADD COLUMN CreatedAt TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_user_created ON appointments(UserID, CreatedAt)")
+
+
+def _migrate_v4(conn: sqlite3.Connection) -> Optional[bool]:
+    # One appointment per slot, enforced by the database
+    dupes = conn.execute(
+        "SELECT COUNT(*) FROM (SELECT 1 FROM appointments GROUP BY Date, Time HAVING COUNT(*) > 1)"
+    ).fetchone()[0]
+    if dupes:
+        # Legacy double bookings can't be indexed uniquely; reserve_slot's NOT EXISTS insert still guards new ones
+        logger.warning(f"{dupes} slot(s) already double-booked; can't create the unique slot index until they are resolved")
+        return False
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_appointments_slot ON appointments(Date, Time)")
+    return None
+
+
+# Ordered schema migrations; PRAGMA user_version records the last one applied.
+# A step that returns False could not be applied yet: the version stays put and it is retried on the next open.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], Optional[bool]]]] = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+]
+
+
 class SQLiteStorageService:
     """Minimal SQLite-backed storage with a compatible API to the JSON StorageService.
 
     This implementation is intentionally small and synchronous. It uses a table
     `appointments` with columns matching keys used elsewhere in the project.
+
+    Writes go through a single connection serialized by `_lock`. Pure reads
+    (`list_appointments`, `find_conflicts`, `has_time_slot_taken`) use a
+    read-only connection per thread, so concurrent server threads read in
+    parallel under WAL instead of queueing behind the writer lock.
     """
 
     def __init__(self, db_path: Optional[str] = None) -> None:
         DATA_DIR.mkdir(parents=True, exist_ok=True)
-        db_path = db_path or os.getenv("SQLITE_DB_PATH") or str(DATA_DIR / "appointments.db")
+        db_path = db_path or default_db_path()
         self.db_path = Path(db_path)
+        self.archive_dir = self.db_path.parent / "archive"
         self._lock = RLock()
         # Use check_same_thread=False since we protect with a lock
         self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
-        self._ensure_table()
+        _configure_connection(self.conn)
+        self._migrate()
+        # An in-memory database is private to its connection, so readers must share the writer
+        self._shared_reads = str(db_path) == ":memory:"
+        self._local = local()
+        # Weak: threadpool churn must not keep connections of finished threads open
+        self._readers: "weakref.WeakSet[_Reader]" = weakref.WeakSet()
+        self._readers_lock = Lock()
 
-    def _ensure_table(self) -> None:
-        with self._lock, self.conn:
-            self.conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS appointments (
-                    Id TEXT PRIMARY KEY,
-                    Date TEXT,
-                    Day TEXT,
-                    Time TEXT,
-                    Mode TEXT,
-                    Notes TEXT,
-                    UserID TEXT
-                )
-                """
-            )
+    def _reader(self) -> sqlite3.Connection:
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = _Reader(_open_reader(self.db_path))
+            self._local.reader = reader
+            with self._readers_lock:
+                self._readers.add(reader)
+        return reader.conn
 
-    def list_appointments(self, user_id: Optional[str] = None) -> List[Dict]:
+    def _read(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        if self._shared_reads:
+            with self._lock:
+                return self.conn.execute(sql, params).fetchall()
+        return self._reader().execute(sql, params).fetchall()
+
+    def _migrate(self) -> None:
         with self._lock:
-            cur = self.conn.cursor()
-            if user_id:
-                cur.execute("SELECT * FROM appointments WHERE UserID = ?", (user_id,))
-            else:
-                cur.execute("SELECT * FROM appointments")
-            rows = cur.fetchall()
-            return [dict(r) for r in rows]
+            current = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for version, step in MIGRATIONS:
+                if version <= current:
+                    continue
+                with self.conn:
+                    applied = step(self.conn) is not False
+                    if applied:
+                        self.conn.execute(f"PRAGMA user_version = {version}")
+                if not applied:
+                    logger.warning(f"{self.db_path} stays at schema v{version - 1}; migration to v{version} will be retried")
+                    break
+                logger.info(f"migrated {self.db_path} to schema v{version}")
 
-    def add_appointment(self, appt: Dict) -> bool:
+    def close(self) -> None:
+        with self._readers_lock:
+            readers = list(self._readers)
+            self._readers.clear()
+        for reader in readers:
+            reader.close()
+        with self._lock:
+            self.conn.close()
+
+    def list_appointments(self, user_id: Optional[str] = None, include_archived: bool = False) -> List[Dict]:
+        if user_id:
+            rows = self._read("SELECT * FROM appointments WHERE UserID = ? ORDER BY CreatedAt, rowid", (user_id,))
+        else:
+            rows = self._read("SELECT * FROM appointments")
+        items = [dict(r) for r in rows]
+        if include_archived:
+            from .archive import with_archived
+
+            items = with_archived(items, self.archive_dir, user_id)
+        return items
+
+    def remove_appointments(self, ids: List[str], dated_before: Optional[str] = None) -> int:
+        removed = 0
         with self._lock, self.conn:
-            self.conn.execute(
-                "INSERT INTO appointments(Id, Date, Day, Time, Mode, Notes, UserID) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (
-                    appt.get("Id"),
-                    appt.get("Date"),
-                    appt.get("Day"),
-                    appt.get("Time"),
-                    appt.get("Mode"),
-                    appt.get("Notes"),
-                    appt.get("UserID"),
-                ),
-            )
-            return True
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                sql = f"DELETE FROM appointments WHERE Id IN ({','.join('?' * len(chunk))})"
+                params = tuple(chunk)
+                if dated_before is not None:
+                    # Rows rescheduled since they were selected stay live
+                    sql += " AND Date < ?"
+                    params += (dated_before,)
+                cur = self.conn.execute(sql, params)
+                removed += cur.rowcount
+        return removed
+
+    def add_appointment(self, appt: Dict) -> bool:
+        """Insert `appt`; raises SlotTakenError if the unique slot index already holds its (Date, Time)."""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO appointments(Id, Date, Day, Time, Mode, Notes, UserID, CreatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        appt.get("Id"),
+                        appt.get("Date"),
+                        appt.get("Day"),
+                        appt.get("Time"),
+                        appt.get("Mode"),
+                        appt.get("Notes"),
+                        appt.get("UserID"),
+                        appt.get("CreatedAt") or _now_iso(),
+                    ),
+                )
+        except sqlite3.IntegrityError as e:
+            # Duplicate Ids still surface as IntegrityError; only the slot index means "taken"
+            if "appointments.Date" not in str(e):
+                raise
+            from .storage import SlotTakenError
+
+            raise SlotTakenError(f"slot {appt.get('Date')} {appt.get('Time')} is taken") from e
+        return True
 
     def _get_latest_for_user(self, user_id: str) -> Optional[Dict]:
         with self._lock:
             cur = self.conn.cursor()
-            cur.execute("SELECT * FROM appointments WHERE UserID = ? ORDER BY rowid DESC LIMIT 1", (user_id,))
+            cur.execute("SELECT * FROM appointments WHERE UserID = ? ORDER BY CreatedAt DESC, rowid DESC LIMIT 1", (user_id,))
             row = cur.fetchone()
             return dict(row) if row else None
 
     def update_latest_for_user(self, user_id: str, updater) -> Optional[Dict]:
+        with self._lock:
+            return self._update_latest_locked(user_id, updater)
+
+    def _update_latest_locked(self, user_id: str, updater) -> Optional[Dict]:
+        # Read and write on the writer connection under one lock hold
         latest = self._get_latest_for_user(user_id)
         if not latest:
             return None
         updated = updater(dict(latest))
-        with self._lock, self.conn:
-            self.conn.execute(
-                "UPDATE appointments SET Date=?, Day=?, Time=?, Mode=?, Notes=?, UserID=? WHERE Id=?",
-                (
-                    updated.get("Date"),
-                    updated.get("Day"),
-                    updated.get("Time"),
-                    updated.get("Mode"),
-                    updated.get("Notes"),
-                    updated.get("UserID"),
-                    updated.get("Id"),
-                ),
-            )
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE appointments SET Date=?, Day=?, Time=?, Mode=?, Notes=?, UserID=? WHERE Id=?",
+                    (
+                        updated.get("Date"),
+                        updated.get("Day"),
+                        updated.get("Time"),
+                        updated.get("Mode"),
+                        updated.get("Notes"),
+                        updated.get("UserID"),
+                        updated.get("Id"),
+                    ),
+                )
+        except sqlite3.IntegrityError:
+            logger.warning(f"slot {updated.get('Date')} {updated.get('Time')} already taken; not rescheduling")
+            return None
         return updated
 
     def delete_latest_for_user(self, user_id: str) -> bool:
-        latest = self._get_latest_for_user(user_id)
-        if not latest:
-            return False
-        with self._lock, self.conn:
-            self.conn.execute("DELETE FROM appointments WHERE Id = ?", (latest.get("Id"),))
-        return True
+        with self._lock:
+            latest = self._get_latest_for_user(user_id)
+            if not latest:
+                return False
+            with self.conn:
+                self.conn.execute("DELETE FROM appointments WHERE Id = ?", (latest.get("Id"),))
+            return True
 
     def find_conflicts(self, date: str, time: str, user_id: str) -> List[Dict]:
-        with self._lock:
-            cur = self.conn.cursor()
-            cur.execute(
-                "SELECT * FROM appointments WHERE Date = ? AND Time = ? AND UserID = ?",
-                (date, time, user_id),
-            )
-            rows = cur.fetchall()
-            return [dict(r) for r in rows]
+        rows = self._read(
+            "SELECT * FROM appointments WHERE Date = ? AND Time = ? AND UserID = ?",
+            (date, time, user_id),
+        )
+        return [dict(r) for r in rows]
 
     def has_time_slot_taken(self, date: str, time: str) -> bool:
+        rows = self._read("SELECT 1 FROM appointments WHERE Date = ? AND Time = ? LIMIT 1", (date, time))
+        return bool(rows)
+
+    def reserve_slot(
+        self,
+        date: str,
+        time: str,
+        user_id: str,
+        day: Optional[str] = None,
+        mode: str = "virtual",
+        notes: str = "",
+    ) -> Optional[Dict]:
+        """Atomically book (date, time) if nobody holds it. Returns the appointment, or None if taken.
+
+        A single INSERT ... WHERE NOT EXISTS statement, backed by the unique slot
+        index, so the check and the write can't interleave even across processes.
+        """
+        appt = {
+            "Id": str(uuid.uuid4()),
+            "Date": date,
+            "Day": day,
+            "Time": time,
+            "Mode": mode,
+            "Notes": notes,
+            "UserID": user_id,
+            "CreatedAt": _now_iso(),
+        }
+        try:
+            with self._lock, self.conn:
+                cur = self.conn.execute(
+                    "INSERT INTO appointments(Id, Date, Day, Time, Mode, Notes, UserID, CreatedAt) "
+                    "SELECT ?, ?, ?, ?, ?, ?, ?, ? "
+                    "WHERE NOT EXISTS (SELECT 1 FROM appointments WHERE Date = ? AND Time = ?)",
+                    (appt["Id"], date, day, time, mode, notes, user_id, appt["CreatedAt"], date, time),
+                )
+        except sqlite3.IntegrityError:
+            return None
+        return appt if cur.rowcount == 1 else None
+
+    def move_appointment(
+        self,
+        appt_id: str,
+        date: str,
+        time: str,
+        day: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Atomically move one appointment to (date, time). Returns it, or None if `appt_id` is unknown.
+
+        The UPDATE carries its own NOT EXISTS check (ignoring the row being
+        moved), backed by the unique slot index; raises SlotTakenError if taken.
+        """
         with self._lock:
-            cur = self.conn.cursor()
-            cur.execute("SELECT 1 FROM appointments WHERE Date = ? AND Time = ? LIMIT 1", (date, time))
-            return cur.fetchone() is not None
+            row = self.conn.execute("SELECT * FROM appointments WHERE Id = ?", (appt_id,)).fetchone()
+            return self._move_locked(dict(row), date, time, day, mode) if row else None
+
+    def move_slot(
+        self,
+        user_id: str,
+        date: str,
+        time: str,
+        day: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Atomically move the user's latest appointment to (date, time); None if they have none."""
+        with self._lock:
+            latest = self._get_latest_for_user(user_id)
+            return self._move_locked(latest, date, time, day, mode) if latest else None
+
+    def _move_locked(self, current: Dict, date: str, time: str, day: Optional[str], mode: Optional[str]) -> Dict:
+        from .storage import SlotTakenError
+
+        rec = {**current, "Date": date, "Time": time}
+        if day is not None:
+            rec["Day"] = day
+        if mode is not None:
+            rec["Mode"] = mode
+        try:
+            with self.conn:
+                cur = self.conn.execute(
+                    "UPDATE appointments SET Date=?, Day=?, Time=?, Mode=? WHERE Id=? "
+                    "AND NOT EXISTS (SELECT 1 FROM appointments WHERE Date = ? AND Time = ? AND Id != ?)",
+                    (date, rec.get("Day"), time, rec.get("Mode"), rec["Id"], date, time, rec["Id"]),
+                )
+        except sqlite3.IntegrityError:
+            cur = None
+        if cur is None or cur.rowcount != 1:
+            raise SlotTakenError(f"slot {date} {time} is taken")
+        return rec
 
     def save_appointment(self, date: str, day: Optional[str], time: str, mode: str, notes: str, user_id: str) -> Dict:
         appt = {
@@ -127,6 +382,7 @@ class SQLiteStorageService:
             "Mode": mode,
             "Notes": notes,
             "UserID": user_id,
+            "CreatedAt": _now_iso(),
         }
         ok = self.add_appointment(appt)
         if not ok:
@@ -1,12 +1,16 @@
 import os
 import json
+import atexit
+import itertools
+from datetime import datetime, timezone
 import uuid
-from typing import Dict, List, Optional, Callable, Tuple
+from typing import Any, Dict, List, Optional, Callable, Tuple
 from pathlib import Path
-import pandas as pd
 import tempfile
-import shutil
-from threading import RLock
+from threading import Event, RLock, Thread
+from time import monotonic
+from .excel_export import exporter
+from .interprocess import FileLock, GenerationCounter
 from .logger import setup_logger
 
 logger = setup_logger("storage")
@@ -17,15 +21,40 @@ XLSX_PATH = DATA_DIR / "appointments.xlsx"
 
 _lock = RLock()
 
+# Striped per-slot locks: bookings for different (Date, Time) slots don't wait on each other
+_SLOT_STRIPES = 64
+_slot_locks = [RLock() for _ in range(_SLOT_STRIPES)]
 
-def _atomic_write_json(path: Path, data: List[Dict]) -> Tuple[bool, Optional[str]]:
-    try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with tempfile.NamedTemporaryFile("w", delete=False, dir=str(path.parent), encoding="utf-8") as tmp:
+# Every committed or reloaded view gets a new version; reserve_slot compares it to detect races
+_versions = itertools.count(1)
+
+
+def _slot_lock(date: str, time: str) -> RLock:
+    return _slot_locks[hash((date, time)) % _SLOT_STRIPES]
+
+
+class SlotTakenError(RuntimeError):
+    """The target slot of a move is held by another appointment."""
+
+
+def _write_temp_json(path: Path, data: List[Dict]) -> Path:
+    """Write `data` to a synced temporary file next to `path`, ready to be renamed over it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", delete=False, dir=str(path.parent), encoding="utf-8") as tmp:
+        try:
             json.dump(data, tmp, indent=2)
             tmp.flush()
             os.fsync(tmp.fileno())
-            tmp_path = Path(tmp.name)
+        except BaseException:
+            tmp.close()
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+    return Path(tmp.name)
+
+
+def _atomic_write_json(path: Path, data: List[Dict]) -> Tuple[bool, Optional[str]]:
+    try:
+        tmp_path = _write_temp_json(path, data)
         os.replace(str(tmp_path), str(path))
         # Validate by re-open
         with path.open("r", encoding="utf-8") as f:
@@ -42,91 +71,572 @@ def _atomic_write_json(path: Path, data: List[Dict]) -> Tuple[bool, Optional[str
             pass
 
 
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class _AppointmentIndex:
+    """In-memory indexed view of the appointment list.
+
+    Records are kept in file order in `by_key`; `by_slot` and `by_user` hold
+    ordered sub-views so slot and per-user lookups do not scan the list.
+    """
+
+    def __init__(self, items: List[Dict], stamp: Optional[Tuple[int, int, int]] = None) -> None:
+        self.stamp = stamp
+        self.by_key: Dict[str, Dict] = {}
+        self.by_id: Dict[str, str] = {}
+        self.by_slot: Dict[Tuple[Any, Any], Dict[str, Dict]] = {}
+        self.by_user: Dict[Any, Dict[str, Dict]] = {}
+        self._seq = 0
+        # Journal bookkeeping: stamp/offset of the replayed prefix and records not yet compacted
+        self.journal_stamp: Optional[Tuple[int, int, int]] = None
+        self.journal_offset = 0
+        self.journal_records = 0
+        self.version = next(_versions)
+        # Cross-process generation this view reflects, and when its file stamps were last checked
+        self.generation: Optional[int] = None
+        self.checked_at = 0.0
+        for it in items:
+            self.add(it)
+
+    def _new_key(self, appt_id: Optional[str]) -> str:
+        self._seq += 1
+        if appt_id and appt_id not in self.by_id:
+            return appt_id
+        # Legacy rows without an Id (or with a duplicated one) get a private key
+        return f"_row{self._seq}"
+
+    def add(self, appt: Dict) -> str:
+        key = self._new_key(appt.get("Id"))
+        self.by_key[key] = appt
+        if appt.get("Id") and appt.get("Id") not in self.by_id:
+            self.by_id[appt["Id"]] = key
+        self.by_slot.setdefault((appt.get("Date"), appt.get("Time")), {})[key] = appt
+        self.by_user.setdefault(appt.get("UserID"), {})[key] = appt
+        return key
+
+    def _unlink(self, key: str, appt: Dict) -> None:
+        slot = (appt.get("Date"), appt.get("Time"))
+        bucket = self.by_slot.get(slot)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.by_slot[slot]
+        bucket = self.by_user.get(appt.get("UserID"))
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.by_user[appt.get("UserID")]
+
+    def replace(self, key: str, appt: Dict) -> None:
+        old = self.by_key[key]
+        self._unlink(key, old)
+        if old.get("Id") and self.by_id.get(old["Id"]) == key:
+            del self.by_id[old["Id"]]
+        # Assigning an existing key keeps the record's position in file order
+        self.by_key[key] = appt
+        if appt.get("Id") and appt.get("Id") not in self.by_id:
+            self.by_id[appt["Id"]] = key
+        self.by_slot.setdefault((appt.get("Date"), appt.get("Time")), {})[key] = appt
+        # Per-user order follows file order, so rebuild this user's bucket when it changes owner
+        if old.get("UserID") == appt.get("UserID") and appt.get("UserID") in self.by_user:
+            self.by_user[appt.get("UserID")][key] = appt
+        else:
+            self._rebuild_user(appt.get("UserID"))
+
+    def remove(self, key: str) -> Dict:
+        appt = self.by_key.pop(key)
+        self._unlink(key, appt)
+        if appt.get("Id") and self.by_id.get(appt["Id"]) == key:
+            del self.by_id[appt["Id"]]
+        return appt
+
+    def _rebuild_user(self, user_id: Any) -> None:
+        bucket = {k: it for k, it in self.by_key.items() if it.get("UserID") == user_id}
+        if bucket:
+            self.by_user[user_id] = bucket
+        else:
+            self.by_user.pop(user_id, None)
+
+    def latest_key_for_user(self, user_id: str) -> Optional[str]:
+        bucket = self.by_user.get(user_id)
+        if not bucket:
+            return None
+        return next(reversed(bucket))
+
+    def apply(self, entry: Dict) -> None:
+        """Replay one journal entry. Entries are idempotent so a replay over a newer snapshot is safe."""
+        op = entry.get("op")
+        if op in {"add", "update"}:
+            rec = entry.get("rec") or {}
+            key = self.by_id.get(entry.get("id") or rec.get("Id"))
+            if key is None:
+                self.add(rec)
+            else:
+                self.replace(key, rec)
+        elif op == "delete":
+            key = self.by_id.get(entry.get("id"))
+            if key is not None:
+                self.remove(key)
+
+    def items(self) -> List[Dict]:
+        return list(self.by_key.values())
+
+
+def _read_journal(path: Path, offset: int) -> Tuple[List[Dict], int]:
+    """Read complete journal lines from `offset`; a torn trailing line (crash mid-append) is left unread."""
+    try:
+        with path.open("rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+    except FileNotFoundError:
+        return [], 0
+    entries: List[Dict] = []
+    end = chunk.rfind(b"\n") + 1
+    for line in chunk[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            logger.warning(f"Skipping corrupt journal line in {path}")
+    return entries, offset + end
+
+
+class _MutationLock:
+    # File lock first: waiting on another process must not hold `_lock`, which every reader needs
+    def __init__(self, flock: FileLock) -> None:
+        self.flock = flock
+
+    def __enter__(self) -> None:
+        self.flock.acquire()
+        try:
+            _lock.acquire()
+        except BaseException:
+            self.flock.release()
+            raise
+
+    def __exit__(self, *exc: object) -> None:
+        try:
+            _lock.release()
+        finally:
+            self.flock.release()
+
+
+def _storage_mode() -> str:
+    return os.getenv("JSON_STORAGE_MODE", "snapshot").lower()
+
+
+# One cached view per JSON file, shared by every StorageService instance
+_views: Dict[str, _AppointmentIndex] = {}
+
+# Cross-process lock and generation counter per JSON file, shared by every instance
+_file_locks: Dict[str, FileLock] = {}
+_generations: Dict[str, GenerationCounter] = {}
+
+# Journal-mode stores known to the background compactor, keyed by snapshot path
+_journal_stores: Dict[str, "StorageService"] = {}
+_compact_wakeup = Event()
+_compactor: Optional[Thread] = None
+
+
+def _compaction_loop() -> None:
+    interval = float(os.getenv("JSON_JOURNAL_COMPACT_INTERVAL", "30"))
+    while True:
+        _compact_wakeup.wait(timeout=interval)
+        _compact_wakeup.clear()
+        for store in list(_journal_stores.values()):
+            try:
+                store.compact()
+            except Exception as e:
+                logger.warning(f"Journal compaction failed for {store.json_path}: {e}")
+
+
+def _start_compactor() -> None:
+    global _compactor
+    with _lock:
+        if _compactor is None or not _compactor.is_alive():
+            _compactor = Thread(target=_compaction_loop, name="json-journal-compactor", daemon=True)
+            _compactor.start()
+
+
 class StorageService:
-    def __init__(self) -> None:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        if not JSON_PATH.exists():
-            success, err = _atomic_write_json(JSON_PATH, [])
-            if not success:
-                raise RuntimeError(f"Failed initializing storage: {err}")
+    """JSON-file storage.
 
-    def _load_json(self) -> List[Dict]:
+    In the default `snapshot` mode every mutation rewrites the whole file. With
+    `JSON_STORAGE_MODE=journal` mutations are appended to a JSON-lines journal
+    next to the snapshot (one fsync each) and a background thread periodically
+    folds the journal back into the snapshot. Readers always see snapshot +
+    journal, so a crash between the two only needs a replay of the journal tail.
+
+    Mutations hold an advisory lock on `<name>.lock` so several processes
+    (uvicorn workers, the Streamlit app) can share one file, and bump a
+    generation counter in `<name>.gen`. Readers compare that memory-mapped
+    counter with their cached view and only look at the files when it moved
+    (or every JSON_VIEW_RECHECK_S seconds, to catch edits made by hand).
+    """
+
+    def __init__(self, json_path: Optional[Path] = None, mode: Optional[str] = None, excel: bool = True) -> None:
+        self.json_path = Path(json_path) if json_path else JSON_PATH
+        self.xlsx_path = XLSX_PATH if json_path is None else self.json_path.with_suffix(".xlsx")
+        self.excel = excel
+        self.archive_dir = self.json_path.parent / "archive"
+        self.journal_path = self.json_path.with_suffix(".journal.jsonl")
+        self.journal_mode = (mode or _storage_mode()) == "journal"
+        self.compact_every = int(os.getenv("JSON_JOURNAL_COMPACT_EVERY", "1000"))
+        self.recheck_s = float(os.getenv("JSON_VIEW_RECHECK_S", "1.0"))
+        self.json_path.parent.mkdir(parents=True, exist_ok=True)
         with _lock:
+            key = str(self.json_path)
+            if key not in _file_locks:
+                _file_locks[key] = FileLock(self.json_path.with_suffix(".lock"))
+                _generations[key] = GenerationCounter(self.json_path.with_suffix(".gen"))
+            self._flock = _file_locks[key]
+            self._gen = _generations[key]
+        with self._mutating():
+            if not self.json_path.exists():
+                success, err = _atomic_write_json(self.json_path, [])
+                if not success:
+                    raise RuntimeError(f"Failed initializing storage: {err}")
+        if self.journal_mode:
+            _journal_stores[str(self.json_path)] = self
+            _start_compactor()
+
+    def _mutating(self):
+        """Thread lock plus the cross-process file lock; hold it for any read-modify-write."""
+        return _MutationLock(self._flock)
+
+    def _view(self) -> _AppointmentIndex:
+        """Return the indexed view, re-parsing only what changed on disk since the last call."""
+        with _lock:
+            key = str(self.json_path)
+            # Read the generation before the files so a racing commit can only make us re-check later
+            gen = self._gen.read()
+            now = monotonic()
+            view = _views.get(key)
+            if view is not None and view.generation == gen and now - view.checked_at < self.recheck_s:
+                return view
+            view = self._refresh(view)
+            view.generation = gen
+            view.checked_at = now
+            return view
+
+    def _refresh(self, view: Optional[_AppointmentIndex]) -> _AppointmentIndex:
+        with _lock:
+            key = str(self.json_path)
+            stamp = _file_stamp(self.json_path)
+            jstamp = _file_stamp(self.journal_path)
+            if view is not None and view.stamp == stamp:
+                if view.journal_stamp == jstamp:
+                    return view
+                # Same journal file that only grew: replay just the new tail
+                same_file = view.journal_stamp is None or (jstamp and jstamp[2] == view.journal_stamp[2])
+                if jstamp and same_file and jstamp[1] >= view.journal_offset:
+                    entries, view.journal_offset = _read_journal(self.journal_path, view.journal_offset)
+                    for entry in entries:
+                        view.apply(entry)
+                    view.journal_records += len(entries)
+                    view.journal_stamp = jstamp
+                    if entries:
+                        view.version = next(_versions)
+                    return view
             try:
-                with JSON_PATH.open("r", encoding="utf-8") as f:
-                    return json.load(f)
+                with self.json_path.open("r", encoding="utf-8") as f:
+                    items = json.load(f)
             except FileNotFoundError:
-                return []
+                items = []
+            view = _AppointmentIndex(items, stamp)
+            entries, view.journal_offset = _read_journal(self.journal_path, 0)
+            for entry in entries:
+                view.apply(entry)
+            view.journal_records = len(entries)
+            view.journal_stamp = jstamp
+            _views[key] = view
+            return view
+
+    def _load_json(self) -> List[Dict]:
+        return self._view().items()
 
     def _save_json(self, items: List[Dict]) -> bool:
         with _lock:
-            ok, err = _atomic_write_json(JSON_PATH, items)
+            ok, err = _atomic_write_json(self.json_path, items)
             if not ok:
                 logger.error(f"Failed to save JSON: {err}")
                 return False
-            try:
-                df = pd.DataFrame(items)
-                df.to_excel(str(XLSX_PATH), index=False)
-            except Exception as e:
-                logger.warning(f"Failed to write Excel: {e}")
+            self._truncate_journal()
+            self._export_excel()
             return True
 
+    def _export_excel(self) -> None:
+        if not self.excel:
+            return
+        # Deferred: the exporter coalesces bursts and reads the latest view when it runs
+        exporter.schedule(self.xlsx_path, self._load_json)
+
+    def _truncate_journal(self) -> None:
+        # Only called right after a snapshot that already contains every journaled entry
+        if self.journal_path.exists():
+            with self.journal_path.open("r+b") as f:
+                f.truncate(0)
+                os.fsync(f.fileno())
+
+    def _append_journal(self, view: _AppointmentIndex, entries: List[Dict]) -> bool:
+        unseen = False
+        try:
+            with self.journal_path.open("a+b") as f:
+                end = f.seek(0, os.SEEK_END)
+                if end > view.journal_offset:
+                    f.seek(view.journal_offset)
+                    tail = f.read()
+                    complete = tail.rfind(b"\n") + 1
+                    last = tail[complete:]
+                    # Complete lines past our offset belong to another writer: keep them and replay them later
+                    unseen = bool(tail[:complete].strip())
+                    if last.strip():
+                        try:
+                            json.loads(last)
+                        except ValueError:
+                            # Only an unparseable last line is a torn tail left by a crash
+                            f.truncate(view.journal_offset + complete)
+                        else:
+                            f.write(b"\n")
+                            unseen = True
+                start = f.seek(0, os.SEEK_END)
+                try:
+                    f.write(b"".join(json.dumps(e, separators=(",", ":")).encode("utf-8") + b"\n" for e in entries))
+                    f.flush()
+                    os.fsync(f.fileno())
+                except OSError:
+                    # Not durable, so it must not be replayed either
+                    f.truncate(start)
+                    raise
+                if not unseen:
+                    view.journal_offset = f.tell()
+        except OSError as e:
+            logger.error(f"Journal append failed: {e}")
+            return False
+        # With unseen entries the offset stays put: the next refresh replays them and (idempotently) ours
+        view.journal_stamp = None if unseen else _file_stamp(self.journal_path)
+        if unseen:
+            view.checked_at = float("-inf")
+        view.journal_records += len(entries)
+        if view.journal_records >= self.compact_every:
+            _compact_wakeup.set()
+        return True
+
+    def _commit(self, view: _AppointmentIndex, entries: List[Dict]) -> bool:
+        """Persist a mutated view and keep it as the cached one; drop it on failure."""
+        key = str(self.json_path)
+        # Rows without an Id cannot be addressed by the journal, so they force a snapshot
+        journaled = self.journal_mode and all((e.get("rec") or {}).get("Id") or e.get("id") for e in entries)
+        if journaled:
+            ok = self._append_journal(view, entries)
+            if ok:
+                self._export_excel()
+        else:
+            ok = self._save_json(view.items())
+            if ok:
+                view.stamp = _file_stamp(self.json_path)
+                view.journal_stamp = _file_stamp(self.journal_path)
+                view.journal_offset = 0
+                view.journal_records = 0
+        if not ok:
+            _views.pop(key, None)
+            return False
+        view.version = next(_versions)
+        view.generation = self._gen.bump()
+        _views[key] = view
+        return True
+
+    def compact(self) -> bool:
+        """Fold the journal into the snapshot. Returns False when there was nothing to fold (or it lost a race).
+
+        The snapshot is written outside the locks so readers and writers keep
+        going; the locks are only re-taken to swap the files in. Entries
+        journaled meanwhile are carried over into the new journal.
+        """
+        with self._mutating():
+            view = self._view()
+            if not view.journal_records:
+                return False
+            items = view.items()
+            folded = view.journal_offset
+            snapshot_stamp = view.stamp
+            journal_stamp = _file_stamp(self.journal_path)
+        try:
+            tmp_path = _write_temp_json(self.json_path, items)
+        except Exception as e:
+            logger.error(f"Failed to compact journal: {e}")
+            return False
+        try:
+            with self._mutating():
+                view = self._view()
+                current = _file_stamp(self.journal_path)
+                same_journal = bool(current and journal_stamp and current[2] == journal_stamp[2] and current[1] >= folded)
+                if view.stamp != snapshot_stamp or not same_journal:
+                    # Another snapshot write or compaction got there first
+                    return False
+                with self.journal_path.open("rb") as f:
+                    f.seek(folded)
+                    tail = f.read()
+                os.replace(str(tmp_path), str(self.json_path))
+                self._replace_journal(tail)
+                consumed = view.journal_offset - folded
+                view.stamp = _file_stamp(self.json_path)
+                view.journal_offset = consumed
+                # Entries past our offset (another process's) are replayed on the next read
+                view.journal_stamp = _file_stamp(self.journal_path) if consumed == len(tail) else None
+                if view.journal_stamp is None:
+                    view.checked_at = float("-inf")
+                view.generation = self._gen.bump()
+                kept = tail.count(b"\n")
+                logger.info(f"compacted {view.journal_records - kept} journal entries into {self.json_path}")
+                view.journal_records = kept
+                return True
+        except OSError as e:
+            logger.error(f"Failed to compact journal: {e}")
+            return False
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _replace_journal(self, tail: bytes) -> None:
+        """Atomically replace the journal with `tail`, the entries a compaction did not fold."""
+        with tempfile.NamedTemporaryFile("wb", delete=False, dir=str(self.journal_path.parent)) as tmp:
+            tmp.write(tail)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp.name, str(self.journal_path))
+
     # CRUD operations
-    def list_appointments(self, user_id: Optional[str] = None) -> List[Dict]:
-        items = self._load_json()
-        if user_id:
-            items = [it for it in items if it.get("UserID") == user_id]
+    def list_appointments(self, user_id: Optional[str] = None, include_archived: bool = False) -> List[Dict]:
+        with _lock:
+            view = self._view()
+            if user_id:
+                items = [dict(it) for it in view.by_user.get(user_id, {}).values()]
+            else:
+                items = [dict(it) for it in view.by_key.values()]
+        if include_archived:
+            from .archive import with_archived
+
+            items = with_archived(items, self.archive_dir, user_id)
         return items
 
     def add_appointment(self, appt: Dict) -> bool:
-        items = self._load_json()
-        items.append(appt)
-        ok = self._save_json(items)
+        with self._mutating():
+            view = self._view()
+            rec = dict(appt)
+            view.add(rec)
+            ok = self._commit(view, [{"op": "add", "rec": rec}])
+        if ok:
+            logger.info(f"wrote appointment id={appt.get('Id')} to {self.json_path}")
+        return ok
+
+    def add_appointments(self, appts: List[Dict]) -> bool:
+        """Add several appointments in one commit (one snapshot write or one journal append)."""
+        if not appts:
+            return True
+        with self._mutating():
+            view = self._view()
+            recs = [dict(a) for a in appts]
+            for rec in recs:
+                view.add(rec)
+            ok = self._commit(view, [{"op": "add", "rec": rec} for rec in recs])
         if ok:
-            logger.info(f"wrote appointment id={appt.get('Id')} to {JSON_PATH}")
+            logger.info(f"wrote {len(appts)} appointments to {self.json_path}")
         return ok
 
+    def remove_appointments(self, ids: List[str], dated_before: Optional[str] = None) -> int:
+        """Remove appointments by Id in one commit; returns how many were removed.
+
+        With `dated_before`, only rows whose Date is still earlier than it are
+        removed, so a row rescheduled since it was selected stays live.
+        """
+        with self._mutating():
+            view = self._view()
+            removed = [
+                i
+                for i in dict.fromkeys(ids)
+                if view.by_id.get(i) is not None
+                and (dated_before is None or str(view.by_key[view.by_id[i]].get("Date") or "") < dated_before)
+            ]
+            if not removed:
+                return 0
+            for appt_id in removed:
+                view.remove(view.by_id[appt_id])
+            ok = self._commit(view, [{"op": "delete", "id": i} for i in removed])
+        return len(removed) if ok else 0
+
+    def latest_for_user(self, user_id: str) -> Optional[Dict]:
+        with _lock:
+            view = self._view()
+            key = view.latest_key_for_user(user_id)
+            return dict(view.by_key[key]) if key is not None else None
+
+    def update_appointment(self, appt_id: str, updater: Callable[[Dict], Dict]) -> Optional[Dict]:
+        with self._mutating():
+            view = self._view()
+            key = view.by_id.get(appt_id)
+            if key is None:
+                return None
+            updated = updater(dict(view.by_key[key]))
+            view.replace(key, dict(updated))
+            ok = self._commit(view, [{"op": "update", "id": appt_id, "rec": dict(updated)}])
+        return updated if ok else None
+
+    def delete_appointment(self, appt_id: str) -> bool:
+        with self._mutating():
+            view = self._view()
+            key = view.by_id.get(appt_id)
+            if key is None:
+                return False
+            view.remove(key)
+            return self._commit(view, [{"op": "delete", "id": appt_id}])
+
     def update_latest_for_user(self, user_id: str, updater: Callable[[Dict], Dict]) -> Optional[Dict]:
-        items = self._load_json()
-        idx = None
-        for i in range(len(items) - 1, -1, -1):
-            if items[i].get("UserID") == user_id:
-                idx = i
-                break
-        if idx is None:
-            return None
-        updated = updater(dict(items[idx]))
-        items[idx] = updated
-        ok = self._save_json(items)
+        with self._mutating():
+            view = self._view()
+            key = view.latest_key_for_user(user_id)
+            if key is None:
+                return None
+            current = view.by_key[key]
+            updated = updater(dict(current))
+            rec = dict(updated)
+            view.replace(key, rec)
+            ok = self._commit(view, [{"op": "update", "id": current.get("Id"), "rec": rec}])
         if ok:
             logger.info(f"updated appointment id={updated.get('Id')} for user={user_id}")
         return updated if ok else None
 
     def delete_latest_for_user(self, user_id: str) -> bool:
-        items = self._load_json()
-        idx = None
-        for i in range(len(items) - 1, -1, -1):
-            if items[i].get("UserID") == user_id:
-                idx = i
-                break
-        if idx is None:
-            return False
-        deleted = items[idx]
-        ok = self._save_json(items[:idx] + items[idx + 1 :])
+        with self._mutating():
+            view = self._view()
+            key = view.latest_key_for_user(user_id)
+            if key is None:
+                return False
+            deleted = view.remove(key)
+            ok = self._commit(view, [{"op": "delete", "id": deleted.get("Id")}])
         if ok:
             logger.info(f"deleted appointment id={deleted.get('Id')} for user={user_id}")
         return ok
 
     # Conflict detection
     def find_conflicts(self, date: str, time: str, user_id: str) -> List[Dict]:
-        items = self._load_json()
-        return [
-            it for it in items if it.get("Date") == date and it.get("Time") == time and it.get("UserID") == user_id
-        ]
+        with _lock:
+            bucket = self._view().by_slot.get((date, time), {})
+            return [dict(it) for it in bucket.values() if it.get("UserID") == user_id]
 
     def has_time_slot_taken(self, date: str, time: str) -> bool:
-        items = self._load_json()
-        return any(it.get("Date") == date and it.get("Time") == time for it in items)
+        with _lock:
+            return bool(self._view().by_slot.get((date, time)))
 
     def save_appointment(
         self,
@@ -145,12 +655,128 @@ class StorageService:
             "Mode": mode,
             "Notes": notes,
             "UserID": user_id,
+            "CreatedAt": _now_iso(),
         }
         ok = self.add_appointment(appt)
         if not ok:
             raise RuntimeError("Failed to persist appointment")
         return appt
 
+    def reserve_slot(
+        self,
+        date: str,
+        time: str,
+        user_id: str,
+        day: Optional[str] = None,
+        mode: str = "virtual",
+        notes: str = "",
+    ) -> Optional[Dict]:
+        """Atomically book (date, time) if nobody holds it. Returns the appointment, or None if taken.
+
+        Same-slot callers serialize on a striped slot lock. The slot check and
+        the commit are an optimistic compare-and-swap on the view version: the
+        new appointment is prepared outside the global lock, and the slot is only
+        re-checked if another commit (from any process, via the generation
+        counter) landed in between. The row is durable (journal fsync'd or
+        snapshot written) before the view that readers see includes it.
+        """
+        appt = {
+            "Id": str(uuid.uuid4()),
+            "Date": date,
+            "Day": day,
+            "Time": time,
+            "Mode": mode,
+            "Notes": notes,
+            "UserID": user_id,
+            "CreatedAt": _now_iso(),
+        }
+        if not self._reserve(appt):
+            return None
+        logger.info(f"reserved {date} {time} id={appt['Id']} for user={user_id}")
+        return appt
+
+    def _reserve(self, appt: Dict) -> bool:
+        """Add `appt` if its (Date, Time) slot is free; False if taken, RuntimeError if not persisted."""
+        slot = (appt.get("Date"), appt.get("Time"))
+        with _slot_lock(*slot):
+            with _lock:
+                view = self._view()
+                if view.by_slot.get(slot):
+                    return False
+                expected = view.version
+            with self._mutating():
+                view = self._view()
+                if view.version != expected and view.by_slot.get(slot):
+                    return False
+                view.add(dict(appt))
+                ok = self._commit(view, [{"op": "add", "rec": dict(appt)}])
+        if not ok:
+            raise RuntimeError("Failed to persist appointment")
+        return True
+
+    def move_appointment(
+        self,
+        appt_id: str,
+        date: str,
+        time: str,
+        day: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Atomically move one appointment to (date, time). Returns it, or None if `appt_id` is unknown.
+
+        Raises SlotTakenError if another appointment holds the slot; the
+        appointment's own current slot never counts as taken.
+        """
+        with _slot_lock(date, time), self._mutating():
+            view = self._view()
+            key = view.by_id.get(appt_id)
+            if key is None:
+                return None
+            return self._move(view, key, date, time, day, mode)
+
+    def move_slot(
+        self,
+        user_id: str,
+        date: str,
+        time: str,
+        day: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Atomically move the user's latest appointment to (date, time); None if they have none.
+
+        Raises SlotTakenError if another appointment holds the slot.
+        """
+        with _slot_lock(date, time), self._mutating():
+            view = self._view()
+            key = view.latest_key_for_user(user_id)
+            if key is None:
+                return None
+            return self._move(view, key, date, time, day, mode)
+
+    def _move(self, view: _AppointmentIndex, key: str, date: str, time: str, day: Optional[str], mode: Optional[str]) -> Dict:
+        if any(k != key for k in view.by_slot.get((date, time), {})):
+            raise SlotTakenError(f"slot {date} {time} is taken")
+        current = view.by_key[key]
+        rec = {**current, "Date": date, "Time": time}
+        if day is not None:
+            rec["Day"] = day
+        if mode is not None:
+            rec["Mode"] = mode
+        view.replace(key, rec)
+        if not self._commit(view, [{"op": "update", "id": current.get("Id"), "rec": dict(rec)}]):
+            raise RuntimeError("Failed to persist appointment")
+        logger.info(f"moved appointment id={rec.get('Id')} to {date} {time}")
+        return dict(rec)
+
+    def close(self) -> None:
+        """Fold any pending journal entries and flush the Excel mirror."""
+        if self.journal_mode:
+            _journal_stores.pop(str(self.json_path), None)
+            self.compact()
+        exporter.flush(timeout=10.0)
+
+
+JSONStorageService = StorageService
 
 # Optional SQLite-backed storage. When USE_SQLITE env var is set to a truthy value,
 # create an alias `StorageService` that wraps the SQLite implementation so existing
@@ -166,3 +792,73 @@ try:
 except Exception:
     # If sqlite module or file missing, keep the JSON-based StorageService above.
     pass
+
+
+def _use_sqlite() -> bool:
+    return os.getenv("USE_SQLITE", "0") in {"1", "true", "True"}
+
+
+def _default_backend() -> str:
+    if _use_sqlite():
+        return "sqlite"
+    if os.getenv("STORAGE_LAYOUT", "single").lower() == "partitioned":
+        return "partitioned"
+    return "json"
+
+
+# Process-wide storage instances, one per (backend, path)
+_registry: Dict[Tuple[str, str], Any] = {}
+_registry_lock = RLock()
+
+
+def get_storage(backend: Optional[str] = None, path: Optional[str] = None) -> Any:
+    """Return the shared storage instance for a backend/path, creating it on first use.
+
+    `backend` is "json", "partitioned" or "sqlite" and defaults to the USE_SQLITE /
+    STORAGE_LAYOUT settings. Agents, server endpoints and the Streamlit app share
+    these instances instead of constructing a StorageService per call.
+    """
+    backend = backend or _default_backend()
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteStorageService, default_db_path
+
+        resolved = str(Path(path or default_db_path()).resolve())
+        factory: Callable[[], Any] = lambda: SQLiteStorageService(db_path=resolved)
+    elif backend == "partitioned":
+        from .partitioned_storage import PARTITIONS_DIR, PartitionedStorageService
+
+        resolved = str(Path(path or PARTITIONS_DIR).resolve())
+        factory = lambda: PartitionedStorageService(root=Path(path) if path else None)
+    else:
+        resolved = str(Path(path or JSON_PATH).resolve())
+        factory = lambda: JSONStorageService(json_path=Path(path) if path else None)
+    key = (backend, resolved)
+    inst = _registry.get(key)
+    if inst is not None:
+        return inst
+    with _registry_lock:
+        inst = _registry.get(key)
+        if inst is None:
+            inst = factory()
+            _registry[key] = inst
+            logger.info(f"opened {backend} storage at {resolved}")
+        return inst
+
+
+def close_storage() -> None:
+    """Close every registered storage instance (application shutdown)."""
+    # Drain the async facades first so no executor job runs against a closed store
+    from .async_storage import close_async_storage
+
+    close_async_storage()
+    with _registry_lock:
+        items = list(_registry.items())
+        _registry.clear()
+    for (backend, resolved), inst in items:
+        try:
+            inst.close()
+        except Exception as e:
+            logger.warning(f"Failed closing {backend} storage at {resolved}: {e}")
+
+
+atexit.register(close_storage)
@@ -0,0 +1,11 @@
+import pytest
+
+from services.circuit_breaker import reset_breakers
+
+
+@pytest.fixture(autouse=True)
+def _fresh_breakers():
+    """Breakers are process-wide; don't let failures injected by one test open them for the next."""
+    reset_breakers()
+    yield
+    reset_breakers()
@@ -0,0 +1,89 @@
+import gzip
+import json
+from datetime import date
+
+from services.archive import archive_appointments
+from services.sqlite_storage import SQLiteStorageService
+from services.storage import StorageService
+
+
+def _seed(s):
+    s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    s.save_appointment(date="2030-03-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    s.save_appointment(date="2030-06-01", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    s.save_appointment(date="2030-01-05", day=None, time="11:00", mode="virtual", notes="", user_id="u2")
+
+
+def test_archive_moves_past_rows_to_gzip_segments(tmp_path):
+    s = StorageService(json_path=tmp_path / "appointments.json")
+    _seed(s)
+
+    assert archive_appointments(s, retention_days=30, today=date(2030, 5, 1)) == 3
+    assert [it["Date"] for it in s.list_appointments()] == ["2030-06-01"]
+    assert not s.has_time_slot_taken("2030-01-02", "10:00")
+    assert sorted(p.name for p in (tmp_path / "archive").glob("*.gz")) == [
+        "appointments-2030-01.jsonl.gz",
+        "appointments-2030-03.jsonl.gz",
+    ]
+    with gzip.open(tmp_path / "archive" / "appointments-2030-01.jsonl.gz", "rt") as f:
+        assert len(f.readlines()) == 2
+
+    dates = [it["Date"] for it in s.list_appointments(user_id="u1", include_archived=True)]
+    assert dates == ["2030-01-02", "2030-03-02", "2030-06-01"]
+    assert len(s.list_appointments(include_archived=True)) == 4
+
+    # Nothing left to archive; a second run appends nothing
+    assert archive_appointments(s, retention_days=30, today=date(2030, 5, 1)) == 0
+
+
+def test_archive_sqlite(tmp_path):
+    s = SQLiteStorageService(db_path=str(tmp_path / "appointments.db"))
+    _seed(s)
+    assert archive_appointments(s, retention_days=0, today=date(2030, 2, 1)) == 2
+    assert len(s.list_appointments()) == 2
+    assert len(s.list_appointments(user_id="u2", include_archived=True)) == 1
+    s.close()
+
+
+def test_row_rescheduled_during_archival_stays_live(tmp_path):
+    s = StorageService(json_path=tmp_path / "appointments.json")
+    _seed(s)
+    list_appointments = s.list_appointments
+
+    def select_then_reschedule(*args, **kwargs):
+        rows = list_appointments(*args, **kwargs)
+        s.move_slot("u2", "2030-07-01", "11:00")
+        return rows
+
+    s.list_appointments = select_then_reschedule
+    assert archive_appointments(s, retention_days=30, today=date(2030, 5, 1)) == 2
+    del s.list_appointments
+    assert sorted(it["Date"] for it in s.list_appointments()) == ["2030-06-01", "2030-07-01"]
+    # The stale archived copy is hidden by the live row
+    assert [it["Date"] for it in s.list_appointments(user_id="u2", include_archived=True)] == ["2030-07-01"]
+
+
+def test_append_repairs_a_truncated_segment(tmp_path, monkeypatch):
+    import services.archive as archive
+
+    checked = []
+    intact_length = archive._intact_length
+    monkeypatch.setattr(archive, "_intact_length", lambda data: checked.append(len(data)) or intact_length(data))
+    s = StorageService(json_path=tmp_path / "appointments.json")
+    _seed(s)
+    assert archive_appointments(s, retention_days=0, today=date(2030, 1, 3)) == 1
+    segment = tmp_path / "archive" / "appointments-2030-01.jsonl.gz"
+    # A crash mid-append leaves half a gzip member behind
+    partial = gzip.compress(b'{"Id":"lost","Date":"2030-01-04"}\n')
+    with segment.open("ab") as f:
+        f.write(partial[: len(partial) // 2])
+
+    assert archive_appointments(s, retention_days=0, today=date(2030, 1, 6)) == 1
+    with gzip.open(segment, "rt") as f:
+        assert [json.loads(line)["Date"] for line in f] == ["2030-01-02", "2030-01-05"]
+    # Only the bytes past the last recorded append were inspected, never the whole segment
+    assert checked == [len(partial) // 2]
+
+    s.save_appointment(date="2030-01-07", day=None, time="10:00", mode="virtual", notes="", user_id="u3")
+    assert archive_appointments(s, retention_days=0, today=date(2030, 1, 8)) == 1
+    assert checked == [len(partial) // 2]
@@ -0,0 +1,53 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+import services.mcp_client as mcp_client
+from services.mcp_cache import reset_task_cache
+
+ITEMS = [
+    {"agent": "intent", "task": "classify_intent", "payload": {"text": "cancel it", "labels": ["book", "cancel", "other"]}},
+    {"agent": "mode", "task": "infer_mode", "payload": {"text": "by phone"}},
+    {"agent": "nope", "task": "missing", "payload": {}},
+]
+
+
+def test_batch_endpoint_keeps_order_and_isolates_errors(monkeypatch):
+    real = server.run_task
+
+    def flaky(req):
+        if req.agent == "nope":
+            raise ValueError("boom")
+        return real(req)
+
+    monkeypatch.setattr(server, "run_task", flaky)
+    with TestClient(server.app) as client:
+        resp = client.post("/tasks/batch", json={"items": ITEMS})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert results[0]["ok"] and results[0]["data"]["intent"] == "cancel"
+    assert results[1]["ok"] and results[1]["data"]["mode"] == "telephonic"
+    assert results[2] == {"ok": False, "error": "boom"}
+
+
+@pytest.mark.asyncio
+async def test_client_batch_is_one_round_trip(monkeypatch):
+    calls = []
+
+    async def record(request):
+        calls.append(request.url.path)
+
+    transport = httpx.ASGITransport(app=server.app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://mcp", event_hooks={"request": [record]})
+    monkeypatch.setenv("MCP_ENDPOINT", "http://mcp")
+    monkeypatch.setenv("MCP_PREFER_REMOTE", "1")
+    monkeypatch.setattr(mcp_client, "get_http_client", lambda: client)
+    reset_task_cache()
+    try:
+        out = await mcp_client.mcp_batch_async([dict(it, fallback=lambda: {"fallback": True}) for it in ITEMS])
+    finally:
+        await client.aclose()
+        reset_task_cache()
+    assert calls == ["/tasks/batch"]
+    assert [out[0]["intent"], out[1]["mode"], out[2]] == ["cancel", "telephonic", {"fallback": True}]
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+import services.mcp_client as mcp_client
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_breaker
+from services.llm_providers import LLMProvider
+from services.routing import RoutingPolicy
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _boom() -> None:
+    raise ConnectionError("down")
+
+
+def _trip(breaker: CircuitBreaker, n: int) -> None:
+    for _ in range(n):
+        with pytest.raises(ConnectionError):
+            breaker.call(_boom)
+
+
+def test_opens_on_failure_rate_and_backs_off():
+    clock = _Clock()
+    breaker = CircuitBreaker("dep", window_s=10, min_calls=4, failure_rate=0.5, open_s=1, max_open_s=3, clock=clock)
+    breaker.call(lambda: "ok")
+    _trip(breaker, 2)
+    assert breaker.state == CLOSED  # 2 of 3 failed, but below min_calls
+    _trip(breaker, 1)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+
+    # Half-open after the cooldown: one probe only, and a failed probe doubles the wait
+    clock.now += 1
+    assert breaker.state == HALF_OPEN and breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    clock.now += 1.5
+    assert breaker.state == OPEN
+    clock.now += 0.5
+    _trip(breaker, 1)
+    clock.now += 3.5  # capped at max_open_s
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_old_failures_leave_the_window():
+    clock = _Clock()
+    breaker = CircuitBreaker("dep", window_s=10, min_calls=3, failure_rate=0.5, clock=clock)
+    _trip(breaker, 2)
+    clock.now += 11
+    breaker.call(lambda: "ok")
+    _trip(breaker, 1)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_released():
+    clock = _Clock()
+    breaker = CircuitBreaker("dep", min_calls=1, open_s=1, clock=clock)
+    _trip(breaker, 1)
+    clock.now += 1
+    task = asyncio.ensure_future(breaker.acall(asyncio.sleep, 10))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker.available()
+
+
+class _LLM(LLMProvider):
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        return "reschedule"
+
+
+@pytest.mark.asyncio
+async def test_dead_remote_is_skipped_once_open(monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        raise httpx.ConnectError("refused")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setenv("MCP_ENDPOINT", "http://mcp")
+    monkeypatch.setenv("MCP_PREFER_REMOTE", "1")
+    monkeypatch.setenv("MCP_CACHE", "0")
+    monkeypatch.setenv("BREAKER_MIN_CALLS", "3")
+    monkeypatch.setattr(mcp_client, "get_http_client", lambda: client)
+    monkeypatch.setattr(mcp_client, "get_provider", lambda name: _LLM())
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy(thresholds={"intent.classify_intent": 1.1}))
+    payload = {"text": "i'd like to come in on friday", "labels": ["book", "reschedule", "other"]}
+    for _ in range(3):
+        assert (await mcp_client.mcp_task_async("intent", "classify_intent", payload))["intent"] == "reschedule"
+    assert len(calls) == 3 and get_breaker("remote:http://mcp").state == OPEN
+
+    start = time.monotonic()
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", payload)
+    assert out["intent"] == "reschedule" and len(calls) == 3
+    assert time.monotonic() - start < 0.05
+
+
+def test_health_reports_breakers(monkeypatch):
+    class _DeadLLM(LLMProvider):
+        def generate(self, prompt: str, **kwargs) -> str:
+            raise ConnectionError("api down")
+
+    monkeypatch.setenv("BREAKER_MIN_CALLS", "2")
+    monkeypatch.setattr(server, "get_provider", lambda name: _DeadLLM())
+    monkeypatch.setattr(server, "run_local", lambda agent, task, payload: {})
+    body = {"agent": "intent", "task": "classify_intent", "payload": {"text": "hm", "labels": ["book"]}}
+    with TestClient(server.app) as client:
+        for _ in range(3):
+            assert client.post("/task", json=body).status_code == 500
+        health = client.get("/health").json()
+    assert health["status"] == "ok"
+    llm = health["breakers"]["llm:local"]
+    assert llm["state"] == OPEN and llm["rejected"] == 1 and llm["retry_in_s"] > 0
+    assert set(health["cache"]) >= {"hits", "misses", "hit_rate", "size"}
@@ -0,0 +1,51 @@
+import datetime as dt
+
+import pytest
+
+from services.datetime_grammar import parse_datetime
+
+NOW = dt.datetime(2030, 1, 2, 10, 0)  # a Wednesday
+
+
+@pytest.mark.parametrize(
+    "text, date, time",
+    [
+        ("Book a virtual appointment tomorrow at 3pm", dt.date(2030, 1, 3), dt.time(15, 0)),
+        ("next monday 17:30", dt.date(2030, 1, 7), dt.time(17, 30)),
+        ("this wednesday at 5 p.m.", dt.date(2030, 1, 2), dt.time(17, 0)),
+        ("book for 2031-03-04 at 9am", dt.date(2031, 3, 4), dt.time(9, 0)),
+        ("march 4th at noon", dt.date(2030, 3, 4), dt.time(12, 0)),
+        ("move it from monday to wednesday at 2 pm", dt.date(2030, 1, 9), dt.time(14, 0)),
+        ("in 2 hours", dt.date(2030, 1, 2), dt.time(12, 0)),
+        ("Change my appointment from 5pm to 6pm", None, dt.time(18, 0)),
+        ("tomorrow at 10:15am", dt.date(2030, 1, 3), dt.time(10, 15)),
+        ("friday 5:30pm", dt.date(2030, 1, 4), dt.time(17, 30)),
+        ("7:45pm today", dt.date(2030, 1, 2), dt.time(19, 45)),
+        ("next monday at 9:05a.m.", dt.date(2030, 1, 7), dt.time(9, 5)),
+    ],
+)
+def test_grammar_fast_path(text, date, time, monkeypatch):
+    # The fast path must not touch dateparser at all
+    monkeypatch.setattr("services.mcp_tasks_local.get_dateparser", lambda: pytest.fail("dateparser called"))
+    parsed = parse_datetime(text, now=NOW)
+    assert (parsed.date, parsed.time, parsed.source) == (date, time, "grammar")
+
+
+def test_no_datetime_skips_dateparser(monkeypatch):
+    monkeypatch.setattr("services.mcp_tasks_local.get_dateparser", lambda: pytest.fail("dateparser called"))
+    assert parse_datetime("Cancel my appointment", now=NOW).source == "none"
+
+
+def test_unmatched_text_falls_back_once(monkeypatch):
+    calls = []
+
+    class _Parser:
+        @staticmethod
+        def parse(text, **kwargs):
+            calls.append((text, kwargs["languages"]))
+            return dt.datetime(2030, 2, 5, 10, 0)
+
+    monkeypatch.setattr("services.mcp_tasks_local.get_dateparser", lambda: _Parser)
+    parsed = parse_datetime("the 5th of next month at 3pm", now=NOW)
+    assert calls == [("the 5th of next month", ["en"])]
+    assert (parsed.date, parsed.time, parsed.source) == (dt.date(2030, 2, 5), dt.time(15, 0), "dateparser")
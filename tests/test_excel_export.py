@@ -0,0 +1,29 @@
+import io
+import time
+
+from openpyxl import load_workbook
+
+from services.excel_export import ExcelExporter, write_xlsx_stream
+
+
+def test_write_xlsx_stream_roundtrip():
+    buf = io.BytesIO()
+    write_xlsx_stream([{"Id": "a", "Date": "2030-01-02", "Time": "10:00", "UserID": "u1", "Extra": 1}], buf)
+    buf.seek(0)
+    rows = list(load_workbook(buf).active.values)
+    assert rows[0][:7] == ("Id", "Date", "Day", "Time", "Mode", "Notes", "UserID")
+    assert rows[0][-1] == "Extra"
+    assert rows[1][0] == "a"
+
+
+def test_exporter_coalesces_bursts(tmp_path):
+    calls = []
+    exporter = ExcelExporter(delay=0.2, writer=lambda items, path: calls.append(list(items)))
+    state = []
+    for i in range(5):
+        state.append({"Id": str(i)})
+        exporter.schedule(tmp_path / "a.xlsx", lambda: list(state))
+    time.sleep(0.5)
+    exporter.flush(timeout=1)
+    assert len(calls) == 1
+    assert len(calls[0]) == 5
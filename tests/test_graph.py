@@ -0,0 +1,195 @@
+import pytest
+
+from graph.graph import build_graph
+from graph.state import ConversationTurn, GraphState
+from services.llm_providers import LLMProvider
+from services.routing import RoutingPolicy
+from services.storage import StorageService
+
+
+class _NoLLM(LLMProvider):
+    """Provider that always fails, so every task is answered by the local registry."""
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        raise RuntimeError("no LLM in tests")
+
+
+def _always_escalate() -> RoutingPolicy:
+    """Policy that never accepts a local answer, so every task reaches the provider."""
+    return RoutingPolicy(thresholds={
+        "intent.classify_intent": 1.1,
+        "mode.infer_mode": 1.1,
+        "datetime.extract_datetime": 1.1,
+        "extraction.extract_booking": 1.1,
+    })
+
+
+async def _send(graph, state: GraphState, text: str) -> GraphState:
+    state.turns.append(ConversationTurn(role="user", content=text))
+    return GraphState(**dict(await graph.ainvoke(state)))
+
+
+@pytest.mark.asyncio
+async def test_book_then_cancel(tmp_path, monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setattr("services.mcp_client.get_provider", lambda name: _NoLLM())
+    storage = StorageService(json_path=tmp_path / "appointments.json")
+    graph = build_graph(storage)
+
+    state = GraphState()
+    state.appointment.user_id = "u1"
+    state = await _send(graph, state, "Book a virtual appointment tomorrow at 3pm")
+    assert state.done
+    items = storage.list_appointments(user_id="u1")
+    assert len(items) == 1 and items[0]["Time"] == "15:00"
+
+    # The slot is taken, so a second user can't book it even when the flow reaches confirmation
+    other = GraphState()
+    other.appointment.user_id = "u2"
+    other = await _send(graph, other, "Book a phone appointment tomorrow at 3pm")
+    assert not other.done
+    assert storage.list_appointments(user_id="u2") == []
+
+    cancel = GraphState()
+    cancel.appointment.user_id = "u1"
+    cancel = await _send(graph, cancel, "Cancel my appointment")
+    assert cancel.done
+    assert storage.list_appointments(user_id="u1") == []
+
+
+@pytest.mark.asyncio
+async def test_parallel_extraction_overlaps_tasks(tmp_path, monkeypatch):
+    import asyncio
+
+    calls = []
+    overlapped = []
+    all_started = asyncio.Event()
+
+    class _SlowLLM(LLMProvider):
+        async def agenerate(self, prompt: str, **kwargs) -> str:
+            calls.append(prompt)
+            if len(calls) == 3:
+                all_started.set()
+            # Each call waits for the others to start; back to back, none of them would
+            try:
+                await asyncio.wait_for(all_started.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                pass
+            overlapped.append(all_started.is_set())
+            # Good enough for every task: intent "book", datetime and mode repaired locally
+            return "book"
+
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setattr("services.mcp_client.get_provider", lambda name: _SlowLLM())
+    monkeypatch.setenv("MCP_COMBINED_EXTRACTION", "0")
+    monkeypatch.setattr("services.routing._policy", _always_escalate())
+    storage = StorageService(json_path=tmp_path / "appointments.json")
+    graph = build_graph(storage, parallel=True)
+
+    state = GraphState()
+    state.appointment.user_id = "u1"
+    state = await _send(graph, state, "Book a virtual appointment tomorrow at 3pm")
+    assert state.done
+    assert storage.list_appointments(user_id="u1")[0]["Mode"] == "virtual"
+    # One call per extraction task, overlapped rather than back to back
+    assert len(calls) == 3
+    assert overlapped == [True, True, True]
+
+
+@pytest.mark.asyncio
+async def test_combined_extraction_is_one_llm_call(tmp_path, monkeypatch):
+    prompts = []
+
+    class _JSONLLM(LLMProvider):
+        def generate(self, prompt: str, **kwargs) -> str:
+            prompts.append(prompt)
+            # Mode is missing and the time is malformed: both get repaired locally
+            return '{"intent": "book", "date": "2031-03-04", "day": "Sunday", "time": "3pm", "mode": null}'
+
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setenv("MCP_CACHE", "0")
+    monkeypatch.setattr("services.mcp_client.get_provider", lambda name: _JSONLLM())
+    monkeypatch.setattr("services.routing._policy", _always_escalate())
+    storage = StorageService(json_path=tmp_path / "appointments.json")
+    graph = build_graph(storage)
+
+    state = GraphState()
+    state.appointment.user_id = "u1"
+    state = await _send(graph, state, "Book an online appointment for march 4th 2031 at 3pm")
+    assert state.done
+    assert len(prompts) == 1
+    item = storage.list_appointments(user_id="u1")[0]
+    assert (item["Date"], item["Day"], item["Time"], item["Mode"]) == ("2031-03-04", "Tuesday", "15:00", "virtual")
+
+
+@pytest.mark.asyncio
+async def test_turn_deadline_bounds_llm_calls(tmp_path, monkeypatch):
+    import asyncio
+    import time
+
+    class _HangingLLM(LLMProvider):
+        async def agenerate(self, prompt: str, **kwargs) -> str:
+            await asyncio.sleep(5)
+            return "{}"
+
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setenv("MCP_CACHE", "0")
+    monkeypatch.setattr("services.mcp_client.get_provider", lambda name: _HangingLLM())
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy(thresholds={"extraction.extract_booking": 1.1}, min_escalation_s=0.05))
+    storage = StorageService(json_path=tmp_path / "appointments.json")
+    graph = build_graph(storage)
+
+    state = GraphState(deadline=time.monotonic() + 0.3)
+    state.appointment.user_id = "u1"
+    start = time.monotonic()
+    state = await _send(graph, state, "Book a virtual appointment tomorrow at 3pm")
+    # The hanging LLM is abandoned at the deadline and the local answers book the slot
+    assert time.monotonic() - start < 1.0
+    assert state.done
+    assert storage.list_appointments(user_id="u1")[0]["Time"] == "15:00"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("text", ["I need to see the doctor tomorrow", "Tomorrow 3pm virtual."])
+async def test_vague_intent_does_not_touch_bookings(text, tmp_path, monkeypatch):
+    # Default setup: no remote endpoint and no real LLM, so nothing to escalate to
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setenv("LLM_PROVIDER", "local")
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy())
+    storage = StorageService(json_path=tmp_path / "appointments.json")
+    booked = storage.reserve_slot("2030-05-01", "10:00", user_id="u1")
+    graph = build_graph(storage)
+
+    state = GraphState()
+    state.appointment.user_id = "u1"
+    state = await _send(graph, state, text)
+    assert not state.done
+    assert state.intent == "other"
+    assert "book, cancel, or reschedule" in state.turns[-1].content
+    assert storage.list_appointments(user_id="u1") == [booked]
+
+
+@pytest.mark.asyncio
+async def test_unsure_intent_asks_instead_of_cancelling(tmp_path, monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setenv("LLM_PROVIDER", "local")
+    # Even a keyword hit falls short of this threshold, and there is nothing to escalate to
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy(thresholds={
+        "intent.classify_intent": 1.0,
+        "extraction.extract_booking": 1.0,
+    }))
+    storage = StorageService(json_path=tmp_path / "appointments.json")
+    booked = storage.reserve_slot("2030-05-01", "10:00", user_id="u1")
+    graph = build_graph(storage)
+
+    state = GraphState()
+    state.appointment.user_id = "u1"
+    state = await _send(graph, state, "Please cancel my appointment")
+    assert state.intent == "other" and not state.done
+    assert storage.list_appointments(user_id="u1") == [booked]
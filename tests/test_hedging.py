@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import services.mcp_client as mcp_client
+from services.llm_providers import LLMProvider
+from services.routing import RoutingPolicy
+
+LABELS = ["book", "cancel", "reschedule", "query", "other"]
+AMBIGUOUS = {"text": "i'd like to come in on friday", "labels": LABELS}
+
+
+class _LLM(LLMProvider):
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.calls = 0
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return "reschedule"
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    """A remote MCP server whose latency and status each test sets."""
+    server = {"delay": 0.0, "status": 200, "calls": 0, "cancelled": 0}
+
+    async def handler(request):
+        server["calls"] += 1
+        try:
+            await asyncio.sleep(server["delay"])
+        except asyncio.CancelledError:
+            server["cancelled"] += 1
+            raise
+        return httpx.Response(server["status"], json={"intent": "query"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setenv("MCP_ENDPOINT", "http://mcp")
+    monkeypatch.setenv("MCP_PREFER_REMOTE", "1")
+    monkeypatch.setenv("MCP_CACHE", "0")
+    monkeypatch.setenv("MCP_HEDGE_DELAY_S", "0.05")
+    monkeypatch.setattr(mcp_client, "get_http_client", lambda: client)
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy(min_escalation_s=0.05))
+    return server
+
+
+def _use_llm(monkeypatch, delay: float) -> _LLM:
+    provider = _LLM(delay)
+    monkeypatch.setattr(mcp_client, "get_provider", lambda name: provider)
+    return provider
+
+
+@pytest.mark.asyncio
+async def test_slow_remote_is_hedged_by_the_provider(remote, monkeypatch):
+    remote["delay"] = 2.0
+    provider = _use_llm(monkeypatch, 0.01)
+    start = time.monotonic()
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", AMBIGUOUS)
+    assert out == {"intent": "reschedule"} and provider.calls == 1
+    assert time.monotonic() - start < 0.5
+    await asyncio.sleep(0)
+    assert remote["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fast_remote_wins_without_hedging(remote, monkeypatch):
+    provider = _use_llm(monkeypatch, 0.01)
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", AMBIGUOUS)
+    assert out == {"intent": "query"} and provider.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_remote_hands_over_without_waiting(remote, monkeypatch):
+    remote["status"] = 500
+    monkeypatch.setenv("MCP_HEDGE_DELAY_S", "5")
+    provider = _use_llm(monkeypatch, 0.01)
+    start = time.monotonic()
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", AMBIGUOUS)
+    assert out == {"intent": "reschedule"} and provider.calls == 1
+    assert time.monotonic() - start < 1.0
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_whole_chain(remote, monkeypatch):
+    remote["delay"] = 2.0
+    provider = _use_llm(monkeypatch, 2.0)
+    start = time.monotonic()
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", AMBIGUOUS, deadline=start + 0.3)
+    elapsed = time.monotonic() - start
+    # Local answer (too unsure to act on, so "other") at the deadline, both in-flight tiers abandoned
+    assert out["intent"] == "other" and provider.calls == 1
+    assert 0.25 < elapsed < 0.6
+    await asyncio.sleep(0)
+    assert remote["cancelled"] == 1
@@ -0,0 +1,97 @@
+import pytest
+
+from services.local_classifier import KeywordTrie, LocalClassifier, classify, load_examples
+from services.mcp_tasks_local import task_intent, task_mode
+
+
+def test_keyword_hits_are_exact_and_confident():
+    trie = KeywordTrie({"cancel": ["cancel", "call off"], "book": ["book"]})
+    assert trie.labels("Please CALL OFF my visit") == {"cancel"}
+    assert trie.labels("rebooking") == set()
+    preds = classify("intent", ["cancel my appointment", "book me in for friday"])
+    assert [(p.label, p.source) for p in preds] == [("cancel", "keyword"), ("book", "keyword")]
+
+
+def test_model_handles_utterances_without_keywords():
+    pred = classify("intent", ["could we do it on thursday instead"])[0]
+    assert (pred.label, pred.source) == ("reschedule", "model")
+    assert 0.0 < pred.confidence <= 1.0
+    assert task_mode({"text": "see you then"})["mode"] == "virtual"
+    assert task_intent({"text": "hello there", "labels": ["book", "other"]})["intent"] == "other"
+
+
+def test_model_fits_its_training_data():
+    examples = load_examples()
+    clf = LocalClassifier(examples, intent_keywords={"none": ["zzzz"]}, mode_keywords={"none": ["zzzz"]})
+    preds = clf.predict("intent", [ex["text"] for ex in examples])
+    accuracy = sum(p.label == ex["intent"] for p, ex in zip(preds, examples)) / len(examples)
+    assert accuracy > 0.9
+
+
+def test_model_generalizes_to_held_out_examples():
+    # Every fifth example is held out; keywords are disabled so only the model is measured
+    examples = load_examples()
+    train = [ex for i, ex in enumerate(examples) if i % 5]
+    held_out = [ex for i, ex in enumerate(examples) if not i % 5]
+    clf = LocalClassifier(train, intent_keywords={"none": ["zzzz"]}, mode_keywords={"none": ["zzzz"]})
+    preds = clf.predict("intent", [ex["text"] for ex in held_out])
+    accuracy = sum(p.label == ex["intent"] for p, ex in zip(preds, held_out)) / len(held_out)
+    assert accuracy > 0.8
+
+
+def test_batched_prediction_featurizes_once(monkeypatch):
+    import services.local_classifier as lc
+
+    texts = ["i'd like to come in on friday", "could we do it on thursday instead", "see you then"] * 20
+    one_by_one = [classify("intent", [t])[0] for t in texts]
+    calls = []
+    featurize = lc.featurize
+    monkeypatch.setattr(lc, "featurize", lambda batch: calls.append(len(batch)) or featurize(batch))
+    assert classify("intent", texts) == one_by_one
+    assert calls == [len(texts)]
+
+
+def test_warmup_steps_have_separate_switches(monkeypatch):
+    import services.mcp_tasks_local as tasks
+
+    ran = []
+    monkeypatch.setattr(tasks, "warm_up_classifier", lambda: ran.append("classifier"))
+    monkeypatch.setattr(tasks, "warm_up_dateparser", lambda: ran.append("dateparser"))
+    monkeypatch.setenv("DATEPARSER_WARMUP", "0")
+    t = tasks.start_background_warmup()
+    t.join(timeout=5)
+    assert (t.name, ran) == ("local-warmup", ["classifier"])
+
+    monkeypatch.setenv("CLASSIFIER_WARMUP", "0")
+    assert tasks.start_background_warmup() is None
+
+
+def test_saved_weights_are_loaded_instead_of_retraining(tmp_path, monkeypatch):
+    import json
+
+    import services.local_classifier as lc
+
+    data = tmp_path / "examples.jsonl"
+    data.write_text("".join(json.dumps(ex) + "\n" for ex in load_examples()), encoding="utf-8")
+    monkeypatch.setenv("LOCAL_CLASSIFIER_DATA", str(data))
+    monkeypatch.setattr(lc, "_classifier", None)
+    texts = ["i'd like to come in on friday", "could we do it on thursday instead", "see you then"]
+    trained = lc.get_classifier().predict("intent", texts)
+    assert lc.weights_path(data).exists()
+
+    # A new process: the weights match the training file, so nothing is fitted
+    monkeypatch.setattr(lc, "_classifier", None)
+    monkeypatch.setattr(lc, "train_models", lambda examples: pytest.fail("retrained"))
+    assert lc.get_classifier().predict("intent", texts) == trained
+
+    # Edited training data invalidates them
+    with data.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"text": "see you then", "intent": "other"}) + "\n")
+    assert lc.load_weights(lc.weights_path(data), lc.training_fingerprint(data)) is None
+
+
+def test_bundled_weights_match_the_training_data():
+    import services.local_classifier as lc
+
+    # Rebuild with scripts/build_classifier.py after editing data/classifier_train.jsonl
+    assert lc.load_weights(lc.weights_path(), lc.training_fingerprint()) is not None
@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+import services.mcp_client as mcp_client
+from services.llm_providers import LLMProvider
+from services.mcp_cache import TaskCache, cache_key, reset_task_cache
+from services.routing import RoutingPolicy
+
+
+def test_lru_and_ttl_eviction():
+    cache = TaskCache(max_entries=2, ttl_s=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.set("c", {"v": 3})  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    expired = TaskCache(max_entries=2, ttl_s=-1)
+    expired.set("a", {"v": 1})
+    assert expired.get("a") is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    db = tmp_path / "cache.db"
+    first = TaskCache(ttl_s=60, db_path=db)
+    first.set("k", {"intent": "cancel"})
+    first.close()
+    second = TaskCache(ttl_s=60, db_path=db)
+    assert second.get("k") == {"intent": "cancel"}
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_keys_normalize_text_and_pin_reference_date():
+    a = cache_key("intent", "classify_intent", {"text": "Cancel my  appointment!"}, ("local",))
+    b = cache_key("intent", "classify_intent", {"text": "cancel my appointment"}, ("local",))
+    assert a == b
+    assert a != cache_key("intent", "classify_intent", {"text": "cancel my appointment"}, ("anthropic", "m", "x"))
+
+    tomorrow = {"text": "tomorrow 3pm"}
+    jan1 = cache_key("datetime", "extract_datetime", tomorrow, ("local",), today=date(2031, 1, 1))
+    jan2 = cache_key("datetime", "extract_datetime", tomorrow, ("local",), today=date(2031, 1, 2))
+    assert jan1 != jan2
+
+
+@pytest.mark.asyncio
+async def test_provider_answers_are_cached(monkeypatch):
+    calls = []
+
+    class _Counting(LLMProvider):
+        def generate(self, prompt: str, **kwargs) -> str:
+            calls.append(prompt)
+            return "virtual"
+
+    monkeypatch.setenv("LLM_PROVIDER", "local")
+    monkeypatch.setattr(mcp_client, "get_provider", lambda name: _Counting())
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy(thresholds={"mode.infer_mode": 1.1}))
+    reset_task_cache()
+    try:
+        for text in ("Virtual please", "virtual please."):
+            out = await mcp_client.mcp_task_async("mode", "infer_mode", {"text": text})
+            assert out == {"mode": "virtual"}
+        assert len(calls) == 1
+    finally:
+        reset_task_cache()
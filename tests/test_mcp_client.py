@@ -0,0 +1,79 @@
+import pytest
+
+from services.mcp_client import aclose_http_client, get_http_client
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_pooled_per_loop():
+    client = get_http_client()
+    assert get_http_client() is client
+    await aclose_http_client()
+    assert client.is_closed
+    fresh = get_http_client()
+    assert fresh is not client
+    await aclose_http_client()
+
+
+def test_providers_are_cached_until_reset():
+    from services.llm_providers import get_provider, reset_providers
+
+    reset_providers()
+    first = get_provider("local")
+    assert get_provider("LOCAL") is first
+    reset_providers()
+    assert get_provider("local") is not first
+
+
+@pytest.mark.asyncio
+async def test_sync_provider_does_not_block_the_loop():
+    import asyncio
+    import threading
+
+    from services.llm_providers import LLMProvider
+
+    # Every call must meet the other three; run one after another, the first would time out
+    barrier = threading.Barrier(4, timeout=5)
+
+    class _Blocking(LLMProvider):
+        def generate(self, prompt: str, **kwargs) -> str:
+            barrier.wait()
+            return prompt
+
+    out = await asyncio.gather(*(_Blocking().agenerate(str(i)) for i in range(4)))
+    assert out == ["0", "1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_reset_closes_async_clients_on_their_loops():
+    import asyncio
+    import weakref
+
+    from services.llm_providers import AnthropicProvider, _providers, reset_providers
+
+    closed = []
+
+    class _Client:
+        def __init__(self, name):
+            self.name = name
+
+        def close(self):
+            closed.append(self.name)
+
+    class _AsyncClient(_Client):
+        async def close(self):
+            closed.append((self.name, asyncio.get_running_loop()))
+
+    provider = AnthropicProvider.__new__(AnthropicProvider)
+    provider.client = _Client("sync")
+    provider._async_clients = weakref.WeakKeyDictionary()
+    idle = asyncio.new_event_loop()
+    current = asyncio.get_running_loop()
+    provider._async_clients[idle] = _AsyncClient("idle")
+    provider._async_clients[current] = _AsyncClient("current")
+
+    reset_providers()
+    _providers[("test",)] = provider
+    reset_providers()
+    await asyncio.sleep(0)
+    idle.close()
+    assert sorted(map(str, closed)) == sorted(map(str, ["sync", ("idle", idle), ("current", current)]))
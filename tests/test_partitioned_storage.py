@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+from services.partitioned_storage import PartitionedStorageService, partition_key
+
+
+def test_partition_key():
+    assert partition_key("2030-01-02") == "2030-01"
+    assert partition_key(None) == "undated"
+
+
+def test_lookups_touch_only_their_month(tmp_path):
+    s = PartitionedStorageService(root=tmp_path / "partitions")
+    jan = s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    feb = s.reserve_slot("2030-02-03", "11:00", user_id="u1")
+    assert s.reserve_slot("2030-02-03", "11:00", user_id="u2") is None
+
+    assert sorted(p.name for p in (tmp_path / "partitions").glob("*.json")) == ["2030-01.json", "2030-02.json", "manifest.json"]
+    assert s.has_time_slot_taken("2030-01-02", "10:00")
+    assert not s.has_time_slot_taken("2030-03-02", "10:00")
+    assert not (tmp_path / "partitions" / "2030-03.json").exists()
+    assert [it["Id"] for it in s.list_appointments(user_id="u1")] == [jan["Id"], feb["Id"]]
+
+    manifest = json.loads((tmp_path / "partitions" / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["users"]["u1"] == ["2030-01", "2030-02"]
+
+
+def test_latest_follows_creation_across_partitions(tmp_path):
+    s = PartitionedStorageService(root=tmp_path / "partitions")
+    s.save_appointment(date="2030-05-01", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    latest = s.save_appointment(date="2030-01-01", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+
+    # Rescheduling the latest (January) booking into March moves it between files
+    moved = s.update_latest_for_user("u1", lambda it: {**it, "Date": "2030-03-04"})
+    assert moved["Id"] == latest["Id"]
+    assert not s.has_time_slot_taken("2030-01-01", "10:00")
+    assert s.has_time_slot_taken("2030-03-04", "10:00")
+
+    assert s.delete_latest_for_user("u1")
+    assert [it["Date"] for it in s.list_appointments(user_id="u1")] == ["2030-05-01"]
+
+
+def test_imports_legacy_single_file(tmp_path):
+    legacy = tmp_path / "appointments.json"
+    legacy.write_text(
+        json.dumps([
+            {"Id": "a", "Date": "2030-01-02", "Time": "10:00", "UserID": "u1"},
+            {"Id": "b", "Date": "2030-02-02", "Time": "10:00", "UserID": "u2"},
+        ]),
+        encoding="utf-8",
+    )
+    s = PartitionedStorageService(root=tmp_path / "partitions", legacy_path=legacy)
+    assert s.has_time_slot_taken("2030-02-02", "10:00")
+    assert [it["Id"] for it in s.list_appointments(user_id="u1")] == ["a"]
+
+
+def test_move_slot_across_months_checks_the_target(tmp_path):
+    from services.storage import SlotTakenError
+
+    s = PartitionedStorageService(root=tmp_path / "partitions")
+    mine = s.reserve_slot("2030-01-02", "10:00", user_id="u1")
+    s.reserve_slot("2030-02-02", "10:00", user_id="u2")
+    with pytest.raises(SlotTakenError):
+        s.move_slot("u1", "2030-02-02", "10:00")
+    assert s.has_time_slot_taken("2030-01-02", "10:00")
+
+    moved = s.move_slot("u1", "2030-03-02", "10:00")
+    assert moved["Id"] == mine["Id"]
+    assert [it["Date"] for it in s.list_appointments(user_id="u1")] == ["2030-03-02"]
+    assert s.move_slot("u1", "2030-03-02", "10:00", mode="telephonic")["Mode"] == "telephonic"
+
+
+def test_import_replays_the_legacy_journal(tmp_path):
+    from services.storage import StorageService
+
+    legacy = tmp_path / "appointments.json"
+    old = StorageService(json_path=legacy, mode="journal", excel=False)
+    old.reserve_slot("2030-01-02", "10:00", user_id="u1")
+    # Not compacted: the booking only exists in appointments.journal.jsonl
+    assert json.loads(legacy.read_text(encoding="utf-8")) == []
+
+    s = PartitionedStorageService(root=tmp_path / "partitions", legacy_path=legacy)
+    assert s.has_time_slot_taken("2030-01-02", "10:00")
+    # A second service sees the manifest and does not split again
+    again = PartitionedStorageService(root=tmp_path / "partitions", legacy_path=legacy)
+    assert len(again.list_appointments()) == 1
+
+
+def test_latest_within_a_partition_follows_creation(tmp_path):
+    legacy = tmp_path / "appointments.json"
+    # File order differs from creation order, as after a booking is moved in from another month
+    legacy.write_text(
+        json.dumps([
+            {"Id": "new", "Date": "2030-01-02", "Time": "10:00", "UserID": "u1", "CreatedAt": "2029-12-02T10:00:00"},
+            {"Id": "old", "Date": "2030-01-03", "Time": "10:00", "UserID": "u1", "CreatedAt": "2029-12-01T10:00:00"},
+        ]),
+        encoding="utf-8",
+    )
+    s = PartitionedStorageService(root=tmp_path / "partitions", legacy_path=legacy)
+    assert s.update_latest_for_user("u1", lambda it: {**it, "Mode": "telephonic"})["Id"] == "new"
+    assert s.delete_latest_for_user("u1")
+    assert [it["Id"] for it in s.list_appointments(user_id="u1")] == ["old"]
+
+
+def test_failed_reservation_leaves_no_trace(tmp_path):
+    s = PartitionedStorageService(root=tmp_path / "partitions")
+    s.reserve_slot("2030-01-02", "10:00", user_id="u1")
+    assert s.reserve_slot("2030-01-02", "10:00", user_id="u2") is None
+    assert s.manifest.user_partitions("u2") == []
+
+    # Lost the race after the pre-check: the registration is rolled back
+    s.has_time_slot_taken = lambda date, time: False
+    assert s.reserve_slot("2030-01-02", "10:00", user_id="u2") is None
+    assert s.manifest.user_partitions("u2") == []
+
+
+def test_partitions_stay_json_when_use_sqlite_is_set(tmp_path):
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    # USE_SQLITE rebinds services.storage.StorageService at import time; partitions must not follow it
+    code = (
+        "import sys; from pathlib import Path; "
+        "from services.partitioned_storage import PartitionedStorageService; "
+        "s = PartitionedStorageService(root=Path(sys.argv[1])); "
+        "assert s.reserve_slot('2030-01-02', '10:00', user_id='u1') is not None"
+    )
+    env = dict(os.environ, USE_SQLITE="1")
+    subprocess.run([sys.executable, "-c", code, str(tmp_path / "partitions")], env=env, check=True, cwd=Path(__file__).resolve().parent.parent)
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+import services.mcp_client as mcp_client
+from services.llm_providers import LLMProvider
+from services.mcp_cache import reset_task_cache
+from services.routing import RoutingPolicy, turn_budget
+
+
+class _SlowLLM(LLMProvider):
+    def __init__(self) -> None:
+        self.prompts = []
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        self.prompts.append(prompt)
+        await asyncio.sleep(0.3)
+        return "reschedule"
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    provider = _SlowLLM()
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setenv("MCP_CACHE", "0")
+    monkeypatch.setattr(mcp_client, "get_provider", lambda name: provider)
+    policy = RoutingPolicy(min_escalation_s=0.2)
+    monkeypatch.setattr("services.routing._policy", policy)
+    reset_task_cache()
+    return provider, policy
+
+
+LABELS = ["book", "cancel", "reschedule", "query", "other"]
+
+
+@pytest.mark.asyncio
+async def test_confident_local_answers_skip_the_llm(llm):
+    provider, policy = llm
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", {"text": "cancel my appointment", "labels": LABELS})
+    assert out["intent"] == "cancel"
+    assert provider.prompts == []
+    assert policy.stats() == {"intent.classify_intent": {"local": 1}}
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_input_escalates(llm):
+    provider, policy = llm
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", {"text": "i'd like to come in on friday", "labels": LABELS})
+    assert out == {"intent": "reschedule"}
+    assert len(provider.prompts) == 1
+    assert policy.stats()["intent.classify_intent"] == {"escalate": 1}
+
+
+@pytest.mark.asyncio
+async def test_turn_budget_forces_local_answers(llm):
+    provider, policy = llm
+    payload = {"text": "i'd like to come in on friday", "labels": LABELS}
+    with turn_budget(0.1):
+        out = await mcp_client.mcp_task_async("intent", "classify_intent", payload)
+    assert out["intent"] == "other" and provider.prompts == []
+    with turn_budget(0.5):
+        await asyncio.sleep(0.35)  # earlier nodes used most of the budget
+        out = await mcp_client.mcp_task_async("intent", "classify_intent", payload)
+    assert out["intent"] == "other" and out["unsure"]
+    assert policy.stats()["intent.classify_intent"] == {"local_budget": 2}
+
+
+@pytest.mark.asyncio
+async def test_escalation_is_cut_off_at_the_deadline(llm):
+    provider, policy = llm
+    with turn_budget(0.25):
+        out = await mcp_client.mcp_task_async("intent", "classify_intent", {"text": "i'd like to come in on friday", "labels": LABELS})
+    assert out["intent"] == "other" and len(provider.prompts) == 1
+    assert policy.stats()["intent.classify_intent"] == {"escalate": 1, "escalate_timeout": 1}
+
+
+@pytest.mark.asyncio
+async def test_echo_provider_is_never_escalated_to(monkeypatch):
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.setenv("LLM_PROVIDER", "local")
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy())
+    out = await mcp_client.mcp_task_async("mode", "infer_mode", {"text": "i'd like to come in on friday"})
+    assert out["mode"] == "virtual"
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", {"text": "could we do it on thursday instead", "labels": LABELS})
+    assert out["intent"] == "reschedule"
+
+
+@pytest.mark.asyncio
+async def test_unsure_local_answer_is_flagged_when_nothing_can_escalate(monkeypatch):
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.setenv("LLM_PROVIDER", "local")
+    policy = RoutingPolicy(thresholds={"intent.classify_intent": 1.0})
+    monkeypatch.setattr("services.routing._policy", policy)
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", {"text": "cancel my appointment", "labels": LABELS})
+    assert out == {"intent": "cancel", "confidence": 0.99, "unsure": True}
+    out = await mcp_client.mcp_task_async("mode", "infer_mode", {"text": "by phone please"})
+    assert "unsure" not in out
+    assert policy.stats() == {
+        "intent.classify_intent": {"local_unsure": 1},
+        "mode.infer_mode": {"local_only": 1},
+    }
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_remote_answer_does_not_win(llm, monkeypatch):
+    provider, policy = llm
+    monkeypatch.setenv("MCP_ENDPOINT", "http://mcp")
+    monkeypatch.setenv("MCP_PREFER_REMOTE", "1")
+
+    async def post(url, body, timeout_s):
+        # The server answers from the same local classifier, with the same low confidence
+        return {"intent": "book", "confidence": 0.4}
+
+    monkeypatch.setattr(mcp_client, "_post_json", post)
+    out = await mcp_client.mcp_task_async("intent", "classify_intent", {"text": "i'd like to come in on friday", "labels": LABELS})
+    assert out == {"intent": "reschedule"} and len(provider.prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_fallback_counts_each_decision_once(llm, monkeypatch):
+    provider, policy = llm
+    monkeypatch.setenv("MCP_ENDPOINT", "http://mcp")
+    monkeypatch.setenv("MCP_PREFER_REMOTE", "1")
+
+    async def post(url, body, timeout_s):
+        return {"results": [{"ok": False, "error": "unavailable"} for _ in body["items"]]}
+
+    monkeypatch.setattr(mcp_client, "_post_json", post)
+    item = {"agent": "intent", "task": "classify_intent", "payload": {"text": "i'd like to come in on friday", "labels": LABELS}}
+    out = await mcp_client.mcp_batch_async([item])
+    assert out == [{"intent": "reschedule"}]
+    assert policy.stats()["intent.classify_intent"] == {"escalate": 1}
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import server
+import services.mcp_client as mcp_client
+from services.llm_providers import LLMProvider
+from services.mcp_cache import reset_task_cache
+from services.routing import RoutingPolicy
+from services.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_result():
+    group, calls = SingleFlight(), []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"v": 1}
+
+    out = await asyncio.gather(*(group.do("k", fn) for _ in range(5)))
+    assert out == [{"v": 1}] * 5 and len(calls) == 1
+    assert group.stats()["coalesced"] == 4 and group.in_flight() == 0
+    await group.do("k", fn)  # finished calls are not remembered
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    group = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    out = await asyncio.gather(*(group.do("k", fn) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(e, ValueError) for e in out)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_waiter_only_stops_waiting():
+    group, started, finished = SingleFlight(), [], []
+
+    async def fn():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "done"
+
+    first = asyncio.ensure_future(group.do("k", fn))
+    second = asyncio.ensure_future(group.do("k", fn))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done" and finished == [1]
+    assert first.cancelled()
+
+    # Once every waiter is gone the call itself is cancelled
+    lone = asyncio.ensure_future(group.do("k2", fn))
+    await asyncio.sleep(0.01)
+    lone.cancel()
+    await asyncio.sleep(0.06)
+    assert len(started) == 2 and finished == [1] and group.in_flight() == 0
+
+
+class _SlowLLM(LLMProvider):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        return "telephonic"
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        time.sleep(0.1)
+        return "telephonic"
+
+
+@pytest.mark.asyncio
+async def test_client_coalesces_identical_escalations(monkeypatch):
+    provider = _SlowLLM()
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.setenv("MCP_CACHE", "0")
+    monkeypatch.setattr(mcp_client, "get_provider", lambda name: provider)
+    monkeypatch.setattr("services.routing._policy", RoutingPolicy(thresholds={"mode.infer_mode": 1.1}))
+    reset_task_cache()
+    payload = {"text": "book tomorrow at 9am"}
+    out = await asyncio.gather(*(mcp_client.mcp_task_async("mode", "infer_mode", payload) for _ in range(8)))
+    assert all(o == {"mode": "telephonic"} for o in out)
+    assert provider.calls == 1
+    out[0]["mode"] = "changed"
+    assert out[1]["mode"] == "telephonic"
+
+
+@pytest.mark.asyncio
+async def test_server_coalesces_identical_tasks(monkeypatch):
+    provider = _SlowLLM()
+    monkeypatch.setattr(server, "get_provider", lambda name: provider)
+    monkeypatch.setattr(server, "run_local", lambda agent, task, payload: {})
+    body = {"agent": "mode", "task": "infer_mode", "payload": {"text": "book tomorrow at 9am"}}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://mcp") as client:
+        resps = await asyncio.gather(*(client.post("/task", json=body) for _ in range(6)))
+        other = await client.post("/task", json=dict(body, payload={"text": "something else"}))
+    assert [r.json() for r in resps] == [{"mode": "telephonic"}] * 6
+    assert other.status_code == 200
+    assert provider.calls == 2
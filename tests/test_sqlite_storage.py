@@ -0,0 +1,149 @@
+import sqlite3
+import pytest
+
+from services.sqlite_storage import MIGRATIONS, SQLiteStorageService
+
+
+def test_migrates_legacy_table(tmp_path):
+    db = tmp_path / "appointments.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute(
+        "CREATE TABLE appointments (Id TEXT PRIMARY KEY, Date TEXT, Day TEXT, Time TEXT, Mode TEXT, Notes TEXT, UserID TEXT)"
+    )
+    conn.execute("INSERT INTO appointments VALUES ('old', '2030-01-01', NULL, '09:00', 'virtual', '', 'u1')")
+    conn.commit()
+    conn.close()
+
+    s = SQLiteStorageService(db_path=str(db))
+    assert s.conn.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+    assert s.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    # A new booking is the latest even though the legacy row has no CreatedAt
+    new = s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    assert [it["Id"] for it in s.list_appointments(user_id="u1")] == ["old", new["Id"]]
+    assert s.delete_latest_for_user("u1")
+    assert [it["Id"] for it in s.list_appointments(user_id="u1")] == ["old"]
+    s.close()
+
+
+def test_slot_queries_use_indexes(tmp_path):
+    s = SQLiteStorageService(db_path=str(tmp_path / "appointments.db"))
+    plan = " ".join(
+        r[3] for r in s.conn.execute("EXPLAIN QUERY PLAN SELECT 1 FROM appointments WHERE Date = ? AND Time = ? LIMIT 1", ("d", "t"))
+    )
+    assert "appointments_slot" in plan
+    plan = " ".join(
+        r[3]
+        for r in s.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM appointments WHERE UserID = ? ORDER BY CreatedAt DESC, rowid DESC LIMIT 1", ("u",)
+        )
+    )
+    assert "idx_appointments_user" in plan
+    s.close()
+
+
+def test_reads_use_per_thread_connections(tmp_path):
+    import threading
+
+    s = SQLiteStorageService(db_path=str(tmp_path / "appointments.db"))
+    s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    seen = []
+
+    def worker():
+        assert s.has_time_slot_taken("2030-01-02", "10:00")
+        seen.append(s._reader())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(c) for c in seen}) == 3
+    assert all(c is not s.conn for c in seen)
+
+    # Readers see the writer's commits immediately
+    s.delete_latest_for_user("u1")
+    assert not s.has_time_slot_taken("2030-01-02", "10:00")
+    s.close()
+
+
+def test_reserve_slot_unique(tmp_path):
+    s = SQLiteStorageService(db_path=str(tmp_path / "appointments.db"))
+    first = s.reserve_slot("2030-01-02", "10:00", user_id="u1")
+    assert first is not None
+    assert s.reserve_slot("2030-01-02", "10:00", user_id="u2") is None
+    # The unique index also protects the legacy write paths
+    s.reserve_slot("2030-01-02", "11:00", user_id="u2")
+    assert s.update_latest_for_user("u2", lambda it: {**it, "Time": "10:00"}) is None
+    s.close()
+
+
+def test_move_slot_ignores_own_row(tmp_path):
+    from services.storage import SlotTakenError
+
+    s = SQLiteStorageService(db_path=str(tmp_path / "appointments.db"))
+    mine = s.reserve_slot("2030-01-02", "10:00", user_id="u1")
+    s.reserve_slot("2030-01-02", "11:00", user_id="u2")
+    assert s.move_slot("u1", "2030-01-02", "10:00", mode="telephonic")["Id"] == mine["Id"]
+    with pytest.raises(SlotTakenError):
+        s.move_slot("u1", "2030-01-02", "11:00")
+    assert s.move_slot("u1", "2030-01-03", "09:00")["Date"] == "2030-01-03"
+    assert s.list_appointments(user_id="u1")[0]["Mode"] == "telephonic"
+    assert s.move_slot("nobody", "2030-01-04", "09:00") is None
+    s.close()
+
+
+def test_reader_connections_close_with_their_threads(tmp_path):
+    import gc
+    import threading
+
+    s = SQLiteStorageService(db_path=str(tmp_path / "appointments.db"))
+    conns = []
+
+    def worker():
+        s.has_time_slot_taken("2030-01-02", "10:00")
+        conns.append(s._reader())
+
+    # Threadpools that are torn down and rebuilt keep starting new threads
+    for _ in range(20):
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+    gc.collect()
+    assert len(s._readers) == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conns[0].execute("SELECT 1")
+    s.close()
+
+
+def test_double_booking_raises_slot_taken(tmp_path):
+    from services.storage import SlotTakenError
+
+    s = SQLiteStorageService(db_path=str(tmp_path / "appointments.db"))
+    s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    with pytest.raises(SlotTakenError):
+        s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u2")
+    s.close()
+
+
+def test_unique_slot_index_is_retried_after_legacy_double_bookings(tmp_path):
+    db = tmp_path / "appointments.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute(
+        "CREATE TABLE appointments (Id TEXT PRIMARY KEY, Date TEXT, Day TEXT, Time TEXT, Mode TEXT, Notes TEXT, UserID TEXT)"
+    )
+    conn.execute("INSERT INTO appointments VALUES ('a', '2030-01-01', NULL, '09:00', 'virtual', '', 'u1')")
+    conn.execute("INSERT INTO appointments VALUES ('b', '2030-01-01', NULL, '09:00', 'virtual', '', 'u2')")
+    conn.commit()
+    conn.close()
+
+    s = SQLiteStorageService(db_path=str(db))
+    assert s.conn.execute("PRAGMA user_version").fetchone()[0] == 3
+    s.delete_latest_for_user("u2")
+    s.close()
+
+    # Once the double booking is resolved, the next open creates the index
+    s = SQLiteStorageService(db_path=str(db))
+    assert s.conn.execute("PRAGMA user_version").fetchone()[0] == 4
+    assert s.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ux_appointments_slot'").fetchone()
+    s.close()
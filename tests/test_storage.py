@@ -0,0 +1,260 @@
+import pytest
+import json
+
+from services.storage import StorageService
+
+
+def _service(tmp_path):
+    return StorageService(json_path=tmp_path / "appointments.json")
+
+
+def test_indexed_lookups(tmp_path):
+    s = _service(tmp_path)
+    a = s.save_appointment(date="2030-01-02", day="Wednesday", time="10:00", mode="virtual", notes="", user_id="u1")
+    s.save_appointment(date="2030-01-03", day="Thursday", time="11:00", mode="virtual", notes="", user_id="u1")
+    s.save_appointment(date="2030-01-02", day="Wednesday", time="10:00", mode="telephonic", notes="", user_id="u2")
+
+    assert s.has_time_slot_taken("2030-01-02", "10:00")
+    assert not s.has_time_slot_taken("2030-01-02", "12:00")
+    assert [it["Id"] for it in s.find_conflicts("2030-01-02", "10:00", "u1")] == [a["Id"]]
+    assert len(s.list_appointments()) == 3
+    assert len(s.list_appointments(user_id="u1")) == 2
+
+
+def test_update_and_delete_latest(tmp_path):
+    s = _service(tmp_path)
+    first = s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    s.save_appointment(date="2030-01-03", day=None, time="11:00", mode="virtual", notes="", user_id="u1")
+
+    updated = s.update_latest_for_user("u1", lambda it: {**it, "Time": "12:00"})
+    assert updated["Time"] == "12:00"
+    assert s.has_time_slot_taken("2030-01-03", "12:00")
+    assert not s.has_time_slot_taken("2030-01-03", "11:00")
+
+    assert s.delete_latest_for_user("u1")
+    assert [it["Id"] for it in s.list_appointments(user_id="u1")] == [first["Id"]]
+    assert not s.delete_latest_for_user("nobody")
+
+
+def test_view_refreshes_when_file_changes(tmp_path, monkeypatch):
+    # Hand edits don't bump the generation counter; they are caught by the periodic stamp re-check
+    monkeypatch.setenv("JSON_VIEW_RECHECK_S", "0")
+    s = _service(tmp_path)
+    s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    assert s.has_time_slot_taken("2030-01-02", "10:00")
+
+    # Simulate another writer replacing the file behind the cache
+    external = [{"Id": "x", "Date": "2030-02-01", "Time": "09:00", "UserID": "u9"}]
+    (tmp_path / "appointments.json").write_text(json.dumps(external), encoding="utf-8")
+
+    assert not s.has_time_slot_taken("2030-01-02", "10:00")
+    assert s.has_time_slot_taken("2030-02-01", "09:00")
+
+
+def test_journal_mode_appends_and_replays(tmp_path):
+    from services import storage as storage_mod
+
+    path = tmp_path / "appointments.json"
+    s = StorageService(json_path=path, mode="journal")
+    a = s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    s.save_appointment(date="2030-01-03", day=None, time="11:00", mode="virtual", notes="", user_id="u1")
+    s.update_latest_for_user("u1", lambda it: {**it, "Time": "12:00"})
+    s.delete_latest_for_user("u1")
+
+    # Snapshot untouched, every mutation went to the journal
+    assert json.loads(path.read_text(encoding="utf-8")) == []
+    assert len(s.journal_path.read_text(encoding="utf-8").splitlines()) == 4
+
+    # A crash mid-append leaves a torn line; recovery ignores it
+    with s.journal_path.open("ab") as f:
+        f.write(b'{"op":"add","rec":{"Id":"torn"')
+    storage_mod._views.clear()
+    assert [it["Id"] for it in s.list_appointments()] == [a["Id"]]
+
+    b = s.save_appointment(date="2030-01-04", day=None, time="09:00", mode="virtual", notes="", user_id="u2")
+    assert s.compact()
+    assert [it["Id"] for it in json.loads(path.read_text(encoding="utf-8"))] == [a["Id"], b["Id"]]
+    assert s.journal_path.read_text(encoding="utf-8") == ""
+    storage_mod._views.clear()
+    assert len(s.list_appointments()) == 2
+
+
+def test_registry_shares_instances(tmp_path):
+    from services.storage import close_storage, get_storage
+
+    path = str(tmp_path / "appointments.json")
+    s = get_storage("json", path)
+    assert get_storage("json", path) is s
+    sq = get_storage("sqlite", str(tmp_path / "appointments.db"))
+    assert get_storage("sqlite", str(tmp_path / "appointments.db")) is sq
+    close_storage()
+    assert get_storage("json", path) is not s
+    close_storage()
+
+
+@pytest.mark.asyncio
+async def test_async_facade_runs_off_loop(tmp_path):
+    from services.async_storage import AsyncStorageService
+
+    s = AsyncStorageService(_service(tmp_path), max_workers=2)
+    saved = await s.asave_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    assert await s.ahas_time_slot_taken("2030-01-02", "10:00")
+    assert [it["Id"] for it in await s.afind_conflicts("2030-01-02", "10:00", "u1")] == [saved["Id"]]
+    assert await s.adelete_latest_for_user("u1")
+    assert await s.alist_appointments() == []
+    s.shutdown()
+
+
+@pytest.mark.parametrize("mode", ["snapshot", "journal"])
+def test_reserve_slot_is_exclusive_under_concurrency(tmp_path, mode):
+    from concurrent.futures import ThreadPoolExecutor
+
+    s = StorageService(json_path=tmp_path / "appointments.json", mode=mode)
+    slots = [("2030-01-02", "10:00"), ("2030-01-02", "11:00")]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: s.reserve_slot(*slots[i % 2], user_id=f"u{i}"), range(16)))
+
+    assert sum(r is not None for r in results) == 2
+    assert sorted((it["Date"], it["Time"]) for it in s.list_appointments()) == slots
+
+
+@pytest.mark.parametrize("mode", ["snapshot", "journal"])
+def test_concurrent_processes_do_not_lose_updates(tmp_path, mode):
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    path = tmp_path / "appointments.json"
+    code = (
+        "import sys; from pathlib import Path; from services.storage import StorageService\n"
+        "s = StorageService(json_path=Path(sys.argv[1]), mode=sys.argv[2])\n"
+        "for i in range(25):\n"
+        "    s.save_appointment(date='2030-01-02', day=None, time=f'{i:02d}:00', mode='virtual', notes='', user_id=sys.argv[3])\n"
+    )
+    root = Path(__file__).resolve().parents[1]
+    procs = [
+        subprocess.Popen([sys.executable, "-c", code, str(path), mode, f"p{i}"], cwd=str(root))
+        for i in range(4)
+    ]
+    assert all(p.wait(timeout=120) == 0 for p in procs)
+
+    s = StorageService(json_path=path, mode=mode)
+    assert len(s.list_appointments()) == 100
+    assert all(len(s.list_appointments(user_id=f"p{i}")) == 25 for i in range(4))
+
+
+def test_journal_append_keeps_entries_it_has_not_seen(tmp_path):
+    s = StorageService(json_path=tmp_path / "appointments.json", mode="journal")
+    a = s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+    # Another writer appended a complete entry (and then a torn one) behind this view's back
+    other = {"Id": "other", "Date": "2030-01-05", "Time": "08:00", "UserID": "u9"}
+    with s.journal_path.open("ab") as f:
+        f.write(json.dumps({"op": "add", "rec": other}).encode("utf-8") + b"\n")
+        f.write(b'{"op":"add","rec":{"Id":"torn"')
+    b = s.reserve_slot("2030-01-03", "11:00", user_id="u2")
+
+    assert {it["Id"] for it in s.list_appointments()} == {a["Id"], "other", b["Id"]}
+    assert b"torn" not in s.journal_path.read_bytes()
+
+
+def test_failed_journal_sync_does_not_publish_the_booking(tmp_path, monkeypatch):
+    s = StorageService(json_path=tmp_path / "appointments.json", mode="journal")
+
+    def broken_fsync(fd):
+        raise OSError("disk gone")
+
+    monkeypatch.setattr("services.storage.os.fsync", broken_fsync)
+    with pytest.raises(RuntimeError):
+        s.reserve_slot("2030-01-02", "10:00", user_id="u1")
+    monkeypatch.undo()
+    assert not s.has_time_slot_taken("2030-01-02", "10:00")
+    assert s.reserve_slot("2030-01-02", "10:00", user_id="u2") is not None
+
+
+def test_move_slot_is_atomic_and_ignores_own_row(tmp_path):
+    from services.storage import SlotTakenError
+
+    s = _service(tmp_path)
+    mine = s.reserve_slot("2030-01-02", "10:00", user_id="u1")
+    s.reserve_slot("2030-01-02", "11:00", user_id="u2")
+
+    # Same slot, new mode: the user's own row doesn't block the move
+    moved = s.move_slot("u1", "2030-01-02", "10:00", mode="telephonic")
+    assert moved["Id"] == mine["Id"] and moved["Mode"] == "telephonic"
+    with pytest.raises(SlotTakenError):
+        s.move_slot("u1", "2030-01-02", "11:00")
+    assert s.move_slot("u1", "2030-01-03", "09:00", day="Thursday")["Day"] == "Thursday"
+    assert not s.has_time_slot_taken("2030-01-02", "10:00")
+    assert s.move_slot("nobody", "2030-01-04", "09:00") is None
+
+
+def test_reads_are_not_blocked_while_a_writer_waits_for_another_process(tmp_path):
+    import threading
+
+    fcntl = pytest.importorskip("fcntl")
+    s = _service(tmp_path)
+    s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+
+    # A separate open file description stands in for another process holding the lock
+    with open(tmp_path / "appointments.lock", "a+b") as other:
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX)
+        writer = threading.Thread(
+            target=s.save_appointment,
+            kwargs=dict(date="2030-01-03", day=None, time="11:00", mode="virtual", notes="", user_id="u2"),
+        )
+        writer.start()
+        reader = threading.Thread(target=lambda: s.list_appointments())
+        reader.start()
+        reader.join(timeout=2)
+        assert not reader.is_alive()
+        assert writer.is_alive()
+        fcntl.flock(other.fileno(), fcntl.LOCK_UN)
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert len(s.list_appointments()) == 2
+
+
+def test_compaction_writes_the_snapshot_outside_the_locks(tmp_path, monkeypatch):
+    import threading
+
+    from services import storage as storage_mod
+
+    path = tmp_path / "appointments.json"
+    s = StorageService(json_path=path, mode="journal", excel=False)
+    a = s.save_appointment(date="2030-01-02", day=None, time="10:00", mode="virtual", notes="", user_id="u1")
+
+    writing, release = threading.Event(), threading.Event()
+    write_temp_json = storage_mod._write_temp_json
+
+    def slow_write(target, data):
+        writing.set()
+        release.wait(timeout=5)
+        return write_temp_json(target, data)
+
+    monkeypatch.setattr(storage_mod, "_write_temp_json", slow_write)
+    compactor = threading.Thread(target=s.compact)
+    compactor.start()
+    try:
+        assert writing.wait(timeout=5)
+        # Readers and writers go on while the snapshot is being written
+        worker = threading.Thread(
+            target=s.save_appointment,
+            kwargs=dict(date="2030-01-03", day=None, time="11:00", mode="virtual", notes="", user_id="u2"),
+        )
+        worker.start()
+        worker.join(timeout=2)
+        assert not worker.is_alive()
+        assert len(s.list_appointments()) == 2
+    finally:
+        release.set()
+        compactor.join(timeout=5)
+
+    # The snapshot holds what was captured; the booking made meanwhile stays journaled
+    assert [it["Id"] for it in json.loads(path.read_text(encoding="utf-8"))] == [a["Id"]]
+    assert len(s.journal_path.read_text(encoding="utf-8").splitlines()) == 1
+    assert len(s.list_appointments()) == 2
+    s.save_appointment(date="2030-01-04", day=None, time="12:00", mode="virtual", notes="", user_id="u3")
+    storage_mod._views.clear()
+    assert len(s.list_appointments()) == 3
+    assert s.compact()
+    assert len(json.loads(path.read_text(encoding="utf-8"))) == 3